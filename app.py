@@ -1,14 +1,20 @@
 import os
+import click
 from flask import Flask, request, url_for, session, flash, redirect, render_template
 from flask_minify import Minify
+from jinja2 import FileSystemBytecodeCache
 from markupsafe import escape, Markup
 import re
 from urllib.parse import urlencode
 
 from pytz import timezone
-from config import auth
+from config import firebase_client, token_refresher
 from datetime import datetime, timedelta, timezone
 from permissions import get_current_user_permissions
+from data import compactacao, gravacao_adiada, observador, retencao
+import cli
+import request_context
+import static_assets
 import logging
 from logging.handlers import RotatingFileHandler
 
@@ -22,6 +28,25 @@ def create_app():
     )
     app.jinja_env.add_extension('jinja2.ext.do')
 
+    # Bytecode dos templates persistido em disco: workers novos não recompilam os templates.
+    jinja_cache_dir = os.getenv('SGD_JINJA_CACHE_DIR', os.path.join(app.instance_path, 'jinja_cache'))
+    os.makedirs(jinja_cache_dir, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(jinja_cache_dir)
+
+    preload = os.getenv('SGD_PRELOAD') == '1'
+    if not preload:
+        # Com a app pré-carregada no master, as conexões e threads são abertas após o fork (gunicorn.conf.py).
+        firebase_client.warmup()
+        # Comandos `flask ...` (cli.py) também criam a app: as threads de fundo ficam só
+        # com o servidor. Sem a thread de gravação o processo grava direto (gravacao_adiada).
+        if not app.debug and click.get_current_context(silent=True) is None:
+            compactacao.iniciar_agendamento(app.logger)
+            retencao.iniciar_agendamento(app.logger)
+            observador.iniciar(app.logger)
+            gravacao_adiada.iniciar(app.logger)
+    static_assets.init_app(app)
+    cli.init_app(app)
+
     if not app.debug:
         if not os.path.exists('logs'):
             os.mkdir('logs')
@@ -47,34 +72,29 @@ def create_app():
     def inject_permissions():
         return dict(permissions=get_current_user_permissions())
 
-    @app.context_processor
-    def inject_permissions():
-        return dict(permissions=get_current_user_permissions())
+    @app.after_request
+    def add_data_loads_header(response):
+        # Em debug, expõe quantas vezes cada dataset foi carregado na requisição.
+        if app.debug:
+            cargas = request_context.resumo_cargas()
+            if cargas:
+                response.headers['X-SGD-Cargas'] = cargas
+        return response
     
     @app.before_request
     def refresh_firebase_token():
-        if 'user' in session and 'refreshToken' in session['user'] and 'expires_at' in session['user']:
-            
-            expires_at = datetime.fromisoformat(session['user']['expires_at']).replace(tzinfo=None)
-            
-            # agora timezone existe
-            if expires_at < datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(minutes=5):
-                try:
-                    user_auth_data = auth.refresh(session['user']['refreshToken'])
-                    
-                    session['user']['idToken'] = user_auth_data['idToken']
-                    session['user']['refreshToken'] = user_auth_data['refreshToken']
-                    
-                    new_expires_in = int(user_auth_data.get('expiresIn', 3600))
-                    session['user']['expires_at'] = (datetime.now(timezone.utc).replace(tzinfo=None) + timedelta(seconds=new_expires_in)).isoformat()
-                    
-                    session.modified = True 
-                    
-                except Exception as e:
-                    flash('Sua sessão expirou. Por favor, faça login novamente.', 'warning')
-                    session.pop('user', None)
-                    if request.endpoint and 'login' not in request.endpoint and 'static' not in request.endpoint:
-                        return redirect(url_for('auth.login'))
+        user = session.get('user')
+        if user and 'refreshToken' in user and 'expires_at' in user:
+            estado = token_refresher.sync_session(user)
+
+            if estado == 'updated':
+                session.modified = True
+
+            elif estado == 'expired':
+                flash('Sua sessão expirou. Por favor, faça login novamente.', 'warning')
+                session.pop('user', None)
+                if request.endpoint and 'login' not in request.endpoint and 'static' not in request.endpoint:
+                    return redirect(url_for('auth.login'))
                 
     def autolink(value):
         if not value:
@@ -104,7 +124,12 @@ def create_app():
     app.jinja_env.filters['autolink'] = autolink
 
     if not app.config.get('DEBUG', False):
-        Minify(app=app, html=True, js=True, cssless=True)
+        # Quadro de pedidos e fila de packing são montados com fragmentos já minificados
+        # (fragment_cache); minificar a página inteira de novo anularia o ganho do cache.
+        # HTML minificado fica em cache pelo hash do conteúdo (caching_limit por endpoint).
+        # Os arquivos estáticos já saem minificados e comprimidos do build (static_assets).
+        Minify(app=app, html=True, js=True, cssless=True, static=False, caching_limit=64,
+               bypass=['pedidos.listar_pedidos', 'packing.listar_packing'])
 
         from routes.auth import auth_bp
         from routes.main import main_bp
@@ -126,6 +151,10 @@ def create_app():
         app.register_blueprint(frota_bp)
         app.register_blueprint(rotas_bp)
 
+        if os.getenv('SGD_WARMUP') == '1':
+            import warmup
+            warmup.warm_up(app, freeze=preload)
+
         return app
 
 if __name__ == '__main__':
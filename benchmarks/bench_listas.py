@@ -0,0 +1,463 @@
+# benchmarks/bench_listas.py
+#
+# Compara as listas mais acessadas (pedidos, packing, painel de retirada, mapa e
+# planejamento) na implementação pyarrow.compute atual com a implementação pandas
+# anterior, em dados sintéticos: confere que os resultados são iguais e mede
+# vazão (chamadas/s) e pico de memória (RSS) de cada uma.
+#
+# Uso (na raiz do projeto):
+#     python benchmarks/bench_listas.py [--pedidos 5000] [--repeticoes 20]
+#
+# Cada implementação roda em um subprocesso próprio, para que o pico de RSS de uma
+# não contamine a medição da outra. A coluna "arrow" mede o cálculo (memoização
+# desligada); "memo", as chamadas repetidas sem mudança nos dados (services/memoizacao.py).
+
+import argparse
+import json
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+DATASETS = {
+    'RIOFER_PICKING_SGD': 'picking.parquet',
+    'RIOFER_PACOTES_SGD': 'pacotes.parquet',
+    'RIOFER_SEPARACAO_SGD': 'separacao.parquet',
+    'RIOFER_PACKING_SGD': 'packing.parquet',
+    'RIOFER_SEQUENCIA_SGD': 'sequencia.parquet',
+    'RIOFER_GEOLOC_SGD': 'geoloc.parquet',
+    'RIOFER_PARADAS_SGD': 'paradas.parquet',
+    'RIOFER_ROTAS_SGD': 'rotas.parquet',
+}
+
+
+def configurar_ambiente(diretorio):
+    """Aponta os repositórios para os arquivos sintéticos (antes de importar data/services)."""
+    for variavel, arquivo in DATASETS.items():
+        os.environ[variavel] = os.path.join(diretorio, arquivo)
+    # Tudo o que por padrão vai para ./instance fica no diretório temporário.
+    os.environ['RIOFER_SNAPSHOTS_SGD'] = os.path.join(diretorio, 'snapshots')
+    os.environ['RIOFER_PICKING_SESSOES_SGD'] = os.path.join(diretorio, 'picking_sessoes.sqlite3')
+    os.environ['RIOFER_BARRAMENTO_SGD'] = os.path.join(diretorio, 'barramento.bin')
+    os.environ['RIOFER_JOURNAL_SGD'] = os.path.join(diretorio, 'journal')
+    os.environ['RIOFER_ARQUIVO_SGD'] = os.path.join(diretorio, 'arquivo')
+    os.environ['SGD_COMPACTACAO_ESTADO'] = os.path.join(diretorio, 'compactacao.json')
+    os.environ['SGD_ARQUIVAMENTO_ESTADO'] = os.path.join(diretorio, 'arquivamento.json')
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+
+def gerar_dados(diretorio, total_pedidos, seed=42):
+    import pandas as pd
+
+    rnd = random.Random(seed)
+    locais = ['DEP-A', 'DEP-B', 'PATIO', 'LOJA', ' ', None]
+    cidades = ['Rio de Janeiro', 'Niterói', 'Duque de Caxias', 'Nova Iguaçu']
+
+    picking, pacotes, separacao, packing, sequencia, geoloc, paradas = [], [], [], [], [], [], []
+    for i in range(total_pedidos):
+        abs_entry = 100000 + i
+        card_name = f"Cliente {rnd.randint(1, total_pedidos // 3 + 1):05d}"
+        quem_entrega = rnd.choice(['01', '01', '02', None])
+        latitude = rnd.choice([str(-22.9 + rnd.random() / 10), '0', None])
+        longitude = str(-43.2 + rnd.random() / 10) if latitude else None
+        localizacoes = rnd.sample(locais, rnd.randint(1, 3))
+        for localizacao in localizacoes:
+            for item in range(rnd.randint(1, 6)):
+                picking.append({
+                    'AbsEntry': abs_entry, 'CardName': card_name, 'U_TU_QuemEntrega': quem_entrega,
+                    'Localizacao': localizacao, 'ItemCode': f"IT{item:04d}", 'ItemName': f"Item {item}",
+                    'UomCode': rnd.choice(['UN', 'KG', 'METROS']), 'RelQtty': float(rnd.randint(1, 20)),
+                    'SWeight1': round(rnd.random() * 10, 3),
+                    'U_SPS_Latitude': latitude, 'U_SPS_Longitude': longitude,
+                    'U_GI_Rua': 'Rua das Flores', 'U_GI_NumRua': str(rnd.randint(1, 999)),
+                    'U_GI_Bairro': rnd.choice(['Centro', None]), 'U_GI_Cidade': rnd.choice(cidades),
+                    'U_GI_Estado': 'RJ',
+                })
+            if not localizacao or not localizacao.strip():
+                continue
+
+            etapa = rnd.random()
+            if etapa < 0.5:
+                continue
+            finalizada = etapa > 0.65
+            separacao.append({
+                'AbsEntry': abs_entry, 'Localizacao': localizacao, 'User': f"usuario{rnd.randint(1, 9)}",
+                'StartTime': '2025-01-01 08:00:00', 'EndTime': '2025-01-01 09:00:00' if finalizada else '',
+                'DiscrepancyLog': 'Falta 1 item' if finalizada and rnd.random() < 0.1 else '',
+                'DiscrepancyReport': '',
+            })
+            if finalizada:
+                for pacote in range(rnd.randint(1, 3)):
+                    pacotes.append({
+                        'AbsEntry': abs_entry, 'Localizacao': localizacao, 'PackageID': pacote + 1,
+                        'Weight': round(rnd.random() * 50, 2), 'ItemCode': 'IT0000', 'ItemName': 'Item 0',
+                        'Quantity': float(rnd.randint(1, 10)), 'Report': '', 'Location': rnd.choice(['Box 1', 'Box 2', ''])
+                    })
+                if rnd.random() < 0.4:
+                    packing.append({'AbsEntry': abs_entry, 'Localizacao': localizacao})
+
+        if rnd.random() < 0.3:
+            sequencia.append({'AbsEntry': abs_entry, 'Tipo': 'entrega', 'Ordem': rnd.randint(1, 1000)})
+        if rnd.random() < 0.1:
+            geoloc.append({'AbsEntry': abs_entry, 'U_SPS_Latitude': str(-22.8), 'U_SPS_Longitude': str(-43.1)})
+        if rnd.random() < 0.15:
+            paradas.append({'ID_Rota': rnd.randint(1, 50), 'AbsEntry': abs_entry, 'CardName': card_name,
+                            'Ordem_Visita': 1, 'Status_Parada': 'Pendente'})
+
+    # As rotas 46 a 50 ficam sem registro: paradas de gravações interrompidas.
+    rotas = [{'ID_Rota': id_rota, 'ID_Caminhao': f"CAM-{id_rota % 7}", 'Placa_Caminhao': f"RIO{id_rota:04d}",
+              'Nome_Motorista': f"Motorista {id_rota % 7}", 'Data_Rota': datetime(2024, 1, 1 + id_rota % 28),
+              'Status': 'Planejada', 'Meta_KG': 1000.0, 'Data_Limite': None, 'Observacoes': '', 'Tipo': 'Entrega'}
+             for id_rota in range(1, 46)]
+
+    tabelas = {
+        'RIOFER_PICKING_SGD': picking, 'RIOFER_PACOTES_SGD': pacotes, 'RIOFER_SEPARACAO_SGD': separacao,
+        'RIOFER_PACKING_SGD': packing, 'RIOFER_SEQUENCIA_SGD': sequencia, 'RIOFER_GEOLOC_SGD': geoloc,
+        'RIOFER_PARADAS_SGD': paradas, 'RIOFER_ROTAS_SGD': rotas,
+    }
+    for variavel, linhas in tabelas.items():
+        pd.DataFrame(linhas).to_parquet(os.path.join(diretorio, DATASETS[variavel]), index=False)
+    return {variavel: len(linhas) for variavel, linhas in tabelas.items()}
+
+
+# --- Implementação pandas anterior (referência) ---
+
+class _TodasAsPermissoes:
+    def can_view_entregas(self):
+        return True
+
+    def can_view_retira(self):
+        return True
+
+
+def pandas_pedidos():
+    import pandas as pd
+    from data import pedidos_repository, separacao_repository, packing_repository, sequencia_repository
+
+    # Cópias: o código original alterava os DataFrames (inplace), que agora são compartilhados.
+    df_picking = pedidos_repository.get_picking_data().copy()
+    df_separacao = separacao_repository.get_separacao_data()
+    df_packing = packing_repository.get_packing_data()
+    df_sequencia = sequencia_repository.get_sequencia_data()
+
+    df_picking.dropna(subset=['Localizacao'], inplace=True)
+    df_picking = df_picking[df_picking['Localizacao'].str.strip() != '']
+    packing_finalizado_keys = set(zip(df_packing['AbsEntry'], df_packing['Localizacao']))
+    df_separacao_indexed = df_separacao.set_index(['AbsEntry', 'Localizacao'])
+
+    pedidos_agrupados = {}
+    all_statuses = set()
+    for _, row in df_picking.drop_duplicates(subset=['AbsEntry', 'Localizacao']).iterrows():
+        abs_entry = row['AbsEntry']
+        key = (abs_entry, row['Localizacao'])
+        status = 'Pendente'
+        user = None
+        if key in df_separacao_indexed.index:
+            separacao_info = df_separacao_indexed.loc[key]
+            end_time = separacao_info.get('EndTime')
+            if pd.isna(end_time) or end_time is None or end_time == '':
+                status = "Em separação"
+                user = separacao_info['User']
+            elif separacao_info.get('DiscrepancyLog'):
+                status = 'Picking Incompleto'
+            elif key in packing_finalizado_keys:
+                status = 'Packing Finalizado'
+            else:
+                status = 'Aguardando Packing'
+        all_statuses.add(status)
+        location_info = {
+            'Localizacao': row['Localizacao'],
+            'Status': status,
+            'StatusCompleto': f"Em separação por {user}" if status == "Em separação" else status,
+            'UserInSeparation': user
+        }
+        if abs_entry not in pedidos_agrupados:
+            pedidos_agrupados[abs_entry] = row.to_dict()
+            pedidos_agrupados[abs_entry]['locations'] = []
+        pedidos_agrupados[abs_entry]['locations'].append(location_info)
+
+    lista_pedidos = list(pedidos_agrupados.values())
+    sequencia_map = {row['AbsEntry']: row['Ordem'] for _, row in df_sequencia.iterrows()}
+    ordenados = sorted([p for p in lista_pedidos if p['AbsEntry'] in sequencia_map], key=lambda p: sequencia_map[p['AbsEntry']])
+    nao_ordenados = sorted([p for p in lista_pedidos if p['AbsEntry'] not in sequencia_map], key=lambda p: p['AbsEntry'])
+    return ordenados + nao_ordenados, sorted(all_statuses)
+
+
+def pandas_packing():
+    import pandas as pd
+    from data import packing_repository, pedidos_repository, separacao_repository
+
+    user_perms = _TodasAsPermissoes()
+    df_pacotes = pedidos_repository.get_pacotes_data().copy()
+    df_picking = pedidos_repository.get_picking_data()
+    df_packing_finalizado = packing_repository.get_packing_data()
+    df_separacao = separacao_repository.get_separacao_data()
+
+    df_pacotes.dropna(subset=['Localizacao'], inplace=True)
+    df_pacotes = df_pacotes[df_pacotes['Localizacao'].str.strip() != '']
+    df_picking_info = df_picking.drop_duplicates(subset=['AbsEntry'])[['AbsEntry', 'CardName', 'U_TU_QuemEntrega']]
+    df_pacotes_com_tipo = pd.merge(df_pacotes, df_picking_info[['AbsEntry', 'U_TU_QuemEntrega']], on='AbsEntry', how='left')
+
+    pedidos_visiveis = []
+    if user_perms.can_view_entregas():
+        pedidos_visiveis.append(df_pacotes_com_tipo[df_pacotes_com_tipo['U_TU_QuemEntrega'] != '02'])
+    if user_perms.can_view_retira():
+        pedidos_visiveis.append(df_pacotes_com_tipo[df_pacotes_com_tipo['U_TU_QuemEntrega'] == '02'])
+    base = pd.concat(pedidos_visiveis).drop_duplicates(subset=['AbsEntry', 'Localizacao'])
+    com_nome = pd.merge(base, df_picking_info[['AbsEntry', 'CardName']], on='AbsEntry', how='left')
+
+    finalizados_keys = set(zip(df_packing_finalizado['AbsEntry'], df_packing_finalizado['Localizacao']))
+    df_incompleto = df_separacao[df_separacao['DiscrepancyLog'].notna() & (df_separacao['DiscrepancyLog'] != '')]
+    incompletos_keys = set(zip(df_incompleto['AbsEntry'], df_incompleto['Localizacao']))
+
+    resultado = []
+    for _, row in com_nome.iterrows():
+        key = (row['AbsEntry'], row['Localizacao'])
+        if key in incompletos_keys:
+            continue
+        pedido_dict = row.to_dict()
+        pedido_dict['Status'] = 'Finalizado' if key in finalizados_keys else 'Aguardando Início'
+        resultado.append(pedido_dict)
+    return resultado
+
+
+def pandas_painel():
+    from data import pedidos_repository, separacao_repository, packing_repository
+
+    df_picking = pedidos_repository.get_picking_data()
+    df_separacao = separacao_repository.get_separacao_data()
+    df_pacotes = pedidos_repository.get_pacotes_data()
+    df_packing = packing_repository.get_packing_data()
+
+    df_retirada = df_picking[df_picking['U_TU_QuemEntrega'] == '02'].copy()
+    packing_finalizado_ids = set(df_packing['AbsEntry'].unique())
+    separacao_iniciada_ids = set(df_separacao['AbsEntry'].unique())
+    separacao_finalizada_ids = set(df_separacao[df_separacao['EndTime'].notna() & (df_separacao['EndTime'] != '')]['AbsEntry'].unique())
+
+    pedidos_status = []
+    for abs_entry, group in df_retirada.groupby('AbsEntry'):
+        if abs_entry in packing_finalizado_ids:
+            continue
+        status = 'Pendente'
+        percentual = 0
+        localizacao_retirada = ""
+        if abs_entry in separacao_finalizada_ids:
+            status = 'Aguardando Retirada'
+            percentual = 100
+            locais = df_pacotes[df_pacotes['AbsEntry'] == abs_entry]['Location'].unique()
+            localizacao_retirada = ", ".join(filter(None, locais))
+        elif abs_entry in separacao_iniciada_ids:
+            status = 'Em Separação'
+            total_qtd_pedido = group['RelQtty'].sum()
+            qtd_separada = df_pacotes[df_pacotes['AbsEntry'] == abs_entry]['Quantity'].sum()
+            if total_qtd_pedido > 0:
+                percentual = (qtd_separada / total_qtd_pedido) * 100
+        pedidos_status.append({
+            'AbsEntry': int(abs_entry), 'CardName': group['CardName'].iloc[0], 'Status': status,
+            'Percentual': int(round(percentual)), 'Localizacao': localizacao_retirada
+        })
+    pedidos_status.sort(key=lambda x: x['CardName'])
+    return pedidos_status
+
+
+def pandas_mapa():
+    import pandas as pd
+    from data import pedidos_repository, geoloc_repository
+
+    df_picking = pedidos_repository.get_picking_data()
+    df_geoloc = geoloc_repository.get_geoloc_data().copy()
+    df_entregas = df_picking[df_picking['U_TU_QuemEntrega'] != '02'].copy()
+    coordenadas = ['U_SPS_Latitude', 'U_SPS_Longitude']
+    df_entregas[coordenadas] = df_entregas[coordenadas].astype(object)
+    if not df_geoloc.empty:
+        df_entregas.set_index('AbsEntry', inplace=True)
+        df_geoloc.set_index('AbsEntry', inplace=True)
+        df_entregas.update(df_geoloc)
+        df_entregas.reset_index(inplace=True)
+
+    def clean_value(v):
+        if pd.isna(v):
+            return ''
+        s = str(v).strip()
+        return '' if s.lower() == 'nan' else s
+
+    pedidos_mapa = []
+    for abs_entry, group in df_entregas.groupby('AbsEntry'):
+        pedido_info = group.iloc[0]
+        lat = pd.to_numeric(pedido_info.get('U_SPS_Latitude'), errors='coerce')
+        lon = pd.to_numeric(pedido_info.get('U_SPS_Longitude'), errors='coerce')
+        has_valid_coords = pd.notna(lat) and pd.notna(lon) and lat != 0 and lon != 0
+        partes = [clean_value(pedido_info.get(c, '')) for c in ('U_GI_Rua', 'U_GI_NumRua', 'U_GI_Bairro', 'U_GI_Cidade', 'U_GI_Estado')]
+        pedidos_mapa.append({
+            'AbsEntry': int(abs_entry), 'CardName': pedido_info['CardName'], 'Status': 'Pendente',
+            'Latitude': lat if has_valid_coords else None, 'Longitude': lon if has_valid_coords else None,
+            'Endereco': ", ".join([p for p in partes if p]), 'GeoError': not has_valid_coords,
+            'Cidade': clean_value(pedido_info.get('U_GI_Cidade', ''))
+        })
+    return sorted(pedidos_mapa, key=lambda x: x['CardName'])
+
+
+def pandas_planejamento():
+    from data import rotas_repository, pedidos_repository
+
+    df_picking = pedidos_repository.get_picking_data()
+    df_paradas = rotas_repository.get_paradas_data()
+    df_paradas = df_paradas[df_paradas['ID_Rota'].isin(set(rotas_repository.get_rotas_data()['ID_Rota']))]
+    df_entregas = df_picking[df_picking['U_TU_QuemEntrega'] != '02'].copy()
+    df_disponiveis = df_entregas[~df_entregas['AbsEntry'].isin(set(df_paradas['AbsEntry']))]
+    df_agg = df_disponiveis.groupby('AbsEntry').agg(
+        CardName=('CardName', 'first'),
+        PesoTotal=('SWeight1', lambda x: (x * df_disponiveis.loc[x.index, 'RelQtty']).sum())
+    ).reset_index()
+    return df_agg.to_dict('records')
+
+
+# --- Implementação Arrow atual ---
+
+def arrow_pedidos():
+    from services import pedidos_service
+    lista, statuses, _ = pedidos_service.get_pedidos_para_listar()
+    return lista, statuses
+
+
+def arrow_packing():
+    from services import packing_service
+    return packing_service.get_pedidos_para_packing(_TodasAsPermissoes())
+
+
+def arrow_painel():
+    from services import pedidos_service
+    return pedidos_service.get_painel_retirada()
+
+
+def arrow_mapa():
+    from services import mapa_service
+    return mapa_service.get_entregas_para_mapa()
+
+
+def arrow_planejamento():
+    from services import rotas_service
+    return rotas_service.get_pedidos_disponiveis()
+
+
+IMPLEMENTACOES = {
+    'pandas': {'pedidos': pandas_pedidos, 'packing': pandas_packing, 'painel': pandas_painel,
+               'mapa': pandas_mapa, 'planejamento': pandas_planejamento},
+    'arrow': {'pedidos': arrow_pedidos, 'packing': arrow_packing, 'painel': arrow_painel,
+              'mapa': arrow_mapa, 'planejamento': arrow_planejamento},
+}
+IMPLEMENTACOES['memo'] = IMPLEMENTACOES['arrow']
+
+
+# --- Comparação dos resultados ---
+
+def _valor(v):
+    if hasattr(v, 'item'):  # escalares numpy
+        v = v.item()
+    if isinstance(v, float):
+        return None if math.isnan(v) else round(v, 6)
+    return v
+
+
+def _normalizar(lista, campos):
+    return [{campo: _valor(item.get(campo)) for campo in campos} for item in lista]
+
+
+def normalizar(lista_nome, resultado):
+    if lista_nome == 'pedidos':
+        lista, statuses = resultado
+        return [
+            {**_normalizar([p], ['AbsEntry', 'CardName', 'U_TU_QuemEntrega'])[0],
+             'locations': _normalizar(p['locations'], ['Localizacao', 'Status', 'StatusCompleto', 'UserInSeparation'])}
+            for p in lista
+        ], list(statuses)
+    if lista_nome == 'packing':
+        return _normalizar(resultado, ['AbsEntry', 'Localizacao', 'PackageID', 'Weight', 'Location',
+                                       'CardName', 'U_TU_QuemEntrega', 'Status'])
+    if lista_nome == 'planejamento':
+        return _normalizar(resultado, ['AbsEntry', 'CardName', 'PesoTotal'])
+    return [{k: _valor(v) for k, v in item.items()} for item in resultado]
+
+
+def conferir(diretorio):
+    configurar_ambiente(diretorio)
+    divergencias = []
+    for lista_nome in IMPLEMENTACOES['pandas']:
+        esperado = normalizar(lista_nome, IMPLEMENTACOES['pandas'][lista_nome]())
+        obtido = normalizar(lista_nome, IMPLEMENTACOES['arrow'][lista_nome]())
+        if esperado != obtido:
+            divergencias.append(lista_nome)
+    return divergencias
+
+
+# --- Medição (em subprocesso) ---
+
+def medir(diretorio, implementacao, repeticoes):
+    configurar_ambiente(diretorio)
+    if implementacao == 'arrow':
+        os.environ['SGD_MEMOIZACAO_ENTRADAS'] = '0'
+
+    resultados = {}
+    for lista_nome, funcao in IMPLEMENTACOES[implementacao].items():
+        funcao()  # aquecimento: conversão do snapshot e caches do processo
+        inicio = time.perf_counter()
+        for _ in range(repeticoes):
+            funcao()
+        duracao = time.perf_counter() - inicio
+        resultados[lista_nome] = repeticoes / duracao
+    # ru_maxrss é em KB no Linux
+    resultados['pico_rss_mb'] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark das listas: pandas x pyarrow.compute.')
+    parser.add_argument('--pedidos', type=int, default=5000)
+    parser.add_argument('--repeticoes', type=int, default=20)
+    parser.add_argument('--medir', choices=sorted(IMPLEMENTACOES), help=argparse.SUPPRESS)
+    parser.add_argument('--dados', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.medir:
+        print(json.dumps(medir(args.dados, args.medir, args.repeticoes)))
+        return 0
+
+    with tempfile.TemporaryDirectory(prefix='sgd-bench-') as diretorio:
+        linhas = gerar_dados(diretorio, args.pedidos)
+        print(f"Dados sintéticos: {args.pedidos} pedidos, {linhas['RIOFER_PICKING_SGD']} linhas de picking, "
+              f"{linhas['RIOFER_PACOTES_SGD']} pacotes.")
+
+        divergencias = conferir(diretorio)
+        if divergencias:
+            print(f"ERRO: resultados diferentes da implementação pandas em: {', '.join(divergencias)}")
+            return 1
+        print("Resultados idênticos à implementação pandas.\n")
+
+        medicoes = {}
+        for implementacao in ('pandas', 'arrow', 'memo'):
+            saida = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--medir', implementacao, '--dados', diretorio,
+                 '--repeticoes', str(args.repeticoes)],
+                check=True, capture_output=True, text=True, cwd=RAIZ
+            ).stdout
+            medicoes[implementacao] = json.loads(saida.strip().splitlines()[-1])
+
+    print(f"{'lista':<14}{'pandas (req/s)':>16}{'arrow (req/s)':>16}{'ganho':>9}{'memo (req/s)':>16}")
+    for lista_nome in IMPLEMENTACOES['pandas']:
+        antes, depois = medicoes['pandas'][lista_nome], medicoes['arrow'][lista_nome]
+        print(f"{lista_nome:<14}{antes:>16.1f}{depois:>16.1f}{depois / antes:>8.1f}x{medicoes['memo'][lista_nome]:>16.1f}")
+    print(f"{'pico RSS (MB)':<14}{medicoes['pandas']['pico_rss_mb']:>16.1f}{medicoes['arrow']['pico_rss_mb']:>16.1f}"
+          f"{'':>9}{medicoes['memo']['pico_rss_mb']:>16.1f}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,93 @@
+# cli.py
+
+from datetime import datetime
+
+import click
+from flask.cli import AppGroup
+
+from data import alteracoes_picking, compactacao, gravacao_adiada, migracao, retencao
+
+sgd_cli = AppGroup('sgd', help='Manutenção dos arquivos de dados do SGD.')
+
+
+def _formatar_bytes(total):
+    return '-' if total is None else f"{total / 1024 / 1024:.2f} MB"
+
+
+@sgd_cli.command('migrate-schemas')
+@click.option('--dry-run', is_flag=True, help='Apenas mostra o que seria migrado.')
+def migrate_schemas_command(dry_run):
+    """Regrava os parquets no schema declarado (data/schemas.py)."""
+    for nome, situacao, antes, depois in migracao.migrar(simular=dry_run):
+        click.echo(f"{nome:<12} {situacao:<9} {_formatar_bytes(antes):>10} -> {_formatar_bytes(depois)}")
+
+
+def _formatar_medicao(medicao, campo, formatar):
+    return '-' if not medicao or medicao.get(campo) is None else formatar(medicao[campo])
+
+
+@sgd_cli.command('compact')
+@click.option('--dataset', 'datasets', multiple=True, help='Compacta apenas este dataset (pode repetir).')
+@click.option('--picking', is_flag=True, help='Inclui o picking (agrupado por tipo de entrega).')
+@click.option('--force', is_flag=True, help='Regrava mesmo os arquivos já compactados.')
+def compact_command(datasets, picking, force):
+    """Regrava os parquets ordenados pela chave, com row groups, compressão e estatísticas."""
+    relatorio = compactacao.compactar(list(datasets) or None, incluir_picking=picking, forcar=force)
+    click.echo(f"{'dataset':<12} {'situação':<11} {'tamanho':>23} {'row groups':>12} "
+               f"{'leitura (ms)':>17} {'filtrada (ms)':>17}")
+    for item in relatorio:
+        antes, depois = item['antes'], item['depois']
+        colunas = []
+        for campo, formatar, largura in (('bytes', _formatar_bytes, 23), ('row_groups', str, 12),
+                                         ('leitura_ms', str, 17), ('leitura_filtrada_ms', str, 17)):
+            colunas.append(f"{_formatar_medicao(antes, campo, formatar)} -> "
+                           f"{_formatar_medicao(depois, campo, formatar)}".rjust(largura))
+        click.echo(f"{item['dataset']:<12} {item['situacao']:<11} {' '.join(colunas)}")
+
+
+@sgd_cli.command('archive')
+@click.option('--dry-run', is_flag=True, help='Apenas mostra quantos registros seriam arquivados.')
+def archive_command(dry_run):
+    """Move para o arquivo histórico o que já foi concluído e saiu do picking."""
+    relatorio = retencao.arquivar(simular=dry_run)
+    if not relatorio:
+        click.echo('Picking ausente ou vazio: nada foi arquivado.')
+    for item in relatorio:
+        click.echo(f"{item['dataset']:<12} {item['arquivados']:>8} arquivado(s) {item['quentes']:>8} no arquivo quente")
+
+
+@sgd_cli.command('history')
+@click.argument('abs_entry', type=int)
+@click.option('--dataset', type=click.Choice(retencao.DATASETS), default='separacao')
+def history_command(abs_entry, dataset):
+    """Histórico do pedido (arquivos quentes e arquivados), para auditoria."""
+    df = retencao.consultar_historico(dataset, abs_entry=abs_entry)
+    click.echo('Nenhum registro.' if df.empty else df.to_string(index=False))
+
+
+@sgd_cli.command('picking-changes')
+@click.option('--last', 'ultimas', type=int, default=10, show_default=True)
+def picking_changes_command(ultimas):
+    """Últimas exportações do picking e o que mudou em cada uma."""
+    for entrada in alteracoes_picking.feed(ultimas):
+        instante = datetime.fromtimestamp(entrada['instante']).strftime('%d/%m/%Y %H:%M:%S')
+        if entrada['completo']:
+            click.echo(f"{instante}  carga completa")
+            continue
+        pedidos, linhas = entrada['pedidos'], entrada['linhas']
+        click.echo(
+            f"{instante}  pedidos +{len(pedidos['adicionados'])} -{len(pedidos['removidos'])} "
+            f"~{len(pedidos['alterados'])}  linhas +{len(linhas['adicionadas'])} "
+            f"-{len(linhas['removidas'])} ~{len(linhas['alteradas'])}"
+        )
+
+
+@sgd_cli.command('flush')
+def flush_command():
+    """Grava agora as alterações pendentes nos journals (gravação adiada)."""
+    for nome, total in gravacao_adiada.descarregar_tudo().items():
+        click.echo(f"{nome:<12} {total:>6} alteração(ões) gravada(s)")
+
+
+def init_app(app):
+    app.cli.add_command(sgd_cli)
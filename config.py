@@ -1,6 +1,7 @@
 import os
-import pyrebase
 from dotenv import load_dotenv
+from firebase_client import FirebaseClient
+from token_refresher import TokenRefresher
 
 load_dotenv()
 
@@ -14,6 +15,12 @@ firebase_config = {
     "appId": os.getenv('FIREBASE_APP_ID')
 }
 
-firebase = pyrebase.initialize_app(firebase_config)
-auth = firebase.auth()
-db = firebase.database()
\ No newline at end of file
+firebase_client = FirebaseClient(
+    api_key=firebase_config['apiKey'],
+    database_url=firebase_config['databaseURL'],
+    securetoken_url=os.getenv('FIREBASE_SECURETOKEN_URL'),
+    identitytoolkit_url=os.getenv('FIREBASE_IDENTITYTOOLKIT_URL'),
+    max_concurrency=int(os.getenv('FIREBASE_MAX_CONCURRENCY', '8'))
+)
+
+token_refresher = TokenRefresher(firebase_client)
\ No newline at end of file
@@ -0,0 +1,162 @@
+# data/alteracoes_picking.py
+
+import json
+import os
+import time
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from data import snapshots, storage
+
+# O arquivo de picking é substituído inteiro pela exportação do SAP. Cada versão publicada
+# em data/snapshots é comparada com a anterior pela chave das linhas abaixo, e o conjunto
+# de mudanças entra no feed (últimas HISTORICO versões), para que índices derivados
+# atualizem só os pedidos que mudaram.
+CHAVE_LINHA = ['AbsEntry', 'Localizacao', 'ItemCode']
+FEED_PATH = os.getenv('RIOFER_PICKING_ALTERACOES',
+                      os.path.join(snapshots.SNAPSHOTS_DIR, 'picking-alteracoes.json'))
+HISTORICO = 50
+
+def _versao(valor):
+    return tuple(valor) if valor is not None else None
+
+def _normalizar(tabela):
+    """
+    Colunas sem dicionário, chaves de texto nulas como '' (joins não casam nulos) e a
+    ocorrência de cada chave, para linhas repetidas na exportação.
+    """
+    colunas = {}
+    for coluna in tabela.column_names:
+        array = tabela[coluna]
+        if pa.types.is_dictionary(array.type):
+            array = array.cast(array.type.value_type)
+        if coluna in CHAVE_LINHA[1:]:
+            array = pc.fill_null(array.cast(pa.string()), '')
+        colunas[coluna] = array
+    for coluna in CHAVE_LINHA:
+        if coluna not in colunas:
+            colunas[coluna] = pa.array([''] * tabela.num_rows, type=pa.string())
+    chaves = pd.DataFrame({c: colunas[c].to_numpy(zero_copy_only=False) for c in CHAVE_LINHA})
+    colunas['__ocorrencia'] = pa.array(chaves.groupby(CHAVE_LINHA, sort=False).cumcount().to_numpy())
+    return pa.table(list(colunas.values()), names=list(colunas))
+
+def _diferente(antes, depois):
+    """Valores diferentes, considerando nulo == nulo (e NaN == NaN)."""
+    iguais = pc.fill_null(pc.equal(antes, depois), False)
+    ambos_nulos = pc.and_(pc.is_null(antes), pc.is_null(depois))
+    iguais = pc.or_(iguais, ambos_nulos)
+    if pa.types.is_floating(depois.type):
+        iguais = pc.or_(iguais, pc.fill_null(pc.and_(pc.is_nan(antes), pc.is_nan(depois)), False))
+    return pc.invert(iguais)
+
+def _chaves(tabela, mascara):
+    linhas = tabela.filter(mascara).select(CHAVE_LINHA)
+    return [list(chave) for chave in zip(*(linhas[c].to_pylist() for c in CHAVE_LINHA))]
+
+def comparar(anterior, atual):
+    """
+    Conjunto de mudanças entre duas tabelas de picking: pedidos (AbsEntry) adicionados,
+    removidos e alterados, e as chaves [AbsEntry, Localizacao, ItemCode] das linhas
+    adicionadas, removidas e alteradas. Com colunas diferentes entre as versões o
+    conjunto é marcado como 'completo' (quem consome deve reconstruir tudo).
+    """
+    antes, depois = _normalizar(anterior), _normalizar(atual)
+    chave = CHAVE_LINHA + ['__ocorrencia']
+    valores = [c for c in depois.column_names if c not in chave]
+    completo = set(valores) != {c for c in antes.column_names if c not in chave}
+    valores = [c for c in valores if c in antes.column_names]
+
+    esquerda = antes.select(chave + valores).rename_columns(chave + [f'__antes_{c}' for c in valores]) \
+        .append_column('__antes', pa.array([True] * antes.num_rows, type=pa.bool_()))
+    direita = depois.select(chave + valores) \
+        .append_column('__depois', pa.array([True] * depois.num_rows, type=pa.bool_()))
+    juncao = esquerda.join(direita, keys=chave, join_type='full outer')
+
+    existia = pc.is_valid(juncao['__antes'])
+    existe = pc.is_valid(juncao['__depois'])
+    alterada = pa.array([False] * juncao.num_rows, type=pa.bool_())
+    for coluna in valores:
+        alterada = pc.or_(alterada, _diferente(juncao[f'__antes_{coluna}'], juncao[coluna]))
+    alterada = pc.and_(pc.and_(existia, existe), alterada)
+
+    pedidos_antes = set(pc.unique(antes['AbsEntry']).to_pylist())
+    pedidos_depois = set(pc.unique(depois['AbsEntry']).to_pylist())
+    tocados = set(pc.unique(juncao.filter(pc.or_(pc.invert(pc.and_(existia, existe)), alterada))['AbsEntry']).to_pylist())
+    return {
+        'completo': completo,
+        'pedidos': {
+            'adicionados': sorted(pedidos_depois - pedidos_antes),
+            'removidos': sorted(pedidos_antes - pedidos_depois),
+            'alterados': sorted(tocados & pedidos_antes & pedidos_depois),
+        },
+        'linhas': {
+            'adicionadas': _chaves(juncao, pc.invert(existia)),
+            'removidas': _chaves(juncao, pc.invert(existe)),
+            'alteradas': _chaves(juncao, alterada),
+        },
+    }
+
+def _ler_feed():
+    try:
+        with open(FEED_PATH) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return []
+
+def registrar_publicacao(anterior, atual, versao_anterior, versao):
+    """
+    Chamada por data/snapshots a cada versão publicada do picking (uma vez, no processo
+    que converteu): compara com a versão anterior e acrescenta o resultado ao feed.
+    """
+    if anterior is None:
+        alteracoes = {'completo': True, 'pedidos': None, 'linhas': None}
+    else:
+        alteracoes = comparar(anterior, atual)
+    entrada = {
+        'versao_anterior': list(versao_anterior) if versao_anterior else None,
+        'versao': list(versao),
+        'instante': time.time(),
+        **alteracoes,
+    }
+    os.makedirs(os.path.dirname(os.path.abspath(FEED_PATH)), exist_ok=True)
+    with storage.file_lock(FEED_PATH):
+        feed = [e for e in _ler_feed() if _versao(e['versao']) != _versao(versao)]
+        feed.append(entrada)
+        storage.atomic_write_text(json.dumps(feed[-HISTORICO:]), FEED_PATH)
+    return entrada
+
+def feed(ultimas=None):
+    """Entradas do feed (mais antigas primeiro)."""
+    entradas = _ler_feed()
+    return entradas[-ultimas:] if ultimas else entradas
+
+def pedidos_alterados(versao):
+    """
+    (versão atual do picking, AbsEntry que mudaram desde `versao`). O conjunto é None
+    quando o feed não cobre o intervalo (primeira carga, histórico expirado, colunas
+    diferentes, erro na comparação): quem consome deve reconstruir tudo.
+    """
+    try:
+        # Garante que a versão atual já foi publicada (e comparada com a anterior).
+        snapshots.get_table('picking', ['AbsEntry'])
+    except Exception as e:
+        print(f"Erro ao publicar o snapshot de picking: {e}")
+    atual = snapshots.versao('picking')
+    versao = _versao(versao)
+    if atual is None or versao is None:
+        return atual, None
+    if versao == atual:
+        return atual, set()
+
+    por_anterior = {_versao(e['versao_anterior']): e for e in _ler_feed() if e.get('versao_anterior')}
+    alterados = set()
+    while versao != atual:
+        entrada = por_anterior.pop(versao, None)
+        if entrada is None or entrada['completo']:
+            return atual, None
+        for grupo in entrada['pedidos'].values():
+            alterados.update(grupo)
+        versao = _versao(entrada['versao'])
+    return atual, alterados
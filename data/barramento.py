@@ -0,0 +1,93 @@
+# data/barramento.py
+
+import mmap
+import os
+import struct
+import threading
+import time
+import zlib
+
+from data import storage
+
+# Barramento de invalidação entre os workers da máquina: um contador por dataset em um
+# arquivo mapeado em memória (MAP_SHARED) por todos os processos. Quem grava incrementa o
+# contador depois de trocar o arquivo (publicar); quem lê compara o contador com o visto
+# na última conferência e só faz stat no arquivo quando ele mudou. Uma gravação em um
+# worker aparece nos demais já na leitura seguinte, sem esperar polling de mtime.
+BARRAMENTO_PATH = os.getenv('RIOFER_BARRAMENTO_SGD', os.path.join('instance', 'barramento.bin'))
+# Conferência de segurança: sem anúncio, o arquivo ainda é conferido (stat) depois deste
+# tempo, para gravações feitas fora do SGD. 0 desativa o barramento (stat a cada leitura).
+VERIFICACAO_MS = int(os.getenv('SGD_BARRAMENTO_VERIFICACAO_MS', '1000'))
+
+# Contadores de 8 bytes; chaves diferentes no mesmo slot só causam conferências a mais.
+SLOTS = 512
+_CONTADOR = struct.Struct('<Q')
+
+_estado = {'mapa': None, 'falhou': False}
+_estado_lock = threading.Lock()
+_slots = {}
+_conferidos = {}
+
+def _abrir():
+    os.makedirs(os.path.dirname(os.path.abspath(BARRAMENTO_PATH)), exist_ok=True)
+    tamanho = SLOTS * _CONTADOR.size
+    with storage.file_lock(BARRAMENTO_PATH):
+        fd = os.open(BARRAMENTO_PATH, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < tamanho:
+                os.ftruncate(fd, tamanho)
+            return mmap.mmap(fd, tamanho)
+        finally:
+            os.close(fd)
+
+def _mapa():
+    mapa = _estado['mapa']
+    if mapa is not None or _estado['falhou'] or VERIFICACAO_MS <= 0:
+        return mapa
+    with _estado_lock:
+        if _estado['mapa'] is None and not _estado['falhou']:
+            try:
+                _estado['mapa'] = _abrir()
+            except (OSError, ValueError) as e:
+                print(f"Barramento de invalidação indisponível ({e}); conferindo os arquivos a cada leitura.")
+                _estado['falhou'] = True
+    return _estado['mapa']
+
+def _posicao(chave):
+    posicao = _slots.get(chave)
+    if posicao is None:
+        posicao = _slots[chave] = (zlib.crc32(chave.encode('utf-8')) % SLOTS) * _CONTADOR.size
+    return posicao
+
+def contador(chave):
+    """Contador atual de `chave` (None com o barramento desativado)."""
+    mapa = _mapa()
+    if mapa is None:
+        return None
+    return _CONTADOR.unpack_from(mapa, _posicao(chave))[0]
+
+def publicar(*chaves):
+    """Anuncia a todos os workers que os arquivos de `chaves` mudaram. Chamar depois de trocá-los."""
+    mapa = _mapa()
+    if mapa is None:
+        return
+    with storage.file_lock(BARRAMENTO_PATH):
+        for chave in chaves:
+            posicao = _posicao(chave)
+            _CONTADOR.pack_into(mapa, posicao, (_CONTADOR.unpack_from(mapa, posicao)[0] + 1) % 2 ** 64)
+
+def versao(chave, path):
+    """
+    storage.file_version(path), sem stat enquanto não houver anúncio de `chave` desde a
+    última conferência (e ela tiver menos de VERIFICACAO_MS).
+    """
+    # O contador é lido antes do stat: um anúncio feito no meio força nova conferência.
+    marca = contador(chave)
+    agora = time.monotonic()
+    conferido = _conferidos.get(chave)
+    if (marca is not None and conferido is not None and conferido[0] == marca and conferido[1] == path
+            and agora - conferido[2] < VERIFICACAO_MS / 1000):
+        return conferido[3]
+    atual = storage.file_version(path)
+    _conferidos[chave] = (marca, path, agora, atual)
+    return atual
@@ -0,0 +1,207 @@
+# data/compactacao.py
+
+import json
+import os
+import threading
+import time
+
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.parquet as pq
+
+# Os imports dos repositórios registram os datasets em data.snapshots.
+from data import (frota_repository, geoloc_repository, packing_repository, pedidos_repository,
+                  regioes_repository, rotas_repository, separacao_repository, sequencia_repository)
+from data import barramento, gravacao_adiada, schemas, snapshots, storage
+
+# Chave de ordenação de cada dataset. Com as linhas ordenadas, as estatísticas (min/max)
+# de cada row group ficam estreitas e leitores que filtram pela chave pulam o resto.
+CHAVES_ORDENACAO = {
+    'pacotes': ['AbsEntry', 'Localizacao', 'PackageID'],
+    'separacao': ['AbsEntry', 'Localizacao'],
+    'packing': ['AbsEntry', 'Localizacao', 'PackageID'],
+    'sequencia': ['Tipo', 'Ordem'],
+    'geoloc': ['AbsEntry'],
+    'rotas': ['ID_Rota'],
+    'paradas': ['ID_Rota', 'Ordem_Visita'],
+    'frota': ['ID_Caminhao'],
+    'regioes': ['Nome'],
+    'picking': ['U_TU_QuemEntrega', 'AbsEntry', 'Localizacao'],
+}
+
+# Datasets cujos row groups nunca misturam valores desta coluna (partição dentro do
+# próprio arquivo: o caminho continua o mesmo para todos os leitores).
+PARTICOES = {
+    'picking': 'U_TU_QuemEntrega',
+}
+
+# O picking é regravado pela exportação do SAP; só é compactado quando pedido (--picking).
+OPCIONAIS = {'picking'}
+
+ROW_GROUP_LINHAS = int(os.getenv('SGD_PARQUET_ROW_GROUP', '16384'))
+ESTADO_PATH = os.getenv('SGD_COMPACTACAO_ESTADO', os.path.join('instance', 'compactacao.json'))
+INTERVALO_HORAS = float(os.getenv('SGD_COMPACTACAO_INTERVALO_H', '24'))
+VERIFICACAO_SEGUNDOS = 600
+
+# Gravado nos metadados do arquivo compactado; uma gravação normal (save_*) o remove,
+# e a próxima compactação agendada refaz o arquivo.
+METADADO = b'sgd.compactacao'
+
+def _assinatura(nome):
+    return json.dumps({
+        'ordem': CHAVES_ORDENACAO[nome],
+        'particao': PARTICOES.get(nome),
+        'row_group': ROW_GROUP_LINHAS,
+        'compressao': storage.PARQUET_COMPRESSAO,
+    }, sort_keys=True).encode()
+
+def _ordenar(tabela, chaves):
+    # sort_by não aceita colunas com dicionário em chaves compostas: ordena pelos valores.
+    valores = pa.table([
+        tabela[c].cast(tabela[c].type.value_type) if pa.types.is_dictionary(tabela[c].type) else tabela[c]
+        for c in chaves
+    ], names=chaves)
+    return tabela.take(pc.sort_indices(valores, sort_keys=[(c, 'ascending') for c in chaves]))
+
+def _medir(path, nome):
+    """Tamanho, row groups e tempo de leitura (completa e filtrada pela 1ª chave) do arquivo."""
+    arquivo = pq.ParquetFile(path)
+    tabela = arquivo.read()
+    chave = next((c for c in CHAVES_ORDENACAO[nome] if c in tabela.column_names), None)
+
+    inicio = time.perf_counter()
+    pq.read_table(path)
+    leitura = time.perf_counter() - inicio
+
+    leitura_filtrada = None
+    if chave and tabela.num_rows:
+        valores = tabela[chave].drop_null()
+        if len(valores):
+            valor = valores[len(valores) // 2].as_py()
+            inicio = time.perf_counter()
+            pq.read_table(path, filters=[(chave, '==', valor)])
+            leitura_filtrada = time.perf_counter() - inicio
+
+    return {
+        'bytes': os.path.getsize(path),
+        'row_groups': arquivo.metadata.num_row_groups,
+        'leitura_ms': round(leitura * 1000, 2),
+        'leitura_filtrada_ms': None if leitura_filtrada is None else round(leitura_filtrada * 1000, 2),
+    }
+
+def _gravar(tabela, path, nome, chaves):
+    opcoes = dict(
+        compression=storage.PARQUET_COMPRESSAO,
+        write_statistics=True,
+        write_page_index=True,
+        sorting_columns=[pq.SortingColumn(tabela.column_names.index(c)) for c in chaves],
+    )
+    particao = PARTICOES.get(nome)
+    with pq.ParquetWriter(path, tabela.schema, **opcoes) as writer:
+        if particao not in tabela.column_names:
+            writer.write_table(tabela, row_group_size=ROW_GROUP_LINHAS)
+            return
+        # Tabela já ordenada pela partição: cada faixa contígua vira seus próprios row groups.
+        valores = tabela[particao].to_pylist()
+        inicio = 0
+        for fim in range(1, len(valores) + 1):
+            if fim == len(valores) or valores[fim] != valores[inicio]:
+                writer.write_table(tabela.slice(inicio, fim - inicio), row_group_size=ROW_GROUP_LINHAS)
+                inicio = fim
+
+def compactar_dataset(nome, forcar=False):
+    """
+    Regrava o parquet do dataset ordenado pela chave, com row groups de tamanho fixo,
+    compressão (SGD_PARQUET_COMPRESSAO), estatísticas e page index. Retorna o relatório
+    {'dataset', 'situacao', 'antes', 'depois'}; arquivos já compactados com a mesma
+    configuração são mantidos.
+    """
+    path = snapshots.caminho(nome)
+    if not path or not os.path.exists(path):
+        return {'dataset': nome, 'situacao': 'ausente', 'antes': None, 'depois': None}
+
+    with storage.file_lock(snapshots.caminho_lock(nome)):
+        # Regrava a partir do arquivo com as alterações do journal já aplicadas.
+        gravacao_adiada.descarregar(nome)
+        versao = snapshots.file_version(path)
+        arquivo = pq.ParquetFile(path)
+        assinatura = _assinatura(nome)
+        if not forcar and (arquivo.schema_arrow.metadata or {}).get(METADADO) == assinatura:
+            return {'dataset': nome, 'situacao': 'ok', 'antes': None, 'depois': None}
+
+        antes = _medir(path, nome)
+        tabela = schemas.conformar(nome, arquivo.read())
+        chaves = [c for c in CHAVES_ORDENACAO[nome] if c in tabela.column_names]
+        # Mesmo conteúdo: a geração do arquivo é mantida.
+        tabela = storage.with_generation(_ordenar(tabela, chaves).replace_schema_metadata({METADADO: assinatura}),
+                                         storage.read_generation(path))
+
+        tmp_path = storage.temp_path_for(path)
+        try:
+            _gravar(tabela, tmp_path, nome, chaves)
+            # Arquivos gravados fora do SGD (picking) não usam o lock: não sobrescreve uma versão mais nova.
+            if snapshots.file_version(path) != versao:
+                os.remove(tmp_path)
+                return {'dataset': nome, 'situacao': 'alterado', 'antes': antes, 'depois': None}
+            os.replace(tmp_path, path)
+            barramento.publicar(nome)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    return {'dataset': nome, 'situacao': 'compactado', 'antes': antes, 'depois': _medir(path, nome)}
+
+def compactar(nomes=None, incluir_picking=False, forcar=False):
+    """Compacta os datasets (todos os registrados, por padrão). Retorna a lista de relatórios."""
+    if nomes is None:
+        nomes = [n for n in snapshots.nomes()
+                 if n in CHAVES_ORDENACAO and (n not in OPCIONAIS or incluir_picking)]
+    return [compactar_dataset(nome, forcar=forcar) for nome in nomes]
+
+def _ler_estado():
+    try:
+        with open(ESTADO_PATH) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def compactar_se_necessario(intervalo_horas=INTERVALO_HORAS):
+    """
+    Compactação agendada: roda no máximo uma vez por intervalo, em um único processo (os
+    demais workers esperam o lock e encontram a execução já registrada). Não remove
+    linhas; o arquivamento do histórico tem agendamento próprio (data/retencao.py).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(ESTADO_PATH)), exist_ok=True)
+    with storage.file_lock(ESTADO_PATH):
+        ultima = _ler_estado().get('ultima')
+        if ultima and time.time() - ultima < intervalo_horas * 3600:
+            return None
+        relatorio = compactar()
+        storage.atomic_write_text(json.dumps({'ultima': time.time(), 'relatorio': relatorio}, indent=2), ESTADO_PATH)
+    return relatorio
+
+_agendamento = {'pid': None}
+_agendamento_lock = threading.Lock()
+
+def _loop(logger):
+    while True:
+        time.sleep(VERIFICACAO_SEGUNDOS)
+        try:
+            relatorio = compactar_se_necessario()
+        except Exception as e:
+            logger.error(f"Erro na compactação agendada: {e}", exc_info=True)
+            continue
+        if relatorio:
+            compactados = [r['dataset'] for r in relatorio if r['situacao'] == 'compactado']
+            logger.info(f"Compactação agendada concluída: {', '.join(compactados) or 'nada a fazer'}.")
+
+def iniciar_agendamento(logger):
+    """Inicia a thread de compactação no processo atual (uma vez por processo; 0h desativa)."""
+    if INTERVALO_HORAS <= 0:
+        return
+    with _agendamento_lock:
+        if _agendamento['pid'] == os.getpid():
+            return
+        _agendamento['pid'] = os.getpid()
+        threading.Thread(target=_loop, args=(logger,), name='sgd-compactacao', daemon=True).start()
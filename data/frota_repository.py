@@ -3,10 +3,12 @@
 import os
 import pandas as pd
 import uuid
+import request_context
+from data import snapshots
 
 FROTA_PARQUET_PATH = os.getenv('RIOFER_FROTA_SGD')
 
-def get_frota_data():
+def _ler_frota_data():
     if not FROTA_PARQUET_PATH or not os.path.exists(FROTA_PARQUET_PATH):
         return pd.DataFrame(columns=[
             'ID_Caminhao', 'Placa', 'Descricao', 'ID_Motorista', 'Nome_Motorista',
@@ -18,24 +20,45 @@ def get_frota_data():
         print(f"Erro ao ler o arquivo da frota: {e}")
         return pd.DataFrame()
 
+def get_frota_data():
+    return request_context.obter_dataframe('frota', lambda: snapshots.get('frota'))
+
+snapshots.registrar('frota', lambda: FROTA_PARQUET_PATH, _ler_frota_data)
+
+def get_veiculo(veiculo_id):
+    """Linha do veículo na frota da requisição (snapshot e alterações pendentes); None se não existir."""
+    df_frota = get_frota_data()
+    if df_frota.empty:
+        return None
+    veiculo = df_frota[df_frota['ID_Caminhao'] == veiculo_id]
+    return None if veiculo.empty else veiculo.iloc[0]
+
 def save_frota_data(df_frota):
     try:
-        df_frota.to_parquet(FROTA_PARQUET_PATH, index=False)
+        snapshots.gravar('frota', df_frota)
+        request_context.invalidar('frota')
         return True
     except Exception as e:
         print(f"Erro ao salvar o arquivo da frota: {e}")
         return False
 
+def atualizar_frota_data(funcao):
+    """Aplica `funcao(df) -> df` à versão atual do arquivo, sob o lock (ver snapshots.atualizar)."""
+    try:
+        snapshots.atualizar('frota', funcao)
+        request_context.invalidar('frota')
+        return True
+    except Exception as e:
+        print(f"Erro ao atualizar o arquivo da frota: {e}")
+        return False
+
 def add_veiculo(veiculo_data):
-    df_frota = get_frota_data()
-    
     # Gera um ID único para o caminhão
     veiculo_data['ID_Caminhao'] = str(uuid.uuid4())
     
     novo_veiculo = pd.DataFrame([veiculo_data])
-    df_frota = pd.concat([df_frota, novo_veiculo], ignore_index=True)
     
-    return save_frota_data(df_frota)
+    return atualizar_frota_data(lambda df_frota: pd.concat([df_frota, novo_veiculo], ignore_index=True))
 
 def update_veiculo(veiculo_id, update_data):
     df_frota = get_frota_data()
@@ -43,17 +66,17 @@ def update_veiculo(veiculo_id, update_data):
     if veiculo_id not in df_frota['ID_Caminhao'].values:
         return False, "Veículo não encontrado."
 
-    idx = df_frota[df_frota['ID_Caminhao'] == veiculo_id].index
-    df_frota.loc[idx, update_data.keys()] = update_data.values()
+    def aplicar(df_frota):
+        idx = df_frota[df_frota['ID_Caminhao'] == veiculo_id].index
+        df_frota.loc[idx, list(update_data.keys())] = list(update_data.values())
+        return df_frota
     
-    return save_frota_data(df_frota), "Dados atualizados."
+    return atualizar_frota_data(aplicar), "Dados atualizados."
 
 def delete_veiculo(veiculo_id):
     df_frota = get_frota_data()
     
     if veiculo_id not in df_frota['ID_Caminhao'].values:
         return False
-        
-    df_frota = df_frota[df_frota['ID_Caminhao'] != veiculo_id]
     
-    return save_frota_data(df_frota)
\ No newline at end of file
+    return atualizar_frota_data(lambda df_frota: df_frota[df_frota['ID_Caminhao'] != veiculo_id])
\ No newline at end of file
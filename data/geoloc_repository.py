@@ -1,9 +1,11 @@
 import os
 import pandas as pd
+import request_context
+from data import snapshots
 
 GEOLOC_PARQUET_PATH = os.getenv('RIOFER_GEOLOC_SGD')
 
-def get_geoloc_data():
+def _ler_geoloc_data():
     if not os.path.exists(GEOLOC_PARQUET_PATH):
         return pd.DataFrame(columns=['AbsEntry', 'U_SPS_Latitude', 'U_SPS_Longitude'])
     try:
@@ -11,25 +13,39 @@ def get_geoloc_data():
     except Exception:
         return pd.DataFrame(columns=['AbsEntry', 'U_SPS_Latitude', 'U_SPS_Longitude'])
 
+def get_geoloc_data():
+    return request_context.obter_dataframe('geoloc', lambda: snapshots.get('geoloc'))
+
+snapshots.registrar('geoloc', lambda: GEOLOC_PARQUET_PATH, _ler_geoloc_data)
+
 def save_geoloc_data(df_geoloc):
     try:
-        df_geoloc.to_parquet(GEOLOC_PARQUET_PATH, index=False)
+        snapshots.gravar('geoloc', df_geoloc)
+        request_context.invalidar('geoloc')
         return True
     except Exception as e:
         print(f"Erro ao salvar o arquivo de geolocalização: {e}")
         return False
 
+def atualizar_geoloc_data(funcao):
+    """Aplica `funcao(df) -> df` à versão atual do arquivo, sob o lock (ver snapshots.atualizar)."""
+    try:
+        snapshots.atualizar('geoloc', funcao)
+        request_context.invalidar('geoloc')
+        return True
+    except Exception as e:
+        print(f"Erro ao atualizar o arquivo de geolocalização: {e}")
+        return False
+
 def update_geolocation(abs_entry, latitude, longitude):
-    df_geoloc = get_geoloc_data()
-    
-    df_geoloc = df_geoloc[df_geoloc['AbsEntry'] != abs_entry]
-    
     new_data = pd.DataFrame([{
         'AbsEntry': abs_entry,
         'U_SPS_Latitude': latitude,
         'U_SPS_Longitude': longitude
     }])
+
+    def aplicar(df_geoloc):
+        df_geoloc = df_geoloc[df_geoloc['AbsEntry'] != abs_entry]
+        return pd.concat([df_geoloc, new_data], ignore_index=True)
     
-    df_final = pd.concat([df_geoloc, new_data], ignore_index=True)
-    
-    return save_geoloc_data(df_final)
\ No newline at end of file
+    return atualizar_geoloc_data(aplicar)
\ No newline at end of file
@@ -0,0 +1,212 @@
+# data/gravacao_adiada.py
+
+import json
+import os
+import threading
+from datetime import date, datetime
+
+import pandas as pd
+
+from data import barramento, schemas, snapshots, storage
+
+# Gravação adiada (write-behind) dos datasets muito alterados no pico da separação. Cada
+# alteração é acrescentada ao journal do dataset (JOURNAL_DIR/<dataset>.jsonl, com fsync)
+# e a requisição segue. A cada INTERVALO_MS, ou ao juntar MAX_ALTERACOES, o journal
+# inteiro é aplicado ao parquet em uma gravação só. As leituras de todos os workers
+# (data/snapshots) veem o arquivo mais o journal, então ninguém lê dados defasados.
+#
+# As alterações são idempotentes (definem o estado das linhas de uma chave): se o processo
+# cair entre gravar o parquet e limpar o journal, reaplicá-las não muda o resultado.
+JOURNAL_DIR = os.getenv('RIOFER_JOURNAL_SGD', os.path.join('instance', 'journal'))
+INTERVALO_MS = int(os.getenv('SGD_GRAVACAO_INTERVALO_MS', '500'))
+MAX_ALTERACOES = int(os.getenv('SGD_GRAVACAO_MAX_ALTERACOES', '50'))
+
+_datasets = set()
+_cache = {}
+_cache_lock = threading.Lock()
+_estado = {'pid': None}
+_estado_lock = threading.Lock()
+_acordar = threading.Event()
+
+def _journal(nome):
+    return os.path.join(JOURNAL_DIR, f"{nome}.jsonl")
+
+def _chave_barramento(nome):
+    return f"journal:{nome}"
+
+def _serializar(valor):
+    if isinstance(valor, (datetime, date, pd.Timestamp)):
+        return valor.isoformat()
+    if pd.isna(valor):
+        return None
+    if hasattr(valor, 'item'):  # escalares numpy
+        return valor.item()
+    raise TypeError(f"Valor não serializável no journal: {valor!r}")
+
+def _ler_journal(nome):
+    """(versão do arquivo, alterações, tamanho em bytes lido). Ignora uma última linha incompleta."""
+    path = _journal(nome)
+    versao = barramento.versao(_chave_barramento(nome), path)
+    if versao is None:
+        return None, [], 0
+    with _cache_lock:
+        atual = _cache.get(nome)
+    if atual is not None and atual[0] == versao:
+        return atual
+
+    with open(path, 'rb') as fh:
+        dados = fh.read()
+    alteracoes, lido = [], 0
+    for linha in dados.splitlines(keepends=True):
+        if not linha.endswith(b'\n'):
+            break
+        alteracoes.append(json.loads(linha))
+        lido += len(linha)
+    resultado = (versao, alteracoes, lido)
+    with _cache_lock:
+        _cache[nome] = resultado
+    return resultado
+
+# --- Alterações ---
+
+def _mascara(df, chave):
+    mascara = pd.Series(True, index=df.index)
+    for coluna, valor in chave.items():
+        if coluna not in df.columns:
+            return pd.Series(False, index=df.index)
+        mascara &= (df[coluna] == valor).fillna(False).astype(bool)
+    return mascara
+
+def _tipado(nome, linhas):
+    return schemas.para_pandas(nome, pd.DataFrame(linhas))
+
+def _aplicar_alteracao(nome, df, alteracao):
+    if alteracao['op'] == 'lote':
+        for parte in alteracao['alteracoes']:
+            df = _aplicar_alteracao(nome, df, parte)
+        return df
+
+    chave = alteracao['chave']
+    mascara = _mascara(df, chave)
+    if alteracao['op'] == 'substituir':
+        df = df[~mascara]
+        if alteracao['linhas']:
+            df = pd.concat([df, _tipado(nome, alteracao['linhas'])], ignore_index=True)
+        return df
+
+    valores = alteracao['valores']
+    if mascara.any():
+        df = df.copy()
+        novos = _tipado(nome, [valores])
+        for coluna in valores:
+            if coluna in df.columns and isinstance(df[coluna].dtype, pd.CategoricalDtype):
+                df[coluna] = df[coluna].astype(object)
+            df.loc[mascara, coluna] = novos[coluna].iloc[0]
+    elif alteracao.get('inserir'):
+        df = pd.concat([df, _tipado(nome, [{**chave, **valores}])], ignore_index=True)
+    return df
+
+def aplicar(nome, estado, df):
+    """Aplica as alterações do journal (estado de capturar) ao DataFrame, em ordem."""
+    for alteracao in estado[1]:
+        df = _aplicar_alteracao(nome, df, alteracao)
+    return df
+
+def capturar(nome):
+    """Estado das pendências do dataset para as leituras (data/snapshots); None sem pendências."""
+    versao, alteracoes, _ = _ler_journal(nome)
+    return (versao, alteracoes) if alteracoes else None
+
+def _enfileirar(nome, alteracao):
+    os.makedirs(JOURNAL_DIR, exist_ok=True)
+    linha = (json.dumps(alteracao, default=_serializar, ensure_ascii=False) + '\n').encode('utf-8')
+    path = _journal(nome)
+    with storage.file_lock(path):
+        with open(path, 'ab') as fh:
+            fh.write(linha)
+            fh.flush()
+            os.fsync(fh.fileno())
+        barramento.publicar(_chave_barramento(nome))
+
+    if _estado['pid'] != os.getpid():
+        # Sem a thread de gravação neste processo (scripts, debug): grava na hora.
+        descarregar(nome)
+    elif len(_ler_journal(nome)[1]) >= MAX_ALTERACOES:
+        _acordar.set()
+
+def alteracao_substituir(chave, linhas):
+    """Substitui todas as linhas de `chave` ({coluna: valor}) por `linhas` (lista de dicts)."""
+    return {'op': 'substituir', 'chave': chave, 'linhas': list(linhas)}
+
+def alteracao_definir(chave, valores, inserir=False):
+    """Define `valores` nas linhas de `chave`; com inserir=True, cria a linha se não existir."""
+    return {'op': 'definir', 'chave': chave, 'valores': valores, 'inserir': inserir}
+
+def substituir(nome, chave, linhas):
+    _enfileirar(nome, alteracao_substituir(chave, linhas))
+
+def definir(nome, chave, valores, inserir=False):
+    _enfileirar(nome, alteracao_definir(chave, valores, inserir=inserir))
+
+def em_lote(nome, alteracoes):
+    """
+    Registra várias alterações (alteracao_substituir/alteracao_definir) do dataset em uma
+    única linha do journal: entram todas ou nenhuma, e sem a thread de gravação o parquet
+    é regravado uma vez só.
+    """
+    alteracoes = list(alteracoes)
+    if alteracoes:
+        _enfileirar(nome, {'op': 'lote', 'alteracoes': alteracoes})
+
+def descarregar(nome):
+    """Aplica o journal do dataset ao parquet em uma única gravação. Retorna quantas alterações."""
+    path = _journal(nome)
+    # Sem journal (nenhuma alteração adiada desde a instalação) não há o que aplicar, e
+    # o lock nem teria onde ser criado antes de _enfileirar criar o JOURNAL_DIR.
+    if not os.path.exists(path):
+        return 0
+    with storage.file_lock(snapshots.caminho_lock(nome)):
+        with storage.file_lock(path):
+            versao, alteracoes, lido = _ler_journal(nome)
+        if not alteracoes:
+            return 0
+
+        df = snapshots.ler_atual(nome, pendentes=False)
+        snapshots.gravar(nome, aplicar(nome, (versao, alteracoes), df))
+
+        # Remove só o que foi aplicado: alterações que chegaram durante a gravação ficam.
+        with storage.file_lock(path):
+            with open(path, 'rb') as fh:
+                fh.seek(lido)
+                restante = fh.read()
+            storage.atomic_write_bytes(restante, path)
+            barramento.publicar(_chave_barramento(nome))
+    return len(alteracoes)
+
+def descarregar_tudo():
+    return {nome: descarregar(nome) for nome in sorted(_datasets)}
+
+def registrar(nome):
+    """Liga a gravação adiada para o dataset (as leituras passam a incluir o journal)."""
+    _datasets.add(nome)
+    snapshots.registrar_pendentes(nome, capturar, aplicar)
+
+def _loop(logger):
+    while True:
+        _acordar.wait(INTERVALO_MS / 1000)
+        _acordar.clear()
+        for nome in sorted(_datasets):
+            try:
+                descarregar(nome)
+            except Exception as e:
+                logger.error(f"Erro ao gravar as alterações pendentes de '{nome}': {e}", exc_info=True)
+
+def iniciar(logger):
+    """Inicia a thread de gravação no processo atual (uma vez por processo; intervalo 0 desativa)."""
+    if INTERVALO_MS <= 0:
+        return
+    with _estado_lock:
+        if _estado['pid'] == os.getpid():
+            return
+        _estado['pid'] = os.getpid()
+        threading.Thread(target=_loop, args=(logger,), name='sgd-gravacao', daemon=True).start()
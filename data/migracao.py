@@ -0,0 +1,43 @@
+# data/migracao.py
+
+import os
+
+import pyarrow.parquet as pq
+
+# Os imports dos repositórios registram os datasets em data.snapshots.
+from data import (frota_repository, geoloc_repository, packing_repository, pedidos_repository,
+                  regioes_repository, rotas_repository, separacao_repository, sequencia_repository)
+from data import barramento, schemas, snapshots, storage
+
+# Gerado fora do SGD (exportação do SAP): não é regravado aqui; ganha o schema declarado
+# na conversão do snapshot.
+DATASETS_EXTERNOS = {'picking'}
+
+def migrar(simular=False):
+    """
+    Regrava uma única vez cada parquet do SGD no schema declarado (data/schemas.py):
+    chaves int64, textos repetitivos com dicionário e datas como timestamp. Arquivos já
+    no schema não são tocados, então rodar de novo não faz nada.
+    Retorna [(dataset, situacao, bytes em memória antes, depois)].
+    """
+    relatorio = []
+    for nome in snapshots.nomes():
+        path = snapshots.caminho(nome)
+        if nome in DATASETS_EXTERNOS:
+            relatorio.append((nome, 'externo', None, None))
+            continue
+        if not path or not os.path.exists(path):
+            relatorio.append((nome, 'ausente', None, None))
+            continue
+
+        with storage.file_lock(snapshots.caminho_lock(nome)):
+            atual = pq.read_table(path)
+            tabela = schemas.conformar(nome, atual)
+            if tabela.schema.equals(atual.schema, check_metadata=False):
+                relatorio.append((nome, 'ok', atual.nbytes, tabela.nbytes))
+                continue
+            if not simular:
+                storage.atomic_write_parquet(storage.with_next_generation(tabela, path), path)
+                barramento.publicar(nome)
+        relatorio.append((nome, 'simulado' if simular else 'migrado', atual.nbytes, tabela.nbytes))
+    return relatorio
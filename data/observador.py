@@ -0,0 +1,135 @@
+# data/observador.py
+
+import ctypes
+import ctypes.util
+import os
+import select
+import threading
+import time
+
+from data import snapshots
+
+# Observa os arquivos dos datasets (RIOFER_*_SGD) e carrega cada versão nova em segundo
+# plano: snapshot Arrow, DataFrame e índices derivados (ao_recarregar). Usa inotify no
+# Linux; sem ele, verifica os arquivos a cada INTERVALO_SEGUNDOS.
+INTERVALO_SEGUNDOS = float(os.getenv('SGD_OBSERVADOR_INTERVALO', '2'))
+# Uma versão só é carregada depois de ficar este tempo sem mudar (exportação terminada).
+ESTABILIZACAO_SEGUNDOS = float(os.getenv('SGD_OBSERVADOR_ESTABILIZACAO', '1'))
+
+# Eventos de diretório que indicam arquivo novo ou regravado (inclusive os.replace).
+_IN_CLOSE_WRITE = 0x008
+_IN_MOVED_TO = 0x080
+_IN_CREATE = 0x100
+_IN_DELETE = 0x200
+
+_estado = {'pid': None}
+_estado_lock = threading.Lock()
+_callbacks = []
+
+def ao_recarregar(funcao):
+    """`funcao(nomes)` é chamada na thread do observador depois de cada recarga (set de datasets)."""
+    _callbacks.append(funcao)
+
+class _Inotify:
+    def __init__(self, diretorios):
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        self.fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), 'inotify_init1')
+        mascara = _IN_CLOSE_WRITE | _IN_MOVED_TO | _IN_CREATE | _IN_DELETE
+        for diretorio in diretorios:
+            if libc.inotify_add_watch(self.fd, os.fsencode(diretorio), mascara) < 0:
+                erro = ctypes.get_errno()
+                os.close(self.fd)
+                raise OSError(erro, f'inotify_add_watch {diretorio}')
+
+    def esperar(self, timeout):
+        """Espera algum evento (ou o timeout) e descarta os eventos pendentes."""
+        prontos, _, _ = select.select([self.fd], [], [], timeout)
+        if prontos:
+            try:
+                while os.read(self.fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+def _diretorios():
+    diretorios = set()
+    for nome in snapshots.nomes():
+        path = snapshots.caminho(nome)
+        if path:
+            diretorio = os.path.dirname(os.path.abspath(path))
+            if os.path.isdir(diretorio):
+                diretorios.add(diretorio)
+    return sorted(diretorios)
+
+def _abrir_inotify(logger):
+    try:
+        return _Inotify(_diretorios())
+    except (OSError, AttributeError) as e:
+        logger.info(f"Observador de arquivos sem inotify ({e}); verificando a cada {INTERVALO_SEGUNDOS}s.")
+        return None
+
+def verificar(candidatos, agora=None):
+    """
+    Recarrega os datasets cuja versão no disco difere da carregada e está estável desde a
+    verificação anterior. `candidatos` ({nome: (versão, desde)}) guarda as versões vistas;
+    `desde` None marca uma versão que falhou ao carregar (só tenta de novo quando mudar).
+    Retorna o set de datasets recarregados.
+    """
+    agora = time.monotonic() if agora is None else agora
+    recarregados = set()
+    for nome in snapshots.nomes():
+        versao = snapshots.file_version(snapshots.caminho(nome))
+        if versao is None or versao == snapshots.versao_carregada(nome):
+            candidatos.pop(nome, None)
+            continue
+        visto = candidatos.get(nome)
+        if visto is None or visto[0] != versao:
+            candidatos[nome] = (versao, agora)
+            continue
+        if visto[1] is None or agora - visto[1] < ESTABILIZACAO_SEGUNDOS:
+            continue
+        try:
+            snapshots.recarregar(nome)
+        except Exception as e:
+            # Arquivo incompleto ou ilegível: as leituras seguem na versão anterior até o
+            # arquivo mudar de novo.
+            print(f"Erro ao recarregar '{nome}' em segundo plano: {e}")
+            candidatos[nome] = (versao, None)
+            continue
+        candidatos.pop(nome, None)
+        recarregados.add(nome)
+    return recarregados
+
+def _loop(logger):
+    inotify = _abrir_inotify(logger)
+    candidatos = {}
+    while True:
+        try:
+            recarregados = verificar(candidatos)
+            if recarregados:
+                for funcao in _callbacks:
+                    funcao(recarregados)
+                logger.info(f"Datasets recarregados em segundo plano: {', '.join(sorted(recarregados))}.")
+        except Exception as e:
+            logger.error(f"Erro no observador de arquivos: {e}", exc_info=True)
+
+        pendentes = any(desde is not None for _, desde in candidatos.values())
+        espera = min(INTERVALO_SEGUNDOS, ESTABILIZACAO_SEGUNDOS) if pendentes else INTERVALO_SEGUNDOS
+        if inotify is None:
+            time.sleep(espera)
+        else:
+            # Sem eventos, acorda só para confirmar versões pendentes ou como verificação de segurança.
+            inotify.esperar(espera if pendentes else max(INTERVALO_SEGUNDOS, 30))
+
+def iniciar(logger):
+    """Inicia o observador no processo atual (uma vez por processo; intervalo 0 desativa)."""
+    if INTERVALO_SEGUNDOS <= 0:
+        return
+    with _estado_lock:
+        if _estado['pid'] == os.getpid():
+            return
+        _estado['pid'] = os.getpid()
+        snapshots.ativar_segundo_plano()
+        threading.Thread(target=_loop, args=(logger,), name='sgd-observador', daemon=True).start()
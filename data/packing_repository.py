@@ -2,10 +2,12 @@
 
 import os
 import pandas as pd
+import request_context
+from data import gravacao_adiada, snapshots
 
 PACKING_PARQUET_PATH = os.getenv('RIOFER_PACKING_SGD')
 
-def get_packing_data():
+def _ler_packing_data():
     default_cols = ['AbsEntry', 'Localizacao']
     
     if not os.path.exists(PACKING_PARQUET_PATH):
@@ -16,10 +18,31 @@ def get_packing_data():
         print(f"Erro ao ler o arquivo de packing: {e}")
         return pd.DataFrame(columns=default_cols)
 
-def save_packing_data(df_packing_final):
+def get_packing_data():
+    return request_context.obter_dataframe('packing', lambda: snapshots.get('packing'))
+
+snapshots.registrar('packing', lambda: PACKING_PARQUET_PATH, _ler_packing_data)
+gravacao_adiada.registrar('packing')
+
+def substituir_packing(abs_entry, localizacao, linhas):
+    """Troca a conferência de (abs_entry, localizacao) por `linhas`, com gravação adiada (data/gravacao_adiada)."""
+    try:
+        gravacao_adiada.substituir('packing', {'AbsEntry': abs_entry, 'Localizacao': localizacao}, linhas)
+        request_context.invalidar('packing')
+        return True
+    except Exception as e:
+        print(f"Erro ao registrar a conferência de packing: {e}")
+        return False
+
+def substituir_packing_em_lote(linhas_por_chave):
+    """substituir_packing para vários {(abs_entry, localizacao): linhas} em uma única alteração."""
     try:
-        df_packing_final.to_parquet(PACKING_PARQUET_PATH, index=False)
+        gravacao_adiada.em_lote('packing', [
+            gravacao_adiada.alteracao_substituir({'AbsEntry': abs_entry, 'Localizacao': localizacao}, linhas)
+            for (abs_entry, localizacao), linhas in linhas_por_chave.items()
+        ])
+        request_context.invalidar('packing')
         return True
     except Exception as e:
-        print(f"Erro ao salvar o arquivo de packing: {e}")
-        return False
\ No newline at end of file
+        print(f"Erro ao registrar as conferências de packing: {e}")
+        return False
@@ -3,11 +3,13 @@
 import os
 import pandas as pd
 from datetime import datetime
+import request_context
+from data import alteracoes_picking, gravacao_adiada, snapshots
 
 PICKING_PARQUET_PATH = os.getenv('RIOFER_PICKING_SGD')
 PACOTES_PARQUET_PATH = os.getenv('RIOFER_PACOTES_SGD')
 
-def get_picking_data():
+def _ler_picking_data():
     if not PICKING_PARQUET_PATH or not os.path.exists(PICKING_PARQUET_PATH):
         print("Aviso: Arquivo de picking não encontrado.")
         return pd.DataFrame()
@@ -17,6 +19,13 @@ def get_picking_data():
         print(f"Erro ao ler o arquivo de picking: {e}")
         return pd.DataFrame()
 
+def get_picking_data():
+    return request_context.obter_dataframe('picking', lambda: snapshots.get('picking'))
+
+snapshots.registrar('picking', lambda: PICKING_PARQUET_PATH, _ler_picking_data, externo=True)
+# Cada exportação nova é comparada com a anterior (feed em data/alteracoes_picking).
+snapshots.ao_publicar('picking', alteracoes_picking.registrar_publicacao)
+
 def get_picking_file_mtime():
     if not PICKING_PARQUET_PATH or not os.path.exists(PICKING_PARQUET_PATH):
         return "Arquivo de dados base não encontrado."
@@ -27,7 +36,10 @@ def get_picking_file_mtime():
         print(f"Erro ao obter a data de modificação do arquivo de picking: {e}")
         return "Não foi possível verificar a atualização."
 
-def get_pacotes_data():
+def get_picking_file_version():
+    return snapshots.versao('picking')
+
+def _ler_pacotes_data():
     if not os.path.exists(PACOTES_PARQUET_PATH):
         return pd.DataFrame(columns=['AbsEntry', 'Localizacao', 'PackageID', 'Weight', 'ItemCode', 'ItemName', 'Quantity', 'Report', 'Location'])
     try:
@@ -36,10 +48,31 @@ def get_pacotes_data():
         print(f"Erro ao ler o arquivo de pacotes: {e}")
         return pd.DataFrame()
 
-def save_pacotes_data(df_pacotes_final):
+def get_pacotes_data():
+    return request_context.obter_dataframe('pacotes', lambda: snapshots.get('pacotes'))
+
+snapshots.registrar('pacotes', lambda: PACOTES_PARQUET_PATH, _ler_pacotes_data)
+gravacao_adiada.registrar('pacotes')
+
+def substituir_pacotes(abs_entry, localizacao, linhas):
+    """Troca os pacotes de (abs_entry, localizacao) por `linhas`, com gravação adiada (data/gravacao_adiada)."""
+    try:
+        gravacao_adiada.substituir('pacotes', {'AbsEntry': abs_entry, 'Localizacao': localizacao}, linhas)
+        request_context.invalidar('pacotes')
+        return True
+    except Exception as e:
+        print(f"Erro ao registrar os pacotes: {e}")
+        return False
+
+def substituir_pacotes_em_lote(linhas_por_chave):
+    """substituir_pacotes para vários {(abs_entry, localizacao): linhas} em uma única alteração."""
     try:
-        df_pacotes_final.to_parquet(PACOTES_PARQUET_PATH, index=False)
+        gravacao_adiada.em_lote('pacotes', [
+            gravacao_adiada.alteracao_substituir({'AbsEntry': abs_entry, 'Localizacao': localizacao}, linhas)
+            for (abs_entry, localizacao), linhas in linhas_por_chave.items()
+        ])
+        request_context.invalidar('pacotes')
         return True
     except Exception as e:
-        print(f"Erro ao salvar o arquivo de pacotes: {e}")
-        return False
\ No newline at end of file
+        print(f"Erro ao registrar os pacotes: {e}")
+        return False
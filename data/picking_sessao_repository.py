@@ -0,0 +1,212 @@
+# data/picking_sessao_repository.py
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+PICKING_SESSOES_DB_PATH = os.getenv('RIOFER_PICKING_SESSOES_SGD', os.path.join('instance', 'picking_sessoes.sqlite3'))
+SESSAO_MAX_IDADE = 7 * 24 * 3600
+
+_local = threading.local()
+
+def _get_conn():
+    conn = getattr(_local, 'conn', None)
+    if conn is not None and getattr(_local, 'pid', None) == os.getpid():
+        return conn
+
+    directory = os.path.dirname(PICKING_SESSOES_DB_PATH)
+    if directory and not os.path.exists(directory):
+        os.makedirs(directory, exist_ok=True)
+
+    conn = sqlite3.connect(PICKING_SESSOES_DB_PATH, timeout=10, isolation_level=None)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.executescript('''
+        CREATE TABLE IF NOT EXISTS pickings (
+            sid TEXT NOT NULL,
+            picking_key TEXT NOT NULL,
+            abs_entry INTEGER NOT NULL,
+            localizacao TEXT NOT NULL,
+            start_time TEXT,
+            updated_at REAL NOT NULL,
+            PRIMARY KEY (sid, picking_key)
+        );
+        CREATE TABLE IF NOT EXISTS pacotes (
+            sid TEXT NOT NULL,
+            picking_key TEXT NOT NULL,
+            pacote_id INTEGER NOT NULL,
+            dados TEXT NOT NULL,
+            PRIMARY KEY (sid, picking_key, pacote_id)
+        );
+        CREATE TABLE IF NOT EXISTS operacoes_sync (
+            op_id TEXT PRIMARY KEY,
+            sid TEXT NOT NULL,
+            picking_key TEXT NOT NULL,
+            resultado TEXT NOT NULL,
+            criado_em REAL NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS itens_pedido (
+            sid TEXT NOT NULL,
+            picking_key TEXT NOT NULL,
+            dados TEXT NOT NULL,
+            PRIMARY KEY (sid, picking_key)
+        );
+    ''')
+    _local.conn = conn
+    _local.pid = os.getpid()
+    return conn
+
+class transacao:
+    """
+    BEGIN IMMEDIATE ... COMMIT/ROLLBACK na conexão da thread. Transações aninhadas
+    passam a fazer parte da mais externa, permitindo compor várias operações.
+    """
+
+    def __enter__(self):
+        self.conn = _get_conn()
+        self.externa = getattr(_local, 'profundidade', 0) == 0
+        if self.externa:
+            self.conn.execute('BEGIN IMMEDIATE')
+        _local.profundidade = getattr(_local, 'profundidade', 0) + 1
+        return self.conn
+
+    def __exit__(self, exc_type, exc, tb):
+        _local.profundidade -= 1
+        if self.externa:
+            self.conn.execute('ROLLBACK' if exc_type else 'COMMIT')
+        return False
+
+def _pacote_from_row(pacote_id, dados):
+    pacote = json.loads(dados)
+    pacote['id'] = pacote_id
+    return pacote
+
+def _dump_pacote(pacote):
+    return json.dumps({k: v for k, v in pacote.items() if k != 'id'})
+
+def _touch(conn, sid, picking_key):
+    conn.execute('UPDATE pickings SET updated_at = ? WHERE sid = ? AND picking_key = ?',
+                 (time.time(), sid, picking_key))
+
+def iniciar_picking(sid, picking_key, abs_entry, localizacao, start_time, pacotes=None, itens_pedido=None):
+    with transacao() as conn:
+        conn.execute('DELETE FROM pickings WHERE updated_at < ?', (time.time() - SESSAO_MAX_IDADE,))
+        conn.execute('DELETE FROM operacoes_sync WHERE criado_em < ?', (time.time() - SESSAO_MAX_IDADE,))
+        for tabela in ('pacotes', 'itens_pedido'):
+            conn.execute(f'DELETE FROM {tabela} WHERE NOT EXISTS (SELECT 1 FROM pickings p '
+                         f'WHERE p.sid = {tabela}.sid AND p.picking_key = {tabela}.picking_key)')
+            conn.execute(f'DELETE FROM {tabela} WHERE sid = ? AND picking_key = ?', (sid, picking_key))
+        conn.execute(
+            'INSERT OR REPLACE INTO pickings (sid, picking_key, abs_entry, localizacao, start_time, updated_at) '
+            'VALUES (?, ?, ?, ?, ?, ?)',
+            (sid, picking_key, int(abs_entry), localizacao, start_time, time.time())
+        )
+        for i, pacote in enumerate(pacotes or []):
+            pacote = {'uid': uuid.uuid4().hex, **pacote}
+            conn.execute('INSERT INTO pacotes (sid, picking_key, pacote_id, dados) VALUES (?, ?, ?, ?)',
+                         (sid, picking_key, i + 1, _dump_pacote(pacote)))
+        if itens_pedido is not None:
+            conn.execute('INSERT INTO itens_pedido (sid, picking_key, dados) VALUES (?, ?, ?)',
+                         (sid, picking_key, json.dumps(itens_pedido)))
+
+def get_itens_pedido(sid, picking_key):
+    """Itens do pedido copiados no início da separação (None se não foram guardados)."""
+    row = _get_conn().execute('SELECT dados FROM itens_pedido WHERE sid = ? AND picking_key = ?',
+                              (sid, picking_key)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def salvar_itens_pedido(sid, picking_key, itens_pedido):
+    _get_conn().execute('INSERT OR REPLACE INTO itens_pedido (sid, picking_key, dados) VALUES (?, ?, ?)',
+                        (sid, picking_key, json.dumps(itens_pedido)))
+
+def picking_existe(sid, picking_key):
+    row = _get_conn().execute('SELECT 1 FROM pickings WHERE sid = ? AND picking_key = ?',
+                              (sid, picking_key)).fetchone()
+    return row is not None
+
+def get_picking(sid, picking_key):
+    conn = _get_conn()
+    row = conn.execute('SELECT abs_entry, localizacao, start_time FROM pickings WHERE sid = ? AND picking_key = ?',
+                       (sid, picking_key)).fetchone()
+    if row is None:
+        return None
+    return {
+        'abs_entry': row[0],
+        'localizacao': row[1],
+        'start_time': row[2],
+        'pacotes': get_pacotes(sid, picking_key)
+    }
+
+def get_pacotes(sid, picking_key):
+    rows = _get_conn().execute(
+        'SELECT pacote_id, dados FROM pacotes WHERE sid = ? AND picking_key = ? ORDER BY pacote_id',
+        (sid, picking_key)
+    ).fetchall()
+    return [_pacote_from_row(pacote_id, dados) for pacote_id, dados in rows]
+
+def get_pacote(sid, picking_key, pacote_id):
+    row = _get_conn().execute(
+        'SELECT pacote_id, dados FROM pacotes WHERE sid = ? AND picking_key = ? AND pacote_id = ?',
+        (sid, picking_key, pacote_id)
+    ).fetchone()
+    return _pacote_from_row(*row) if row else None
+
+def get_pacote_por_uid(sid, picking_key, uid):
+    return next((p for p in get_pacotes(sid, picking_key) if p.get('uid') == uid), None)
+
+def adicionar_pacote(sid, picking_key, pacote):
+    """
+    Insere o pacote com o próximo ID sequencial e o retorna com 'id' e 'uid' preenchidos.
+    O 'uid' é estável (não muda com a renumeração) e pode vir do cliente offline.
+    """
+    pacote = {**pacote, 'uid': pacote.get('uid') or uuid.uuid4().hex}
+    with transacao() as conn:
+        (ultimo_id,) = conn.execute('SELECT COALESCE(MAX(pacote_id), 0) FROM pacotes WHERE sid = ? AND picking_key = ?',
+                                    (sid, picking_key)).fetchone()
+        novo_id = ultimo_id + 1
+        conn.execute('INSERT INTO pacotes (sid, picking_key, pacote_id, dados) VALUES (?, ?, ?, ?)',
+                     (sid, picking_key, novo_id, _dump_pacote(pacote)))
+        _touch(conn, sid, picking_key)
+    return {**pacote, 'id': novo_id}
+
+def atualizar_pacote(sid, picking_key, pacote):
+    with transacao() as conn:
+        cursor = conn.execute('UPDATE pacotes SET dados = ? WHERE sid = ? AND picking_key = ? AND pacote_id = ?',
+                              (_dump_pacote(pacote), sid, picking_key, pacote['id']))
+        _touch(conn, sid, picking_key)
+        return cursor.rowcount > 0
+
+def excluir_pacote(sid, picking_key, pacote_id):
+    """Remove o pacote e renumera os seguintes, mantendo os IDs sequenciais (1..N)."""
+    with transacao() as conn:
+        cursor = conn.execute('DELETE FROM pacotes WHERE sid = ? AND picking_key = ? AND pacote_id = ?',
+                              (sid, picking_key, pacote_id))
+        if cursor.rowcount == 0:
+            return False
+        # Renumeração em dois passos para não violar a chave primária no meio do UPDATE.
+        conn.execute('UPDATE pacotes SET pacote_id = -pacote_id WHERE sid = ? AND picking_key = ? AND pacote_id > ?',
+                     (sid, picking_key, pacote_id))
+        conn.execute('UPDATE pacotes SET pacote_id = -pacote_id - 1 WHERE sid = ? AND picking_key = ? AND pacote_id < 0',
+                     (sid, picking_key))
+        _touch(conn, sid, picking_key)
+        return True
+
+def remover_picking(sid, picking_key):
+    with transacao() as conn:
+        conn.execute('DELETE FROM pacotes WHERE sid = ? AND picking_key = ?', (sid, picking_key))
+        conn.execute('DELETE FROM itens_pedido WHERE sid = ? AND picking_key = ?', (sid, picking_key))
+        conn.execute('DELETE FROM pickings WHERE sid = ? AND picking_key = ?', (sid, picking_key))
+
+def get_operacao(op_id):
+    row = _get_conn().execute('SELECT resultado FROM operacoes_sync WHERE op_id = ?', (op_id,)).fetchone()
+    return json.loads(row[0]) if row else None
+
+def registrar_operacao(op_id, sid, picking_key, resultado):
+    """Registra a operação sincronizada; deve ser chamada na mesma transação que a aplicou."""
+    _get_conn().execute(
+        'INSERT INTO operacoes_sync (op_id, sid, picking_key, resultado, criado_em) VALUES (?, ?, ?, ?, ?)',
+        (op_id, sid, picking_key, json.dumps(resultado), time.time())
+    )
@@ -2,10 +2,12 @@
 
 import os
 import pandas as pd
+import request_context
+from data import snapshots
 
 REGIOES_PARQUET_PATH = os.getenv('RIOFER_REGIOES_SGD')
 
-def get_regioes_data():
+def _ler_regioes_data():
     if not REGIOES_PARQUET_PATH or not os.path.exists(REGIOES_PARQUET_PATH):
         return pd.DataFrame(columns=['Nome', 'Cidades'])
     try:
@@ -14,9 +16,18 @@ def get_regioes_data():
         print(f"Erro ao ler o arquivo de regiões: {e}")
         return pd.DataFrame(columns=['Nome', 'Cidades'])
 
+def get_regioes_data():
+    return request_context.obter_dataframe('regioes', lambda: snapshots.get('regioes'))
+
+snapshots.registrar('regioes', lambda: REGIOES_PARQUET_PATH, _ler_regioes_data)
+
+def get_regioes_file_version():
+    return snapshots.versao('regioes')
+
 def save_regioes_data(df_regioes):
     try:
-        df_regioes.to_parquet(REGIOES_PARQUET_PATH, index=False)
+        snapshots.gravar('regioes', df_regioes)
+        request_context.invalidar('regioes')
         return True
     except Exception as e:
         print(f"Erro ao salvar o arquivo de regiões: {e}")
@@ -0,0 +1,199 @@
+# data/retencao.py
+
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+# Os imports dos repositórios registram os datasets em data.snapshots.
+from data import packing_repository, pedidos_repository, separacao_repository
+from data import barramento, gravacao_adiada, schemas, snapshots, storage
+
+ARQUIVO_DIR = os.getenv('RIOFER_ARQUIVO_SGD', os.path.join('instance', 'arquivo'))
+ESTADO_PATH = os.getenv('SGD_ARQUIVAMENTO_ESTADO', os.path.join('instance', 'arquivamento.json'))
+# O arquivamento remove linhas dos arquivos quentes: só é agendado quando configurado
+# (0 = apenas manual, por `flask sgd archive`).
+INTERVALO_HORAS = float(os.getenv('SGD_ARQUIVAMENTO_INTERVALO_H', '0'))
+VERIFICACAO_SEGUNDOS = 600
+
+# Datasets com retenção: os arquivos "quentes" guardam só o trabalho em aberto; o que já
+# foi concluído e saiu da exportação do picking vai para ARQUIVO_DIR/<dataset>/mes=AAAA-MM/.
+# Pacotes primeiro: a partição deles usa a data de conclusão que ainda está na separação.
+DATASETS = ('pacotes', 'packing', 'separacao')
+COLUNA_PARTICAO = 'mes'
+
+def _particao(instantes):
+    """'AAAA-MM' da conclusão; registros sem data vão para o mês do arquivamento."""
+    mes_atual = datetime.now().strftime('%Y-%m')
+    texto = pc.strftime(instantes, format='%Y-%m')
+    return pc.fill_null(texto, mes_atual)
+
+def _fim_da_separacao(tabela):
+    """
+    Pacotes não têm data própria: usam o fim da separação da mesma localização (lido do
+    snapshot atual da separação, que é arquivada depois dos pacotes).
+    """
+    separacao = snapshots.get_table('separacao')
+    separacao = schemas.conformar('separacao', separacao if separacao is not None else pa.table({}))
+    fim = pa.table({
+        'AbsEntry': separacao['AbsEntry'],
+        'Localizacao': separacao['Localizacao'].cast(pa.string()),
+        '__fim': separacao['EndTime'],
+    }).group_by(['AbsEntry', 'Localizacao'], use_threads=False).aggregate([('__fim', 'max')])
+    indice = pa.table({
+        'AbsEntry': tabela['AbsEntry'],
+        'Localizacao': tabela['Localizacao'].cast(pa.string()),
+        '__linha': pa.array(range(tabela.num_rows), type=pa.int64()),
+    })
+    return indice.join(fim, keys=['AbsEntry', 'Localizacao'], join_type='left outer').sort_by('__linha')['__fim_max']
+
+def _concluidos(nome, tabela):
+    """Máscara dos registros concluídos e a data de conclusão usada na partição."""
+    if nome == 'pacotes':
+        # Pacotes só existem depois que a separação foi finalizada.
+        return pa.chunked_array([pa.array([True] * tabela.num_rows, type=pa.bool_())]), _fim_da_separacao(tabela)
+    return pc.is_valid(tabela['EndTime']), tabela['EndTime']
+
+def _caminho_arquivo(nome, mes, versao):
+    # Nome derivado da versão do arquivo quente: uma execução interrompida antes de regravar
+    # o arquivo quente, quando repetida, sobrescreve o mesmo arquivo (sem duplicar histórico).
+    sufixo = f"{versao[0]}-{versao[1]}"
+    return os.path.join(ARQUIVO_DIR, nome, f"{COLUNA_PARTICAO}={mes}", f"part-{sufixo}.parquet")
+
+def arquivar_dataset(nome, abertos, simular=False):
+    """
+    Move para o arquivo os registros concluídos de `nome` cujo AbsEntry não está em
+    `abertos` (AbsEntry do snapshot de picking). Retorna {'dataset', 'quentes', 'arquivados'}.
+    """
+    path = snapshots.caminho(nome)
+    if not path or not os.path.exists(path):
+        return {'dataset': nome, 'quentes': 0, 'arquivados': 0}
+
+    with storage.file_lock(snapshots.caminho_lock(nome)):
+        # Alterações ainda no journal entram no arquivo antes: arquivado o registro, uma
+        # alteração pendente dele não teria mais onde ser aplicada.
+        gravacao_adiada.descarregar(nome)
+        versao = snapshots.file_version(path)
+        tabela = schemas.conformar(nome, pq.read_table(path))
+
+        concluido, instantes = _concluidos(nome, tabela)
+        fora_do_picking = pc.invert(pc.is_in(tabela['AbsEntry'], value_set=abertos))
+        mover = pc.and_(concluido, fora_do_picking)
+        total = pc.sum(pc.cast(mover, pa.int64())).as_py() or 0
+
+        if total == 0 or simular:
+            return {'dataset': nome, 'quentes': tabela.num_rows - total, 'arquivados': total}
+
+        arquivados = tabela.filter(mover)
+        meses = _particao(instantes.filter(mover))
+        for mes in pc.unique(meses).to_pylist():
+            destino = _caminho_arquivo(nome, mes, versao)
+            os.makedirs(os.path.dirname(destino), exist_ok=True)
+            storage.atomic_write_parquet(arquivados.filter(pc.equal(meses, mes)), destino)
+
+        if snapshots.file_version(path) != versao:
+            # Alterado durante o arquivamento: o histórico gravado será sobrescrito na próxima execução.
+            return {'dataset': nome, 'quentes': tabela.num_rows, 'arquivados': 0}
+        storage.atomic_write_parquet(storage.with_next_generation(tabela.filter(pc.invert(mover)), path), path)
+        barramento.publicar(nome)
+    return {'dataset': nome, 'quentes': tabela.num_rows - total, 'arquivados': total}
+
+def arquivar(simular=False):
+    """
+    Arquiva separações, pacotes e conferências de packing concluídos de pedidos que já
+    saíram da exportação do picking. Sem picking (arquivo ausente ou vazio) nada é movido.
+    """
+    picking = snapshots.get_table('picking', ['AbsEntry'])
+    if picking is None or picking.num_rows == 0:
+        return []
+    abertos = pc.unique(picking['AbsEntry'])
+    return [arquivar_dataset(nome, abertos, simular=simular) for nome in DATASETS]
+
+def _ler_estado():
+    try:
+        with open(ESTADO_PATH) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def arquivar_se_necessario(intervalo_horas=INTERVALO_HORAS):
+    """
+    Arquivamento agendado: roda no máximo uma vez por intervalo, em um único processo (os
+    demais workers esperam o lock e encontram a execução já registrada).
+    """
+    os.makedirs(os.path.dirname(os.path.abspath(ESTADO_PATH)), exist_ok=True)
+    with storage.file_lock(ESTADO_PATH):
+        ultima = _ler_estado().get('ultima')
+        if ultima and time.time() - ultima < intervalo_horas * 3600:
+            return None
+        relatorio = arquivar()
+        storage.atomic_write_text(json.dumps({'ultima': time.time(), 'relatorio': relatorio}, indent=2), ESTADO_PATH)
+    return relatorio
+
+_agendamento = {'pid': None}
+_agendamento_lock = threading.Lock()
+
+def _loop(logger):
+    while True:
+        time.sleep(VERIFICACAO_SEGUNDOS)
+        try:
+            relatorio = arquivar_se_necessario()
+        except Exception as e:
+            logger.error(f"Erro no arquivamento agendado: {e}", exc_info=True)
+            continue
+        if relatorio is not None:
+            total = sum(item['arquivados'] for item in relatorio)
+            logger.info(f"Arquivamento agendado concluído: {total} registro(s) arquivado(s).")
+
+def iniciar_agendamento(logger):
+    """Inicia a thread de arquivamento no processo atual (uma vez por processo; 0h, o padrão, desativa)."""
+    if INTERVALO_HORAS <= 0:
+        return
+    with _agendamento_lock:
+        if _agendamento['pid'] == os.getpid():
+            return
+        _agendamento['pid'] = os.getpid()
+        threading.Thread(target=_loop, args=(logger,), name='sgd-arquivamento', daemon=True).start()
+
+def _ler_arquivo(nome, filtro):
+    diretorio = os.path.join(ARQUIVO_DIR, nome)
+    if not os.path.isdir(diretorio):
+        return None
+    dataset = ds.dataset(diretorio, format='parquet', partitioning='hive')
+    return dataset.to_table(filter=filtro).drop_columns([COLUNA_PARTICAO])
+
+def consultar_historico(nome, abs_entry=None, localizacao=None):
+    """
+    Registros de `nome` (separacao, pacotes ou packing) nos arquivos quentes e no arquivo
+    histórico, com a coluna 'Arquivado'. Para auditoria: não usar no caminho das requisições.
+    """
+    filtro = None
+    if abs_entry is not None:
+        filtro = ds.field('AbsEntry') == int(abs_entry)
+    if localizacao is not None:
+        condicao = ds.field('Localizacao') == localizacao
+        filtro = condicao if filtro is None else filtro & condicao
+
+    partes = []
+    quente = snapshots.get_table(nome)
+    if quente is not None:
+        partes.append((quente.filter(filtro) if filtro is not None else quente, False))
+    arquivado = _ler_arquivo(nome, filtro)
+    if arquivado is not None:
+        partes.append((arquivado, True))
+
+    frames = []
+    for tabela, flag in partes:
+        df = tabela.to_pandas()
+        df['Arquivado'] = flag
+        frames.append(df)
+    if not frames:
+        return schemas.para_pandas(nome, pd.DataFrame()).assign(Arquivado=pd.Series(dtype=bool))
+    return pd.concat(frames, ignore_index=True)
@@ -3,12 +3,15 @@
 import os
 import pandas as pd
 from datetime import datetime
+import request_context
+from data import barramento, schemas, snapshots, storage
 
 ROTAS_PARQUET_PATH = os.getenv('RIOFER_ROTAS_SGD')
 PARADAS_PARQUET_PATH = os.getenv('RIOFER_PARADAS_SGD')
+# Contador de IDs ao lado do arquivo de rotas (sem RIOFER_ROTAS_SGD não há onde criá-lo).
+ROTAS_SEQ_PATH = f"{ROTAS_PARQUET_PATH}.seq" if ROTAS_PARQUET_PATH else None
 
-def get_rotas_data():
-    """Carrega os dados das rotas."""
+def _ler_rotas_data():
     if not ROTAS_PARQUET_PATH or not os.path.exists(ROTAS_PARQUET_PATH):
         return pd.DataFrame(columns=[
             'ID_Rota', 'ID_Caminhao', 'Placa_Caminhao', 'Nome_Motorista', 'Data_Rota', 
@@ -16,18 +19,31 @@ def get_rotas_data():
         ])
     return pd.read_parquet(ROTAS_PARQUET_PATH)
 
-def get_paradas_data():
-    """Carrega os dados das paradas das rotas."""
+def get_rotas_data():
+    """Carrega os dados das rotas (uma vez por requisição)."""
+    return request_context.obter_dataframe('rotas', lambda: snapshots.get('rotas'))
+
+snapshots.registrar('rotas', lambda: ROTAS_PARQUET_PATH, _ler_rotas_data)
+
+def _ler_paradas_data():
     if not PARADAS_PARQUET_PATH or not os.path.exists(PARADAS_PARQUET_PATH):
         return pd.DataFrame(columns=[
             'ID_Rota', 'AbsEntry', 'CardName', 'Ordem_Visita', 'Status_Parada'
         ])
     return pd.read_parquet(PARADAS_PARQUET_PATH)
 
+def get_paradas_data():
+    """Carrega os dados das paradas das rotas (uma vez por requisição)."""
+    return request_context.obter_dataframe('paradas', lambda: snapshots.get('paradas'))
+
+# Rotas e paradas são gravadas juntas: as paradas usam o lock das rotas.
+snapshots.registrar('paradas', lambda: PARADAS_PARQUET_PATH, _ler_paradas_data, lock='rotas')
+
 def save_rotas_data(df_rotas):
     """Salva os dados das rotas."""
     try:
-        df_rotas.to_parquet(ROTAS_PARQUET_PATH, index=False)
+        snapshots.gravar('rotas', df_rotas)
+        request_context.invalidar('rotas')
         return True
     except Exception as e:
         print(f"Erro ao salvar arquivo de rotas: {e}")
@@ -36,15 +52,68 @@ def save_rotas_data(df_rotas):
 def save_paradas_data(df_paradas):
     """Salva os dados das paradas."""
     try:
-        df_paradas.to_parquet(PARADAS_PARQUET_PATH, index=False)
+        snapshots.gravar('paradas', df_paradas)
+        request_context.invalidar('paradas')
         return True
     except Exception as e:
         print(f"Erro ao salvar arquivo de paradas: {e}")
         return False
 
+def _ler_contador_rotas():
+    try:
+        with open(ROTAS_SEQ_PATH) as fh:
+            return int(fh.read().strip())
+    except (FileNotFoundError, ValueError):
+        pass
+    # Primeira execução: inicializa o contador a partir do maior ID já gravado.
+    if ROTAS_PARQUET_PATH and os.path.exists(ROTAS_PARQUET_PATH):
+        ids = snapshots.get_dataframe('rotas', ['ID_Rota'])['ID_Rota']
+        if not ids.empty:
+            return int(ids.max())
+    return 0
+
 def get_next_rota_id():
-    """Gera um novo ID sequencial para a rota."""
-    df_rotas = get_rotas_data()
-    if df_rotas.empty:
-        return 1
-    return df_rotas['ID_Rota'].max() + 1
\ No newline at end of file
+    """
+    Gera um novo ID sequencial para a rota a partir de um contador persistente com lock
+    de arquivo. Retorna None se o arquivo de rotas não estiver configurado.
+    """
+    if not ROTAS_SEQ_PATH:
+        print("Erro ao gerar o ID da rota: RIOFER_ROTAS_SGD não está configurado.")
+        return None
+    with storage.file_lock(ROTAS_SEQ_PATH):
+        proximo_id = _ler_contador_rotas() + 1
+        storage.atomic_write_text(str(proximo_id), ROTAS_SEQ_PATH)
+    return proximo_id
+
+def create_rota_com_paradas(nova_rota, novas_paradas):
+    """
+    Grava a rota e suas paradas em uma única transação: ambos os arquivos são escritos
+    em temporários e só então trocados, com o lock de rotas segurado do início ao fim.
+    As rotas são trocadas primeiro: se o processo cair entre as duas trocas, fica uma
+    rota sem paradas (visível e editável), e não paradas de uma rota que não existe
+    prendendo os pedidos fora de get_pedidos_disponiveis.
+    """
+    try:
+        with storage.file_lock(ROTAS_PARQUET_PATH):
+            # Lê do disco (e não do contexto da requisição) já com o lock segurado.
+            df_rotas = pd.concat([_ler_rotas_data(), pd.DataFrame([nova_rota])], ignore_index=True)
+            df_paradas = _ler_paradas_data()
+            if novas_paradas:
+                df_paradas = pd.concat([df_paradas, pd.DataFrame(novas_paradas)], ignore_index=True)
+
+            tabela_paradas = storage.with_next_generation(schemas.conformar('paradas', df_paradas), PARADAS_PARQUET_PATH)
+            tabela_rotas = storage.with_next_generation(schemas.conformar('rotas', df_rotas), ROTAS_PARQUET_PATH)
+            tmp_paradas = storage.write_parquet_temp(tabela_paradas, PARADAS_PARQUET_PATH)
+            try:
+                tmp_rotas = storage.write_parquet_temp(tabela_rotas, ROTAS_PARQUET_PATH)
+            except Exception:
+                os.remove(tmp_paradas)
+                raise
+            os.replace(tmp_rotas, ROTAS_PARQUET_PATH)
+            os.replace(tmp_paradas, PARADAS_PARQUET_PATH)
+            barramento.publicar('rotas', 'paradas')
+        request_context.invalidar('rotas', 'paradas')
+        return True
+    except Exception as e:
+        print(f"Erro ao salvar rota e paradas: {e}")
+        return False
\ No newline at end of file
@@ -0,0 +1,182 @@
+# data/schemas.py
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
+
+# Tipos usados nos arquivos do SGD. Textos de baixa cardinalidade (localização, tipo de
+# entrega, unidade, cliente...) são gravados com dicionário: cada valor distinto aparece
+# uma vez no arquivo e as linhas guardam só o índice. No pandas viram 'category'.
+CHAVE = pa.int64()
+INTEIRO = pa.int64()
+NUMERO = pa.float64()
+TEXTO = pa.string()
+CATEGORIA = pa.dictionary(pa.int32(), pa.string())
+INSTANTE = pa.timestamp('us')
+
+# Colunas-chave: nunca nulas (valores inválidos viram 0, como na antiga conversão na leitura).
+CHAVES = {'AbsEntry', 'ID_Rota'}
+
+# Schema declarado de cada dataset. Colunas não declaradas são gravadas como vierem;
+# colunas declaradas que faltarem são criadas (nulas).
+SCHEMAS = {
+    'picking': {
+        'AbsEntry': CHAVE,
+        'CardName': CATEGORIA,
+        'U_TU_QuemEntrega': CATEGORIA,
+        'Localizacao': CATEGORIA,
+        'ItemCode': TEXTO,
+        'ItemName': TEXTO,
+        'UomCode': CATEGORIA,
+        'RelQtty': NUMERO,
+        'SWeight1': NUMERO,
+        'U_GI_Cidade': CATEGORIA,
+        'U_GI_Estado': CATEGORIA,
+    },
+    'pacotes': {
+        'AbsEntry': CHAVE,
+        'Localizacao': CATEGORIA,
+        'PackageID': INTEIRO,
+        'Weight': NUMERO,
+        'ItemCode': TEXTO,
+        'ItemName': TEXTO,
+        'Quantity': NUMERO,
+        'UomCode': CATEGORIA,
+        'Report': TEXTO,
+        'Location': CATEGORIA,
+    },
+    'separacao': {
+        'AbsEntry': CHAVE,
+        'Localizacao': CATEGORIA,
+        'User': TEXTO,
+        'StartTime': INSTANTE,
+        'EndTime': INSTANTE,
+        'DiscrepancyLog': TEXTO,
+        'DiscrepancyReport': TEXTO,
+    },
+    'packing': {
+        'AbsEntry': CHAVE,
+        'Localizacao': CATEGORIA,
+        'PackageID': INTEIRO,
+        'User': TEXTO,
+        'StartTime': INSTANTE,
+        'EndTime': INSTANTE,
+        'Anomalias': TEXTO,
+    },
+    'sequencia': {
+        'AbsEntry': CHAVE,
+        'Tipo': CATEGORIA,
+        'Ordem': INTEIRO,
+    },
+    'geoloc': {
+        'AbsEntry': CHAVE,
+        'U_SPS_Latitude': NUMERO,
+        'U_SPS_Longitude': NUMERO,
+    },
+    'rotas': {
+        'ID_Rota': CHAVE,
+        'ID_Caminhao': TEXTO,
+        'Placa_Caminhao': TEXTO,
+        'Nome_Motorista': TEXTO,
+        'Data_Rota': INSTANTE,
+        'Status': CATEGORIA,
+        'Meta_KG': NUMERO,
+        'Data_Limite': INSTANTE,
+        'Observacoes': TEXTO,
+        'Tipo': CATEGORIA,
+    },
+    'paradas': {
+        'ID_Rota': CHAVE,
+        'AbsEntry': CHAVE,
+        'CardName': CATEGORIA,
+        'Ordem_Visita': INTEIRO,
+        'Status_Parada': CATEGORIA,
+    },
+    'frota': {
+        'ID_Caminhao': TEXTO,
+        'Placa': TEXTO,
+        'Descricao': TEXTO,
+        'ID_Motorista': TEXTO,
+        'Nome_Motorista': TEXTO,
+        'Capacidade_KG': NUMERO,
+        'Tolerancia': NUMERO,
+        'Status': TEXTO,
+    },
+    'regioes': {
+        'Nome': TEXTO,
+    },
+}
+
+def tipo_coluna(nome, coluna, padrao=TEXTO):
+    """Tipo declarado da coluna (sem o dicionário), ou `padrao` se não declarada."""
+    return _valor_base(SCHEMAS.get(nome, {}).get(coluna, padrao))
+
+def _valor_base(tipo):
+    return tipo.value_type if pa.types.is_dictionary(tipo) else tipo
+
+def _preparar_serie(serie, tipo):
+    """Converte a coluna do DataFrame para algo que o Arrow aceite no tipo declarado."""
+    if isinstance(serie.dtype, pd.CategoricalDtype):
+        serie = serie.astype(object)
+    base = _valor_base(tipo)
+    if pa.types.is_integer(base) or pa.types.is_floating(base):
+        return pd.to_numeric(serie, errors='coerce')
+    if pa.types.is_timestamp(base):
+        if pd.api.types.is_datetime64_any_dtype(serie):
+            return serie
+        return pd.to_datetime(serie, errors='coerce', format='ISO8601')
+    return serie.astype(object).map(lambda v: v if v is None or isinstance(v, str) else (None if pd.isna(v) else str(v)))
+
+def _cast(array, tipo):
+    try:
+        return pc.cast(array, tipo)
+    except (pa.ArrowInvalid, pa.ArrowNotImplementedError, pa.ArrowTypeError):
+        pass
+    # Arquivos antigos (texto em coluna numérica/data, vazio como ''): mesma coerção da gravação.
+    serie = _preparar_serie(array.to_pandas(), tipo)
+    return pa.array(serie, from_pandas=True).cast(tipo, safe=False)
+
+def _converter_coluna(array, tipo, chave=False):
+    if array.type != tipo:
+        if pa.types.is_dictionary(array.type):
+            array = array.cast(array.type.value_type)
+        base = _valor_base(tipo)
+        if array.type != base:
+            array = _cast(array, base)
+        if pa.types.is_dictionary(tipo):
+            array = array.dictionary_encode()
+    if chave and array.null_count:
+        array = pc.fill_null(array, 0)
+    return array
+
+def conformar(nome, dados):
+    """
+    Retorna uma pyarrow.Table com o schema declarado do dataset `nome`, a partir de um
+    DataFrame (gravações) ou de uma Table (arquivos gerados fora do SGD ou antigos).
+    """
+    schema = SCHEMAS.get(nome, {})
+    if isinstance(dados, pd.DataFrame):
+        preparado = dados.reset_index(drop=True).copy()
+        for coluna, tipo in schema.items():
+            if coluna in preparado.columns:
+                preparado[coluna] = _preparar_serie(preparado[coluna], tipo)
+        tabela = pa.Table.from_pandas(preparado, preserve_index=False)
+    else:
+        tabela = dados
+
+    colunas, arrays = [], []
+    for coluna in tabela.column_names:
+        array = tabela[coluna]
+        if coluna in schema:
+            array = _converter_coluna(array, schema[coluna], coluna in CHAVES)
+        colunas.append(coluna)
+        arrays.append(array)
+    for coluna, tipo in schema.items():
+        if coluna not in colunas:
+            colunas.append(coluna)
+            arrays.append(_converter_coluna(pa.nulls(tabela.num_rows, type=_valor_base(tipo)), tipo, coluna in CHAVES))
+    return pa.table(arrays, names=colunas)
+
+def para_pandas(nome, dados):
+    """DataFrame já tipado (chaves int64, categorias, datas) do dataset."""
+    return conformar(nome, dados).to_pandas()
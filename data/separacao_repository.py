@@ -2,29 +2,48 @@
 
 import os
 import pandas as pd
+import request_context
+from data import gravacao_adiada, snapshots
 
 SEPARACAO_PARQUET_PATH = os.getenv('RIOFER_SEPARACAO_SGD')
 
-def get_separacao_data():
-    default_cols = ['AbsEntry', 'Localizacao', 'User', 'StartTime', 'EndTime', 'DiscrepancyLog', 'DiscrepancyReport']
-    
+DEFAULT_COLS = ['AbsEntry', 'Localizacao', 'User', 'StartTime', 'EndTime', 'DiscrepancyLog', 'DiscrepancyReport']
+
+def _ler_separacao_data():
     if not os.path.exists(SEPARACAO_PARQUET_PATH):
-        return pd.DataFrame(columns=default_cols)
+        return pd.DataFrame(columns=DEFAULT_COLS)
     
     try:
-        df = pd.read_parquet(SEPARACAO_PARQUET_PATH)
-        for col in default_cols:
-            if col not in df.columns:
-                df[col] = '' if col != 'AbsEntry' else 0
-        return df
+        return pd.read_parquet(SEPARACAO_PARQUET_PATH)
     except Exception as e:
         print(f"Erro ao ler o arquivo de separação: {e}")
-        return pd.DataFrame(columns=default_cols)
+        return pd.DataFrame(columns=DEFAULT_COLS)
+
+def get_separacao_data():
+    return request_context.obter_dataframe('separacao', lambda: snapshots.get('separacao'))
+
+snapshots.registrar('separacao', lambda: SEPARACAO_PARQUET_PATH, _ler_separacao_data)
+gravacao_adiada.registrar('separacao')
+
+def definir_separacao(abs_entry, localizacao, valores, inserir=False):
+    """Altera a separação (abs_entry, localizacao) com gravação adiada (data/gravacao_adiada)."""
+    try:
+        gravacao_adiada.definir('separacao', {'AbsEntry': abs_entry, 'Localizacao': localizacao}, valores, inserir=inserir)
+        request_context.invalidar('separacao')
+        return True
+    except Exception as e:
+        print(f"Erro ao registrar a alteração da separação: {e}")
+        return False
 
-def save_separacao_data(df_separacao_final):
+def definir_separacoes_em_lote(valores_por_chave, inserir=False):
+    """definir_separacao para vários {(abs_entry, localizacao): valores} em uma única alteração."""
     try:
-        df_separacao_final.to_parquet(SEPARACAO_PARQUET_PATH, index=False)
+        gravacao_adiada.em_lote('separacao', [
+            gravacao_adiada.alteracao_definir({'AbsEntry': abs_entry, 'Localizacao': localizacao}, valores, inserir=inserir)
+            for (abs_entry, localizacao), valores in valores_por_chave.items()
+        ])
+        request_context.invalidar('separacao')
         return True
     except Exception as e:
-        print(f"Erro ao salvar o arquivo de separação: {e}")
-        return False
\ No newline at end of file
+        print(f"Erro ao registrar as alterações das separações: {e}")
+        return False
@@ -2,10 +2,12 @@
 
 import os
 import pandas as pd
+import request_context
+from data import snapshots
 
 SEQUENCIA_PARQUET_PATH = os.getenv('RIOFER_SEQUENCIA_SGD')
 
-def get_sequencia_data():
+def _ler_sequencia_data():
     if not os.path.exists(SEQUENCIA_PARQUET_PATH):
         return pd.DataFrame(columns=['AbsEntry', 'Tipo', 'Ordem'])
     try:
@@ -14,10 +16,26 @@ def get_sequencia_data():
         print(f"Erro ao ler o arquivo de sequência: {e}")
         return pd.DataFrame(columns=['AbsEntry', 'Tipo', 'Ordem'])
 
+def get_sequencia_data():
+    return request_context.obter_dataframe('sequencia', lambda: snapshots.get('sequencia'))
+
+snapshots.registrar('sequencia', lambda: SEQUENCIA_PARQUET_PATH, _ler_sequencia_data)
+
 def save_sequencia_data(df_sequencia):
     try:
-        df_sequencia.to_parquet(SEQUENCIA_PARQUET_PATH, index=False)
+        snapshots.gravar('sequencia', df_sequencia)
+        request_context.invalidar('sequencia')
         return True
     except Exception as e:
         print(f"Erro ao salvar o arquivo de sequência: {e}")
+        return False
+
+def atualizar_sequencia_data(funcao):
+    """Aplica `funcao(df) -> df` à versão atual do arquivo, sob o lock (ver snapshots.atualizar)."""
+    try:
+        snapshots.atualizar('sequencia', funcao)
+        request_context.invalidar('sequencia')
+        return True
+    except Exception as e:
+        print(f"Erro ao atualizar o arquivo de sequência: {e}")
         return False
\ No newline at end of file
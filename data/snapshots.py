@@ -0,0 +1,444 @@
+# data/snapshots.py
+
+import hashlib
+import json
+import os
+import threading
+from contextlib import contextmanager
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+from data import barramento, schemas, storage
+
+SNAPSHOTS_DIR = os.getenv('RIOFER_SNAPSHOTS_SGD', os.path.join('instance', 'snapshots'))
+MANIFEST_PATH = os.path.join(SNAPSHOTS_DIR, 'manifest.json')
+# Tentativas de abrir a versão atual quando outro processo a troca no meio da leitura.
+TENTATIVAS = 3
+
+_lock = threading.Lock()
+_snapshots = {}
+_tabelas = {}
+_datasets = {}
+_ao_publicar = {}
+_externos = set()
+_locks = {}
+_pendentes = {}
+_sobrepostos = {}
+_segundo_plano = {'pid': None}
+_leituras = threading.local()
+
+file_version = storage.file_version
+
+def registrar(nome, get_path, loader, externo=False, lock=None):
+    """
+    Registra um dataset do repositório. `loader` é a leitura direta (usada quando o
+    arquivo não existe ou o snapshot falha). Os dados sempre saem com o schema
+    declarado em data/schemas.py, venham do snapshot ou do loader. `externo` indica
+    um arquivo gravado fora do SGD (exportação do SAP); `lock`, o dataset cujo lock
+    protege as gravações deste (arquivos gravados juntos, como rotas e paradas).
+    """
+    _datasets[nome] = (get_path, loader)
+    if externo:
+        _externos.add(nome)
+    if lock:
+        _locks[nome] = lock
+
+def ao_publicar(nome, funcao):
+    """
+    `funcao(anterior, atual, versao_anterior, versao)` é chamada uma vez a cada versão
+    publicada do dataset (no processo que converteu, sob o lock do manifest), com a
+    tabela do snapshot anterior (None se não houver).
+    """
+    _ao_publicar[nome] = funcao
+
+def caminho(nome):
+    return _datasets[nome][0]()
+
+def nomes():
+    return list(_datasets)
+
+def registrar_pendentes(nome, capturar, aplicar):
+    """
+    Alterações do dataset já aceitas e ainda não gravadas no arquivo (data/gravacao_adiada.py):
+    `capturar(nome)` retorna um estado (None sem pendências, senão uma tupla cujo 1º item
+    identifica a versão das pendências) e `aplicar(nome, estado, df)` o DataFrame com as
+    alterações. As leituras (get/get_table) enxergam o arquivo mais essas alterações.
+    """
+    _pendentes[nome] = (capturar, aplicar)
+
+def caminho_lock(nome):
+    """Arquivo cujo lock serializa as gravações do dataset."""
+    return caminho(_locks.get(nome, nome))
+
+def _versao_disco(nome):
+    """
+    Versão do arquivo no disco. Os arquivos gravados pelo SGD anunciam cada gravação no
+    barramento (data/barramento.py), e o stat só é feito quando há anúncio; os externos
+    (exportação do SAP) não anunciam e são sempre conferidos.
+    """
+    if nome in _externos:
+        return file_version(caminho(nome))
+    return barramento.versao(nome, caminho(nome))
+
+class _VersaoSuperada(RuntimeError):
+    """O arquivo mudou enquanto a versão pedida era convertida."""
+
+def _ler_direto(nome):
+    _, loader = _datasets[nome]
+    return schemas.para_pandas(nome, loader())
+
+# --- Snapshots Arrow IPC (um arquivo por versão do parquet, compartilhado via mmap) ---
+
+def _ler_manifest():
+    try:
+        with open(MANIFEST_PATH) as fh:
+            return json.load(fh)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _arquivo_snapshot(nome, versao):
+    digest = hashlib.sha1(repr(versao).encode()).hexdigest()[:16]
+    return os.path.join(SNAPSHOTS_DIR, f"{nome}-{digest}.arrow")
+
+def _snapshot_publicado(nome, versao):
+    entrada = _ler_manifest().get(nome)
+    if entrada and tuple(entrada['versao']) == versao and os.path.exists(entrada['arquivo']):
+        return entrada['arquivo']
+    return None
+
+def _ler_parquet(nome, path):
+    # Um único open: lido pelo caminho, o parquet é aberto mais de uma vez (metadados e
+    # dados) e pode misturar duas versões se outro processo trocar o arquivo no meio.
+    with pa.OSFile(path) as fh:
+        lida = pq.read_table(fh)
+    # Arquivos antigos ou gerados fora do SGD (picking) ganham o schema declarado aqui.
+    return storage.with_generation(schemas.conformar(nome, lida), storage.table_generation(lida))
+
+def _converter(nome, path, versao):
+    """
+    Converte o parquet em um arquivo Arrow IPC (sem compressão, para leitura zero-copy)
+    e o publica no manifest. Só um processo converte cada versão; os demais esperam o
+    lock e reaproveitam o arquivo publicado.
+    """
+    os.makedirs(SNAPSHOTS_DIR, exist_ok=True)
+    with storage.file_lock(MANIFEST_PATH):
+        arquivo = _snapshot_publicado(nome, versao)
+        if arquivo:
+            return arquivo
+
+        tabela = _ler_parquet(nome, path)
+        # A versão pode ter mudado durante a leitura: publica apenas se o arquivo lido ainda é o atual.
+        if file_version(path) != versao:
+            raise _VersaoSuperada(f"O arquivo de '{nome}' mudou durante a conversão.")
+
+        arquivo = _arquivo_snapshot(nome, versao)
+        tmp_path = storage.temp_path_for(arquivo)
+        try:
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, tabela.schema) as writer:
+                    writer.write_table(tabela)
+            os.replace(tmp_path, arquivo)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        manifest = _ler_manifest()
+        anterior = manifest.get(nome, {}).get('arquivo')
+        versao_anterior = manifest.get(nome, {}).get('versao')
+        manifest[nome] = {'versao': list(versao), 'arquivo': arquivo, 'linhas': tabela.num_rows}
+        storage.atomic_write_text(json.dumps(manifest, indent=2, sort_keys=True), MANIFEST_PATH)
+
+        if nome in _ao_publicar:
+            try:
+                tabela_anterior = None
+                if anterior and anterior != arquivo and os.path.exists(anterior):
+                    tabela_anterior = pa.ipc.open_file(pa.memory_map(anterior, 'r')).read_all()
+                _ao_publicar[nome](tabela_anterior, tabela, versao_anterior, versao)
+            except Exception as e:
+                print(f"Erro ao processar a nova versão de '{nome}': {e}")
+
+        # Quem ainda tem o arquivo antigo mapeado continua lendo normalmente após o unlink.
+        if anterior and anterior != arquivo and os.path.exists(anterior):
+            os.remove(anterior)
+        return arquivo
+
+def ativar_segundo_plano():
+    """
+    Chamada pelo observador (data/observador.py) ao iniciar no processo: a partir daí os
+    datasets externos só trocam de versão quando o observador termina de carregar a nova.
+    As leituras continuam no snapshot anterior, sem esperar o parse nem ver um arquivo
+    pela metade. Os datasets gravados pelo próprio SGD continuam lendo a versão do disco.
+    """
+    _segundo_plano['pid'] = os.getpid()
+
+def _em_segundo_plano(nome):
+    return nome in _externos and _segundo_plano['pid'] == os.getpid()
+
+def versao(nome):
+    """Versão que as leituras do dataset enxergam agora (chave para caches derivados)."""
+    if _em_segundo_plano(nome):
+        with _lock:
+            atual = _tabelas.get(nome)
+        if atual is not None:
+            return atual[0]
+    return _versao_disco(nome)
+
+def versao_carregada(nome):
+    with _lock:
+        atual = _tabelas.get(nome)
+    return atual[0] if atual is not None else None
+
+def _abrir(nome, path, versao):
+    """
+    (versão, Table) do snapshot de `versao`. Se a versão não for estável (outro processo
+    gravou no meio, o snapshot publicado foi removido antes do mmap ou o arquivo ainda
+    está sendo exportado e não é um parquet válido), confere o arquivo de novo e tenta a
+    versão atual, até TENTATIVAS vezes. None se não conseguir.
+    """
+    for _ in range(TENTATIVAS):
+        if versao is None:
+            return None
+        try:
+            arquivo = _snapshot_publicado(nome, versao) or _converter(nome, path, versao)
+            return versao, pa.ipc.open_file(pa.memory_map(arquivo, 'r')).read_all()
+        except (_VersaoSuperada, OSError, pa.ArrowInvalid):
+            versao = file_version(path)
+    return None
+
+def recarregar(nome):
+    """
+    Carrega a versão atual do arquivo (snapshot Arrow e, se o processo já usa, o
+    DataFrame) e troca as duas de uma vez. Retorna a versão carregada (None sem arquivo).
+    """
+    path = caminho(nome)
+    versao = file_version(path)
+    if versao is None:
+        return None
+    aberta = _abrir(nome, path, versao)
+    if aberta is None:
+        # O observador trata o erro como arquivo instável e tenta de novo na próxima mudança.
+        raise _VersaoSuperada(f"O arquivo de '{nome}' mudou a cada tentativa de carregá-lo.")
+    versao, tabela = aberta
+    with _lock:
+        usa_pandas = nome in _snapshots
+    df = tabela.to_pandas() if usa_pandas else None
+    with _lock:
+        _tabelas[nome] = (versao, tabela)
+        if df is not None:
+            _snapshots[nome] = (versao, df)
+    return versao
+
+def _tabela_base(nome):
+    """
+    (versão, Table) do arquivo, sem pendências; (None, None) se o arquivo não existir.
+    Com gravações seguidas de outros processos, ou um arquivo externo ainda incompleto,
+    fica com a última versão carregada (sem nenhuma, lê o parquet diretamente ou usa o
+    loader registrado) em vez de falhar a leitura.
+    """
+    with _lock:
+        atual = _tabelas.get(nome)
+    if atual is not None and _em_segundo_plano(nome):
+        return atual
+
+    path = caminho(nome)
+    versao = _versao_disco(nome)
+    if versao is None:
+        return None, None
+
+    if atual is not None and atual[0] == versao:
+        return atual
+    aberta = _abrir(nome, path, versao)
+    if aberta is None:
+        if atual is not None:
+            return atual
+        try:
+            # Sem versão estável nem carregada: o os.replace garante um arquivo completo,
+            # que não entra em _tabelas porque a versão dele não é conhecida.
+            return None, _ler_parquet(nome, path)
+        except FileNotFoundError:
+            return None, None
+        except (OSError, pa.ArrowInvalid) as e:
+            # Arquivo externo pela metade: a mesma resposta da leitura direta (o loader
+            # registrado, normalmente vazio), no schema declarado.
+            print(f"Erro ao ler '{nome}', usando a leitura direta: {e}")
+            return None, schemas.conformar(nome, _datasets[nome][1]())
+    with _lock:
+        _tabelas[nome] = aberta
+    return aberta
+
+def _capturar_pendentes(nome):
+    fonte = _pendentes.get(nome)
+    return fonte[0](nome) if fonte else None
+
+def _sobreposto(nome, versao, estado, base):
+    """(Table, DataFrame) do arquivo com as pendências, em cache por versão do arquivo e das pendências."""
+    chave = (versao, estado[0])
+    with _lock:
+        atual = _sobrepostos.get(nome)
+    if atual is not None and atual[0] == chave:
+        return atual[1]
+
+    if base is None:
+        df = _ler_direto(nome)
+    elif isinstance(base, pa.Table):
+        df = base.to_pandas()
+    else:
+        df = base.copy()
+    tabela = schemas.conformar(nome, _pendentes[nome][1](nome, estado, df))
+    resultado = (tabela, tabela.to_pandas())
+    # Sem versão, mas com base, é a leitura direta de _tabela_base: não identifica o arquivo.
+    if versao is not None or base is None:
+        with _lock:
+            _sobrepostos[nome] = (chave, resultado)
+    return resultado
+
+def get_table(nome, colunas=None, pendentes=True):
+    """
+    pyarrow.Table do dataset, mapeada em memória a partir do snapshot Arrow da versão
+    atual do parquet (convertido na primeira leitura). Todos os workers mapeiam o mesmo
+    arquivo e compartilham as páginas físicas. Alterações ainda não gravadas
+    (registrar_pendentes) entram por cima, salvo com pendentes=False. Retorna None se o
+    arquivo não existir (e não houver pendências).
+    """
+    # Pendências antes do arquivo: se a gravação delas terminar no meio, elas são
+    # reaplicadas sobre o arquivo novo (as alterações são idempotentes).
+    estado = _capturar_pendentes(nome) if pendentes else None
+    versao, tabela = _tabela_base(nome)
+    if pendentes:
+        _anotar(nome, (versao, estado[0] if estado is not None else None))
+    if estado is not None:
+        tabela = _sobreposto(nome, versao, estado, tabela)[0]
+    if tabela is None:
+        return None
+    return tabela.select(colunas) if colunas else tabela
+
+def get_dataframe(nome, colunas):
+    """Converte para pandas apenas as colunas pedidas (sem passar pelo snapshot pandas completo)."""
+    tabela = get_table(nome, colunas)
+    if tabela is None:
+        df = _ler_direto(nome)
+        return df[[c for c in colunas if c in df.columns]]
+    return tabela.to_pandas()
+
+def geracao(nome):
+    """Geração da versão que as leituras do dataset enxergam agora (0 sem arquivo)."""
+    tabela = get_table(nome, pendentes=False)
+    return 0 if tabela is None else storage.table_generation(tabela)
+
+# --- Registro das leituras (chave de caches derivados, ver services/memoizacao.py) ---
+
+def versao_leitura(nome):
+    """Versão do dataset como as leituras o enxergam agora: arquivo e alterações pendentes."""
+    estado = _capturar_pendentes(nome)
+    return versao(nome), (estado[0] if estado is not None else None)
+
+@contextmanager
+def registrar_leituras():
+    """
+    Registra os datasets lidos no bloco (get, get_table) e a versão que a primeira leitura
+    de cada um enxergou: {nome: versao_leitura}. Blocos aninhados registram em todos os níveis.
+    """
+    pilha = getattr(_leituras, 'pilha', None)
+    if pilha is None:
+        pilha = _leituras.pilha = []
+    leituras = {}
+    pilha.append(leituras)
+    try:
+        yield leituras
+    finally:
+        pilha.pop()
+
+def anotar_leituras(leituras):
+    """Repassa aos blocos de registro ativos leituras feitas antes (valores reaproveitados de cache)."""
+    for nome, versao_lida in leituras.items():
+        _anotar(nome, versao_lida)
+
+def _anotar(nome, versao_lida):
+    for leituras in getattr(_leituras, 'pilha', ()):
+        leituras.setdefault(nome, versao_lida)
+
+# --- Gravação ---
+
+def gravar(nome, dados):
+    """
+    Grava o dataset (DataFrame ou Table) no schema declarado, com a geração seguinte:
+    arquivo temporário + os.replace, sob o lock do dataset, anunciada no barramento.
+    Leitores deste e de outros workers veem sempre uma versão completa, nunca anterior à
+    última que já leram: no meio de gravações seguidas, a nova ou a última carregada
+    (_tabela_base). Retorna a geração gravada.
+    """
+    path = caminho(nome)
+    tabela = schemas.conformar(nome, dados)
+    with storage.file_lock(caminho_lock(nome)):
+        tabela = storage.with_next_generation(tabela, path)
+        storage.atomic_write_parquet(tabela, path)
+        barramento.publicar(nome)
+    return storage.table_generation(tabela)
+
+def ler_atual(nome, pendentes=True):
+    """DataFrame novo (não compartilhado) da versão atual do arquivo."""
+    tabela = get_table(nome, pendentes=pendentes)
+    return tabela.to_pandas() if tabela is not None else _ler_direto(nome)
+
+def atualizar(nome, funcao):
+    """
+    Leitura-alteração-gravação sob o lock do dataset: `funcao` recebe um DataFrame da
+    versão atual do disco (e não uma cópia lida antes na requisição) e retorna o novo.
+    Gravações simultâneas de outros workers são serializadas, nunca sobrescritas.
+    Retorna a geração gravada.
+    """
+    with storage.file_lock(caminho_lock(nome)):
+        return gravar(nome, funcao(ler_atual(nome)))
+
+# --- Snapshot pandas do processo ---
+
+def _df_base(nome):
+    with _lock:
+        atual = _snapshots.get(nome)
+    if atual is not None and _em_segundo_plano(nome):
+        return atual
+
+    versao = _versao_disco(nome)
+    if versao is None:
+        return None, _ler_direto(nome)
+
+    if atual is not None and atual[0] == versao:
+        return atual
+
+    try:
+        # A versão da tabela, e não a do stat acima: pode ser a anterior, se o arquivo
+        # foi trocado seguidas vezes no meio da abertura.
+        versao, tabela = _tabela_base(nome)
+        df = tabela.to_pandas()
+    except Exception as e:
+        print(f"Erro ao ler o snapshot de '{nome}', lendo o parquet diretamente: {e}")
+        df = _ler_direto(nome)
+    if versao is not None:
+        with _lock:
+            _snapshots[nome] = (versao, df)
+    return versao, df
+
+def get(nome):
+    """
+    DataFrame do processo para o dataset, reconstruído apenas quando o parquet muda
+    (ou quando mudam as alterações pendentes). O valor retornado é compartilhado (também
+    pelos get_*_data dos repositórios): quem for alterá-lo deve trabalhar em uma cópia.
+    """
+    estado = _capturar_pendentes(nome)
+    versao, df = _df_base(nome)
+    _anotar(nome, (versao, estado[0] if estado is not None else None))
+    if estado is not None:
+        return _sobreposto(nome, versao, estado, df)[1]
+    return df
+
+def invalidar(nome):
+    with _lock:
+        _snapshots.pop(nome, None)
+        _tabelas.pop(nome, None)
+        _sobrepostos.pop(nome, None)
+
+def preload():
+    """Carrega todos os datasets registrados. Retorna {nome: linhas}."""
+    return {nome: len(get(nome)) for nome in _datasets}
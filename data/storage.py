@@ -0,0 +1,130 @@
+# data/storage.py
+
+import os
+import tempfile
+import threading
+from contextlib import contextmanager
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+
+try:
+    import fcntl
+except ImportError:  # Windows (desenvolvimento local): apenas lock entre threads
+    fcntl = None
+
+# Compressão dos parquets do SGD (zstd ou lz4; snappy é o padrão do pyarrow).
+PARQUET_COMPRESSAO = os.getenv('SGD_PARQUET_COMPRESSAO', 'zstd')
+
+# Geração do arquivo, nos metadados do parquet: incrementada a cada gravação do SGD.
+METADADO_GERACAO = b'sgd.geracao'
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+_held = threading.local()
+
+def _get_thread_lock(lock_path):
+    with _thread_locks_guard:
+        return _thread_locks.setdefault(lock_path, threading.Lock())
+
+@contextmanager
+def file_lock(path):
+    """
+    Lock exclusivo entre processos (flock em '<path>.lock') e entre threads do worker.
+    Reentrante na mesma thread, para que funções de gravação possam ser compostas.
+    """
+    lock_path = f"{path}.lock"
+    held = getattr(_held, 'paths', None)
+    if held is None:
+        held = _held.paths = {}
+    if held.get(lock_path):
+        held[lock_path] += 1
+        try:
+            yield
+        finally:
+            held[lock_path] -= 1
+        return
+
+    with _get_thread_lock(lock_path):
+        with open(lock_path, 'a+') as fh:
+            if fcntl:
+                fcntl.flock(fh.fileno(), fcntl.LOCK_EX)
+            held[lock_path] = 1
+            try:
+                yield
+            finally:
+                held[lock_path] = 0
+                if fcntl:
+                    fcntl.flock(fh.fileno(), fcntl.LOCK_UN)
+
+def file_version(path):
+    """Identifica a versão do arquivo; muda a cada gravação (inclusive os.replace atômico)."""
+    if not path or not os.path.exists(path):
+        return None
+    stat = os.stat(path)
+    return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+def temp_path_for(path):
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{os.path.basename(path)}.", suffix='.tmp')
+    os.close(fd)
+    return tmp_path
+
+def _generation(schema):
+    return int((schema.metadata or {}).get(METADADO_GERACAO, b'0'))
+
+def table_generation(tabela):
+    return _generation(tabela.schema)
+
+def read_generation(path):
+    """Geração do parquet em `path` (lê só o rodapé); 0 se não existir ou nunca foi gravado pelo SGD."""
+    if not path or not os.path.exists(path):
+        return 0
+    return _generation(pq.read_schema(path))
+
+def with_generation(tabela, geracao):
+    metadata = dict(tabela.schema.metadata or {})
+    metadata[METADADO_GERACAO] = str(geracao).encode()
+    return tabela.replace_schema_metadata(metadata)
+
+def with_next_generation(tabela, path):
+    """Tabela com a geração seguinte à do arquivo em `path`. Chamar com o lock do arquivo."""
+    return with_generation(tabela, read_generation(path) + 1)
+
+def write_parquet(dados, path):
+    """Grava um DataFrame ou uma pyarrow.Table (já no schema do dataset, ver data/schemas.py)."""
+    if isinstance(dados, pa.Table):
+        pq.write_table(dados, path, compression=PARQUET_COMPRESSAO)
+    else:
+        dados.to_parquet(path, index=False, compression=PARQUET_COMPRESSAO)
+
+def write_parquet_temp(df, path):
+    """Grava o DataFrame (ou Table) em um arquivo temporário no mesmo diretório de 'path' e retorna o caminho."""
+    tmp_path = temp_path_for(path)
+    try:
+        write_parquet(df, tmp_path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+def atomic_write_parquet(df, path):
+    """Grava em arquivo temporário e troca com os.replace: leitores nunca veem arquivo parcial."""
+    tmp_path = write_parquet_temp(df, path)
+    os.replace(tmp_path, path)
+
+def atomic_write_bytes(data, path):
+    tmp_path = temp_path_for(path)
+    try:
+        with open(tmp_path, 'wb') as fh:
+            fh.write(data)
+            fh.flush()
+            os.fsync(fh.fileno())
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+def atomic_write_text(text, path):
+    atomic_write_bytes(text.encode('utf-8'), path)
@@ -1,7 +1,7 @@
 from functools import wraps
 from flask import session, redirect, url_for, flash, abort
 from requests import request
-from permissions import UserPermissions
+from permissions import get_current_user_permissions
 from data import pedidos_repository
 
 def login_required(f):
@@ -33,6 +33,32 @@ def roles_required(allowed_roles):
 def admin_required(f):
     return roles_required(['admin'])(f)
 
+def mensagem_tipo_negado(tipo_entrega, perms):
+    """Mensagem de acesso negado ao tipo do pedido ('02' = Cliente Retira); None se o usuário pode acessá-lo."""
+    is_retira = (tipo_entrega == '02')
+
+    if is_retira and not perms.can_view_retira():
+        return 'Você não tem permissão para acessar pedidos do tipo "Cliente Retira".'
+
+    if not is_retira and not perms.can_view_entregas():
+        return 'Você não tem permissão para acessar pedidos do tipo "Entrega".'
+
+    return None
+
+def erros_tipo_pedidos(abs_entries, perms):
+    """order_type_required para endpoints em lote: um erro por pedido inexistente ou de tipo não permitido."""
+    df_picking = pedidos_repository.get_picking_data()
+    tipos = df_picking.drop_duplicates('AbsEntry').set_index('AbsEntry')['U_TU_QuemEntrega']
+    erros = []
+    for abs_entry in sorted(abs_entries):
+        if abs_entry not in tipos.index:
+            erros.append(f'Pedido {abs_entry}: pedido não encontrado.')
+            continue
+        mensagem = mensagem_tipo_negado(tipos[abs_entry], perms)
+        if mensagem:
+            erros.append(f'Pedido {abs_entry}: {mensagem}')
+    return erros
+
 def order_type_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
@@ -51,16 +77,9 @@ def order_type_required(f):
             return abort(404, description="Pedido não encontrado.")
 
         tipo_entrega = pedido_info.iloc[0]['U_TU_QuemEntrega']
-        perms = UserPermissions(session.get('user'))
-
-        is_retira = (tipo_entrega == '02')
-        
-        if is_retira and not perms.can_view_retira():
-            flash('Você não tem permissão para acessar pedidos do tipo "Cliente Retira".', 'danger')
-            return redirect(request.referrer or url_for('pedidos.listar_pedidos'))
-            
-        if not is_retira and not perms.can_view_entregas():
-            flash('Você não tem permissão para acessar pedidos do tipo "Entrega".', 'danger')
+        mensagem = mensagem_tipo_negado(tipo_entrega, get_current_user_permissions())
+        if mensagem:
+            flash(mensagem, 'danger')
             return redirect(request.referrer or url_for('pedidos.listar_pedidos'))
 
         return f(*args, **kwargs)
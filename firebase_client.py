@@ -0,0 +1,133 @@
+# firebase_client.py
+
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_SECURETOKEN_URL = 'https://securetoken.googleapis.com/v1'
+DEFAULT_IDENTITYTOOLKIT_URL = 'https://identitytoolkit.googleapis.com/v1'
+
+
+class FirebaseClient:
+    """
+    Cliente REST do Firebase (Realtime Database + Auth) sobre uma requests.Session
+    com pool de conexões keep-alive. As URLs base são configuráveis para permitir
+    apontar para um servidor HTTP local em testes.
+    """
+
+    def __init__(self, api_key, database_url, securetoken_url=None, identitytoolkit_url=None,
+                 pool_size=16, max_concurrency=8, timeout=10):
+        self.api_key = api_key
+        self.database_url = (database_url or '').rstrip('/')
+        self.securetoken_url = (securetoken_url or DEFAULT_SECURETOKEN_URL).rstrip('/')
+        self.identitytoolkit_url = (identitytoolkit_url or DEFAULT_IDENTITYTOOLKIT_URL).rstrip('/')
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.max_concurrency = max_concurrency
+        self._init_pool()
+
+    def _init_pool(self):
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=4,
+            pool_maxsize=self.pool_size,
+            max_retries=Retry(total=2, backoff_factor=0.2, allowed_methods=frozenset(['GET']))
+        )
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+        # Limita as chamadas simultâneas ao Firebase por worker (inclui o fan-out).
+        self._semaphore = threading.BoundedSemaphore(self.max_concurrency)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix='firebase')
+        self._pid = os.getpid()
+
+    def _ensure_pool(self):
+        # Conexões e threads não podem ser herdadas de um fork (app pré-carregada no master do gunicorn).
+        if self._pid != os.getpid():
+            self._init_pool()
+
+    def _request(self, method, url, **kwargs):
+        self._ensure_pool()
+        with self._semaphore:
+            response = self.session.request(method, url, timeout=self.timeout, **kwargs)
+        response.raise_for_status()
+        return response.json() if response.content else None
+
+    # --- Realtime Database ---
+
+    def _db_url(self, path):
+        return f"{self.database_url}/{path.strip('/')}.json"
+
+    def db_get(self, path, token):
+        return self._request('GET', self._db_url(path), params={'auth': token})
+
+    def db_set(self, path, data, token):
+        return self._request('PUT', self._db_url(path), params={'auth': token}, json=data)
+
+    def db_update(self, path, data, token):
+        return self._request('PATCH', self._db_url(path), params={'auth': token}, json=data)
+
+    def db_get_many(self, paths, token):
+        """Busca vários caminhos em paralelo. Caminhos com erro retornam None."""
+        def fetch(path):
+            try:
+                return self.db_get(path, token)
+            except requests.RequestException as e:
+                print(f"Erro ao buscar {path} no Firebase: {e}")
+                return None
+
+        self._ensure_pool()
+        paths = list(paths)
+        return dict(zip(paths, self._executor.map(fetch, paths)))
+
+    # --- Auth ---
+
+    def refresh(self, refresh_token):
+        data = self._request(
+            'POST', f"{self.securetoken_url}/token",
+            params={'key': self.api_key},
+            data={'grant_type': 'refresh_token', 'refresh_token': refresh_token}
+        )
+        return {
+            'userId': data['user_id'],
+            'idToken': data['id_token'],
+            'refreshToken': data['refresh_token'],
+            'expiresIn': data.get('expires_in', '3600')
+        }
+
+    def sign_in(self, email, password):
+        """Login com email e senha: {'localId', 'email', 'idToken', 'refreshToken', 'expiresIn'}."""
+        return self._request(
+            'POST', f"{self.identitytoolkit_url}/accounts:signInWithPassword",
+            params={'key': self.api_key},
+            json={'email': email, 'password': password, 'returnSecureToken': True}
+        )
+
+    def sign_up(self, email, password):
+        return self._request(
+            'POST', f"{self.identitytoolkit_url}/accounts:signUp",
+            params={'key': self.api_key},
+            json={'email': email, 'password': password, 'returnSecureToken': True}
+        )
+
+    # --- Conexões ---
+
+    def warmup(self):
+        """Abre (em background) as conexões TLS com os hosts do Firebase, fora do caminho das requisições."""
+        def open_connections():
+            for base_url in {self.database_url, self.securetoken_url, self.identitytoolkit_url}:
+                if not base_url:
+                    continue
+                parts = urlsplit(base_url)
+                try:
+                    self.session.head(f"{parts.scheme}://{parts.netloc}/", timeout=self.timeout)
+                except requests.RequestException:
+                    pass
+
+        self._ensure_pool()
+        threading.Thread(target=open_connections, name='firebase-warmup', daemon=True).start()
@@ -0,0 +1,81 @@
+# fragment_cache.py
+
+import re
+import threading
+from collections import OrderedDict
+
+from flask import current_app
+from markupsafe import Markup
+
+_ESPACOS = re.compile(r'\s+')
+
+
+def minificar_fragmento(html):
+    """Minificação leve dos cards (sem <pre>, <textarea> ou <script>): colapsa espaços em branco."""
+    return _ESPACOS.sub(' ', html).strip()
+
+
+class FragmentCache:
+    """
+    Cache LRU, por processo, de fragmentos HTML já renderizados e minificados.
+
+    A chave é o próprio conteúdo que o fragmento exibe (pedido, localização, status...)
+    mais as permissões de quem vê a página: quando um pedido muda de status a chave muda
+    e o card é renderizado de novo; os cards inalterados vêm prontos do cache.
+    """
+
+    def __init__(self, max_entries=5000):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._fragmentos = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, template_name, chave, **contexto):
+        chave = (template_name, chave)
+        with self._lock:
+            fragmento = self._fragmentos.get(chave)
+            if fragmento is not None:
+                self._fragmentos.move_to_end(chave)
+                self.hits += 1
+                return fragmento
+
+        html = current_app.jinja_env.get_template(template_name).render(**contexto)
+        fragmento = Markup(minificar_fragmento(html))
+
+        with self._lock:
+            self.misses += 1
+            self._fragmentos[chave] = fragmento
+            self._fragmentos.move_to_end(chave)
+            while len(self._fragmentos) > self.max_entries:
+                self._fragmentos.popitem(last=False)
+        return fragmento
+
+    def render_all(self, template_name, itens, chave_fn, nome_item, **contexto):
+        """Renderiza um fragmento por item; em modo debug não usa o cache (templates recarregáveis)."""
+        if current_app.debug:
+            template = current_app.jinja_env.get_template(template_name)
+            return [Markup(template.render(**{nome_item: item}, **contexto)) for item in itens]
+        return [self.render(template_name, chave_fn(item), **{nome_item: item}, **contexto) for item in itens]
+
+    def clear(self):
+        with self._lock:
+            self._fragmentos.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._fragmentos),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / total) if total else 0.0
+            }
+
+
+fragment_cache = FragmentCache()
+
+
+def assinatura_permissoes(perms):
+    """Parte da chave que depende de quem vê a página."""
+    return tuple(sorted(perms.roles))
@@ -0,0 +1,26 @@
+# gunicorn.conf.py
+#
+# Uso: gunicorn -c gunicorn.conf.py
+# A app é carregada e aquecida (datasets, índices, templates) uma vez no master; os
+# workers nascem do fork já prontos e compartilham essa memória por copy-on-write,
+# inclusive os que são reciclados por max_requests.
+
+import os
+
+wsgi_app = 'app:create_app()'
+preload_app = os.getenv('SGD_PRELOAD', '1') == '1'
+
+os.environ['SGD_PRELOAD'] = '1' if preload_app else '0'
+os.environ.setdefault('SGD_WARMUP', '1')
+
+
+def post_fork(server, worker):
+    # Conexões com o Firebase e threads de fundo são abertas em cada worker, nunca herdadas do master.
+    if preload_app:
+        from config import firebase_client
+        from data import compactacao, gravacao_adiada, observador, retencao
+        firebase_client.warmup()
+        compactacao.iniciar_agendamento(worker.log)
+        retencao.iniciar_agendamento(worker.log)
+        observador.iniciar(worker.log)
+        gravacao_adiada.iniciar(worker.log)
@@ -1,24 +1,123 @@
-from config import db, auth
+import os
+import threading
+import time
+from config import firebase_client
+from data import barramento
+
+USERS_CACHE_TTL = int(os.getenv('SGD_USERS_CACHE_TTL', '300'))
+# Chave do barramento (data/barramento.py) anunciada a cada gravação de usuário.
+BARRAMENTO_USUARIOS = 'usuarios'
+
+# Diretório de usuários em memória (por worker), com índices secundários por setor.
+# A chave None do índice agrupa os usuários sem nenhum setor. 'marca' é o contador do
+# barramento quando o diretório foi carregado: uma gravação feita em outro worker o
+# incrementa e o diretório é buscado de novo na leitura seguinte, sem esperar o TTL
+# (que continua valendo para alterações feitas fora do SGD).
+_users_cache = {'users': None, 'by_role': {}, 'expires_at': 0.0, 'marca': None}
+_users_cache_lock = threading.Lock()
 
 def get_user_data(uid, token):
     try:
-        user_data = db.child("users").child(uid).get(token=token)
-        return user_data.val()
+        return firebase_client.db_get(f"users/{uid}", token)
     except Exception as e:
         print(f"Erro ao buscar dados do usuário {uid}: {e}")
         return None
 
-def get_all_users(token):
+def get_users_data(uids, token):
+    """Busca vários usuários em paralelo, reaproveitando as conexões do pool."""
+    uids = list(uids)
+    resultados = firebase_client.db_get_many([f"users/{uid}" for uid in uids], token)
+    return {uid: resultados[f"users/{uid}"] for uid in uids}
+
+def _fetch_all_users(token):
     try:
-        users = db.child("users").get(token=token)
-        return {user.key(): user.val() for user in users.each()} if users.val() else {}
+        return firebase_client.db_get("users", token) or {}
     except Exception as e:
         print(f"Erro ao buscar todos os usuários: {e}")
-        return {}
+        return None
+
+def _build_role_index(users):
+    by_role = {}
+    for uid, data in users.items():
+        roles = (data or {}).get('roles') or {}
+        if not roles:
+            by_role.setdefault(None, {})[uid] = data
+        for role in roles:
+            by_role.setdefault(role, {})[uid] = data
+    return by_role
+
+def invalidate_users_cache():
+    with _users_cache_lock:
+        _users_cache['users'] = None
+        _users_cache['by_role'] = {}
+        _users_cache['expires_at'] = 0.0
+        _users_cache['marca'] = None
+
+def _write_through(uid, data, replace=False):
+    """
+    Aplica a gravação no cache já carregado, mantendo os índices coerentes com o Firebase,
+    e a anuncia no barramento para os demais workers recarregarem o diretório.
+    """
+    with _users_cache_lock:
+        marca = barramento.contador(BARRAMENTO_USUARIOS)
+        barramento.publicar(BARRAMENTO_USUARIOS)
+        users = _users_cache['users']
+        if users is None:
+            return
+        users = dict(users)
+        if replace or uid not in users:
+            users[uid] = dict(data)
+        else:
+            users[uid] = {**(users[uid] or {}), **data}
+        _users_cache['users'] = users
+        _users_cache['by_role'] = _build_role_index(users)
+        # O próprio anúncio não invalida este cache; um de outro worker no meio, sim.
+        if marca is not None and _users_cache['marca'] == marca:
+            _users_cache['marca'] = (marca + 1) % 2 ** 64
+
+def _cache_valido(marca):
+    return (_users_cache['users'] is not None and time.monotonic() < _users_cache['expires_at']
+            and _users_cache['marca'] == marca)
+
+def _get_directory(token):
+    marca = barramento.contador(BARRAMENTO_USUARIOS)
+    if _cache_valido(marca):
+        return _users_cache['users'], _users_cache['by_role']
+
+    with _users_cache_lock:
+        marca = barramento.contador(BARRAMENTO_USUARIOS)
+        if _cache_valido(marca):
+            return _users_cache['users'], _users_cache['by_role']
+
+        # O contador é lido antes da busca: uma gravação no meio força nova busca.
+        users = _fetch_all_users(token)
+        if users is None:
+            return {}, {}
+        _users_cache['users'] = users
+        _users_cache['by_role'] = _build_role_index(users)
+        _users_cache['expires_at'] = time.monotonic() + USERS_CACHE_TTL
+        _users_cache['marca'] = marca
+        return _users_cache['users'], _users_cache['by_role']
+
+def get_all_users(token):
+    users, _ = _get_directory(token)
+    return dict(users)
+
+def get_users_by_role(roles, token, incluir_sem_setor=False):
+    """Usuários que possuem ao menos um dos setores informados, a partir do índice em cache."""
+    if isinstance(roles, str):
+        roles = [roles]
+    _, by_role = _get_directory(token)
+    resultado = {}
+    for role in roles:
+        resultado.update(by_role.get(role, {}))
+    if incluir_sem_setor:
+        resultado.update(by_role.get(None, {}))
+    return resultado
 
 def create_user_with_data(email, password, roles, admin_token, **kwargs):
     try:
-        user = auth.create_user_with_email_and_password(email, password)
+        user = firebase_client.sign_up(email, password)
         uid = user['localId']
         
         roles_map = {role: True for role in roles}
@@ -31,7 +130,8 @@ def create_user_with_data(email, password, roles, admin_token, **kwargs):
             "codigo_sap": kwargs.get("codigo_sap", ""),
             "nome_sap": kwargs.get("nome_sap", "")
         }
-        db.child("users").child(uid).set(user_data, token=admin_token)
+        firebase_client.db_set(f"users/{uid}", user_data, admin_token)
+        _write_through(uid, user_data, replace=True)
         return user
     except Exception as e:
         raise e
@@ -41,7 +141,7 @@ def create_simple_user(email, password, nome, role, admin_token):
         if role not in ['separador', 'conferente', 'motorista']:
             raise ValueError("O setor deve ser 'separador', 'conferente' ou 'motorista'.")
 
-        user = auth.create_user_with_email_and_password(email, password)
+        user = firebase_client.sign_up(email, password)
         uid = user['localId']
 
         user_data = {
@@ -52,7 +152,8 @@ def create_simple_user(email, password, nome, role, admin_token):
             "nome_vendedor": "",
             "codigo_sap": ""
         }
-        db.child("users").child(uid).set(user_data, token=admin_token)
+        firebase_client.db_set(f"users/{uid}", user_data, admin_token)
+        _write_through(uid, user_data, replace=True)
         return user
     except Exception as e:
         raise e
@@ -60,7 +161,8 @@ def create_simple_user(email, password, nome, role, admin_token):
 def deactivate_user(uid, token):
     try:
         data = {'roles': {'default': True}}
-        db.child("users").child(uid).update(data, token=token)
+        firebase_client.db_update(f"users/{uid}", data, token)
+        _write_through(uid, data)
         return True
     except Exception as e:
         print(f"Erro ao inativar o usuário {uid}: {e}")
@@ -71,7 +173,8 @@ def update_user_data(uid, data, token):
         if 'roles' in data:
             data['roles'] = {role: True for role in data['roles']}
             
-        db.child("users").child(uid).update(data, token=token)
+        firebase_client.db_update(f"users/{uid}", data, token)
+        _write_through(uid, data)
         return True
     except Exception as e:
         print(f"Erro ao atualizar os dados do usuário {uid}: {e}")
@@ -1,6 +1,7 @@
 # permissions.py
 
 from flask import session
+import request_context
 
 class UserPermissions:
     ENTREGA_ROLES = {'admin', 'expedicao', 'motorista', 'conferente', 'separador'}
@@ -36,5 +37,7 @@ class UserPermissions:
         return not self.roles.isdisjoint(self.PACKING_ROLES)
 
 def get_current_user_permissions():
+    """Permissões do usuário logado, montadas uma vez por requisição (decorators, views e templates)."""
     user = session.get('user')
-    return UserPermissions(user)
\ No newline at end of file
+    uid = user.get('uid') if user else None
+    return request_context.obter(('permissions', uid), lambda: UserPermissions(user))
\ No newline at end of file
@@ -0,0 +1,101 @@
+# request_context.py
+
+import threading
+from collections import Counter
+
+from flask import current_app, g, has_request_context, request
+
+from data import snapshots
+
+_ATRIBUTO_G = '_sgd_contexto'
+_lock = threading.Lock()
+
+# Total de cargas duplicadas por dataset desde o início do processo (diagnóstico).
+cargas_duplicadas = Counter()
+
+
+class _Contexto:
+    def __init__(self):
+        self.valores = {}
+        self.leituras = {}
+        self.cargas = Counter()
+        self.invalidados = set()
+
+
+def _get_contexto():
+    if not has_request_context():
+        return None
+    contexto = g.get(_ATRIBUTO_G)
+    if contexto is None:
+        contexto = _Contexto()
+        setattr(g, _ATRIBUTO_G, contexto)
+    return contexto
+
+
+def obter(nome, loader, copiar=None):
+    """
+    Retorna o valor `nome` da requisição atual, chamando `loader` apenas na primeira vez.
+    Decorators, services e templates compartilham o mesmo valor. `copiar` é aplicado em
+    cada acesso para que quem altera o resultado não contamine os demais. Fora de uma
+    requisição (scripts, threads), chama o loader a cada acesso. As versões dos datasets
+    lidas pelo loader são repassadas a cada acesso (snapshots.registrar_leituras).
+    """
+    contexto = _get_contexto()
+    if contexto is None:
+        valor = loader()
+        return copiar(valor) if copiar else valor
+    if nome not in contexto.valores:
+        registrar_carga(nome)
+        with snapshots.registrar_leituras() as leituras:
+            contexto.valores[nome] = loader()
+        contexto.leituras[nome] = leituras
+    snapshots.anotar_leituras(contexto.leituras.get(nome, {}))
+    valor = contexto.valores[nome]
+    return copiar(valor) if copiar else valor
+
+
+def obter_dataframe(nome, loader):
+    """
+    obter() para DataFrames lidos uma vez por requisição. O DataFrame é o snapshot
+    compartilhado do processo (data/snapshots): quem for alterá-lo faz a própria cópia.
+    """
+    return obter(nome, loader)
+
+
+def invalidar(*nomes):
+    """Descarta os valores após uma gravação; a próxima leitura na requisição volta ao disco."""
+    contexto = _get_contexto()
+    if contexto is None:
+        return
+    for nome in nomes:
+        contexto.valores.pop(nome, None)
+        contexto.leituras.pop(nome, None)
+        contexto.invalidados.add(nome)
+
+
+def registrar_carga(nome):
+    """
+    Conta uma carga do dataset na requisição. Uma segunda carga sem gravação no meio é
+    uma duplicata: entra em `cargas_duplicadas` e, em modo debug, gera um aviso no log.
+    """
+    contexto = _get_contexto()
+    if contexto is None:
+        return
+    contexto.cargas[nome] += 1
+    if contexto.cargas[nome] > 1 and nome not in contexto.invalidados:
+        with _lock:
+            cargas_duplicadas[nome] += 1
+        if current_app.debug:
+            current_app.logger.warning(
+                f"Carga duplicada de '{nome}' em {request.method} {request.path} "
+                f"({contexto.cargas[nome]}x na mesma requisição)."
+            )
+    contexto.invalidados.discard(nome)
+
+
+def resumo_cargas():
+    """Cargas feitas na requisição atual, no formato 'picking=1, separacao=1'."""
+    contexto = _get_contexto()
+    if contexto is None or not contexto.cargas:
+        return ''
+    return ', '.join(f"{nome}={total}" for nome, total in sorted(contexto.cargas.items(), key=lambda i: str(i[0])))
@@ -1,6 +1,10 @@
-from flask import Blueprint, render_template, request, redirect, url_for, session, flash
+import os
+
+from flask import Blueprint, render_template, request, redirect, url_for, session, flash, jsonify
 from models.user import get_all_users, create_user_with_data, get_user_data, update_user_data
 from decorators import admin_required
+from fragment_cache import fragment_cache
+from services import memoizacao
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -68,4 +72,14 @@ def edit_user(uid):
     if 'roles' not in user_data:
         user_data['roles'] = []
 
-    return render_template('admin/user_form.html', action='edit', user=user_data, user_uid=uid)
\ No newline at end of file
+    return render_template('admin/user_form.html', action='edit', user=user_data, user_uid=uid)
+
+@admin_bp.route('/caches')
+@admin_required
+def caches():
+    """Acertos dos caches do worker que atendeu (cada worker do gunicorn tem os seus)."""
+    return jsonify({
+        'pid': os.getpid(),
+        'servicos': memoizacao.estatisticas(),
+        'fragmentos': fragment_cache.stats(),
+    })
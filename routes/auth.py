@@ -1,5 +1,5 @@
 from flask import Blueprint, render_template, request, redirect, url_for, session, flash
-from config import auth
+from config import firebase_client
 from models.user import get_user_data
 from decorators import login_required
 from datetime import datetime, timedelta, timezone
@@ -17,7 +17,7 @@ def login():
         email = request.form.get('email')
         password = request.form.get('password')
         try:
-            user_auth_data = auth.sign_in_with_email_and_password(email, password)
+            user_auth_data = firebase_client.sign_in(email, password)
             uid = user_auth_data['localId']
             id_token = user_auth_data['idToken']
             
@@ -4,7 +4,7 @@ from flask import Blueprint, render_template, request, redirect, url_for, sessio
 from decorators import roles_required
 from permissions import UserPermissions
 from data import frota_repository
-from models.user import get_all_users
+from models.user import get_users_by_role
 import pandas as pd
 
 frota_bp = Blueprint('frota', __name__, url_prefix='/frota')
@@ -19,11 +19,7 @@ def manage_frota():
 
 def get_motoristas_disponiveis(token, id_veiculo_atual=None):
     """Busca usuários com a role 'motorista'."""
-    all_users = get_all_users(token)
-    motoristas = {
-        uid: data for uid, data in all_users.items()
-        if 'motorista' in data.get('roles', {})
-    }
+    motoristas = get_users_by_role('motorista', token)
     
     df_frota = frota_repository.get_frota_data()
     
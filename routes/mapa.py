@@ -60,6 +60,12 @@ def save_geolocation():
     else:
         return jsonify({'status': 'error', 'message': 'Falha ao salvar.'}), 500
 
+@mapa_bp.route('/mapa/api/pedidos-por-regiao')
+@roles_required(list(UserPermissions.ENTREGA_ROLES))
+def pedidos_por_regiao():
+    regiao = request.args.get('regiao', '').strip() or None
+    return jsonify(mapa_service.get_pedidos_por_regiao(regiao))
+
 @mapa_bp.route('/mapa/save_regioes', methods=['POST'])
 @roles_required(list(UserPermissions.ENTREGA_ROLES))
 def save_regioes():
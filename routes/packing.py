@@ -1,9 +1,10 @@
 # routes/packing.py
 
-from flask import Blueprint, flash, redirect, render_template, session, url_for, request
-from decorators import roles_required, order_type_required
+from flask import Blueprint, flash, redirect, render_template, session, url_for, request, jsonify
+from decorators import roles_required, order_type_required, erros_tipo_pedidos
 from services import packing_service
 from permissions import UserPermissions, get_current_user_permissions
+from fragment_cache import fragment_cache, assinatura_permissoes
 
 packing_bp = Blueprint('packing', __name__)
 
@@ -12,9 +13,16 @@ packing_bp = Blueprint('packing', __name__)
 def listar_packing():
     user_perms = get_current_user_permissions()
     pedidos = packing_service.get_pedidos_para_packing(user_perms)
-    
+
+    permissoes = assinatura_permissoes(user_perms)
+    cards = fragment_cache.render_all(
+        'pedidos/packing/_packing_card.html', pedidos,
+        lambda p: (p['AbsEntry'], p['CardName'], p['Localizacao'], p['Status'], permissoes), 'pedido'
+    )
+
     return render_template('pedidos/packing/packing_list.html', 
-                           pedidos_para_packing=pedidos)
+                           pedidos_para_packing=pedidos,
+                           cards_packing=cards)
 
 
 @packing_bp.route('/packing/iniciar/<int:abs_entry>/<localizacao>', methods=['GET', 'POST'])
@@ -44,4 +52,32 @@ def iniciar_packing(abs_entry, localizacao):
     return render_template('pedidos/packing/packing_details.html',
                            pacotes=pacotes,
                            abs_entry=abs_entry,
-                           localizacao=localizacao)
\ No newline at end of file
+                           localizacao=localizacao)
+
+
+@packing_bp.route('/packing/finalizar-lote', methods=['POST'])
+@roles_required(list(UserPermissions.PACKING_ROLES))
+def finalizar_packing_lote():
+    """
+    Finaliza de uma vez o packing de vários pedidos/localizações (fim de turno). JSON:
+    {'conferencias': [{'abs_entry', 'localizacao', 'pacotes': {id: {'peso', 'confirmado'}}}]}.
+    Com qualquer erro nada é gravado.
+    """
+    data = request.get_json(silent=True) or {}
+    conferencias = data.get('conferencias')
+    try:
+        conferencias = [{**c, 'abs_entry': int(c['abs_entry']), 'localizacao': str(c['localizacao'])}
+                        for c in conferencias]
+    except (KeyError, TypeError, ValueError):
+        conferencias = None
+    if not conferencias:
+        mensagem = 'Lote de conferências inválido.'
+        return jsonify({'status': 'error', 'message': mensagem, 'erros': [mensagem]}), 400
+
+    erros = erros_tipo_pedidos({c['abs_entry'] for c in conferencias}, get_current_user_permissions())
+    if not erros:
+        erros = packing_service.finalizar_packing_em_lote(conferencias, session['user']['email'])
+    if erros:
+        return jsonify({'status': 'error', 'message': 'Nenhuma conferência foi gravada.', 'erros': erros}), 400
+
+    return jsonify({'status': 'success', 'finalizados': len(conferencias)})
@@ -1,11 +1,13 @@
 import unicodedata
+import uuid
 from flask import (Blueprint, render_template, abort, session, redirect,
-                   url_for, flash, request, jsonify)
-from decorators import roles_required, order_type_required
+                   url_for, flash, request, jsonify, current_app)
+from decorators import roles_required, order_type_required, erros_tipo_pedidos
 from services import pedidos_service
-from data import pedidos_repository
-from models.user import get_all_users, create_simple_user, update_user_data, deactivate_user
-from permissions import UserPermissions
+from data import pedidos_repository, picking_sessao_repository
+from models.user import get_users_by_role, create_simple_user, update_user_data, deactivate_user
+from permissions import UserPermissions, get_current_user_permissions
+from fragment_cache import fragment_cache, assinatura_permissoes
 import pandas as pd
 
 pedidos_bp = Blueprint('pedidos', __name__)
@@ -16,10 +18,40 @@ def strip_accents(text):
     return ''.join(c for c in unicodedata.normalize('NFD', text)
                    if unicodedata.category(c) != 'Mn')
 
+def _get_itens_pedido(sid, picking_key, abs_entry, localizacao):
+    itens_pedido = picking_sessao_repository.get_itens_pedido(sid, picking_key)
+    if itens_pedido is None:
+        # Separações iniciadas antes do store guardar os itens: copia uma única vez.
+        itens_pedido = pedidos_service.get_itens_do_picking(abs_entry, localizacao)
+        if itens_pedido:
+            picking_sessao_repository.salvar_itens_pedido(sid, picking_key, itens_pedido)
+    return itens_pedido
+
+def _picking_sid():
+    """ID opaco (no cookie) das separações em andamento guardadas no servidor."""
+    sid = session.get('picking_sid')
+    if not sid:
+        sid = session['picking_sid'] = uuid.uuid4().hex
+
+    # Migra separações antigas que ainda estejam no cookie de sessão.
+    legado = session.pop('pickings_in_progress', None)
+    if legado:
+        for picking_key, picking in legado.items():
+            picking_sessao_repository.iniciar_picking(
+                sid, picking_key, picking['abs_entry'], picking['localizacao'],
+                picking.get('start_time'), picking.get('pacotes', [])
+            )
+    return sid
+
+def _chave_card_pedido(pedido, perms):
+    # O card exibe apenas estes campos: a chave muda sempre que o status de uma localização muda.
+    locations = tuple((loc['Localizacao'], loc['Status']) for loc in pedido['locations'])
+    return (pedido['AbsEntry'], pedido['CardName'], locations, assinatura_permissoes(perms))
+
 @pedidos_bp.route('/pedidos')
 @roles_required(list(UserPermissions.PEDIDOS_VIEW_ROLES))
 def listar_pedidos():
-    perms = UserPermissions(session.get('user'))
+    perms = get_current_user_permissions()
     
     pedidos_finais, _, sync_time = pedidos_service.get_pedidos_para_listar()
     
@@ -53,15 +85,19 @@ def listar_pedidos():
 
     if perms.can_view_gerencial():
         id_token = session['user']['idToken']
-        all_users_data = get_all_users(token=id_token)
-        for uid, data in all_users_data.items():
-            user_roles_keys = data.get('roles', {}).keys()
-            if not user_roles_keys or any(r in ['separador', 'conferente', 'motorista', 'default', 'retira'] for r in user_roles_keys):
-                 users[uid] = data
+        users = get_users_by_role(['separador', 'conferente', 'motorista', 'default', 'retira'],
+                                  token=id_token, incluir_sem_setor=True)
+
+    cards_entrega = fragment_cache.render_all('pedidos/_pedido_card.html', pedidos_entrega,
+                                              lambda p: _chave_card_pedido(p, perms), 'pedido')
+    cards_retira = fragment_cache.render_all('pedidos/_pedido_card.html', pedidos_retira,
+                                             lambda p: _chave_card_pedido(p, perms), 'pedido')
 
     return render_template('pedidos/pedidos.html',
                        pedidos_entrega=pedidos_entrega,
                        pedidos_retira=pedidos_retira,
+                       cards_entrega=cards_entrega,
+                       cards_retira=cards_retira,
                        all_statuses=ALL_POSSIBLE_STATUSES,
                        current_filters={'cliente': filter_cliente, 'status': filter_status},
                        sync_time=sync_time,
@@ -153,18 +189,13 @@ def visualizar_picking(abs_entry):
 @order_type_required
 def iniciar_separacao(abs_entry, localizacao):
     picking_key = f"{abs_entry}_{localizacao}"
-    if 'pickings_in_progress' not in session:
-        session['pickings_in_progress'] = {}
+    sid = _picking_sid()
 
     start_time = pedidos_service.iniciar_nova_separacao(abs_entry, localizacao, session['user']['email'])
 
-    session['pickings_in_progress'][picking_key] = {
-        'abs_entry': abs_entry,
-        'localizacao': localizacao,
-        'start_time': start_time,
-        'pacotes': []
-    }
-    session.modified = True
+    itens_pedido = pedidos_service.get_itens_do_picking(abs_entry, localizacao)
+    picking_sessao_repository.iniciar_picking(sid, picking_key, abs_entry, localizacao, start_time,
+                                              itens_pedido=itens_pedido)
     
     flash('Separação iniciada!', 'success')
     return redirect(url_for('pedidos.separar_picking', abs_entry=abs_entry, localizacao=localizacao))
@@ -173,57 +204,25 @@ def iniciar_separacao(abs_entry, localizacao):
 @order_type_required
 def separar_picking(abs_entry, localizacao):
     picking_key = f"{abs_entry}_{localizacao}"
-    if 'pickings_in_progress' not in session or picking_key not in session['pickings_in_progress']:
+    sid = _picking_sid()
+    pacotes = picking_sessao_repository.get_pacotes(sid, picking_key)
+    if not pacotes and not picking_sessao_repository.picking_existe(sid, picking_key):
         flash('Nenhuma separação em andamento. Inicie a separação primeiro.', 'warning')
         return redirect(url_for('pedidos.listar_pedidos'))
 
-    df = pedidos_repository.get_picking_data()
-    picking_items_df = df[(df['AbsEntry'] == abs_entry) & (df['Localizacao'] == localizacao)]
-    if picking_items_df.empty:
+    itens_pedido = _get_itens_pedido(sid, picking_key, abs_entry, localizacao)
+    if not itens_pedido:
         abort(404, description="Itens do Picking não encontrados.")
 
-    quantidades_separadas = {}
-    for pacote in session['pickings_in_progress'][picking_key]['pacotes']:
-        for item in pacote['itens']:
-            item_code = item['ItemCode']
-            quantidades_separadas[item_code] = quantidades_separadas.get(item_code, 0) + item['Quantity']
+    quantidades_separadas = pedidos_service.calcular_quantidades_separadas(pacotes)
 
     if request.method == 'POST':
-        itens_pacote = []
-        has_error = False
-        for _, item_pedido in picking_items_df.iterrows():
-            item_code = item_pedido['ItemCode']
-            uom_code = item_pedido['UomCode']
-            
-            try:
-                quantidade_str = request.form.get(f'quantidade_{item_code}', '0').replace(',', '.')
-                quantidade = float(quantidade_str) if quantidade_str else 0
-                
-                if quantidade > 0:
-                    if (uom_code != 'KG' or uom_code != 'METROS') and quantidade != int(quantidade):
-                        flash(f"Item {item_code} não aceita quantidade decimal (Unidade: {uom_code}).", 'danger')
-                        has_error = True
-                        break
-                    
-                    total_pedido = item_pedido['RelQtty']
-                    ja_separado = quantidades_separadas.get(item_code, 0)
-                    if (ja_separado + quantidade) > total_pedido:
-                        flash(f"Quantidade para o item {item_code} excede o solicitado no pedido.", 'danger')
-                        has_error = True
-                        break 
-                    
-                    itens_pacote.append({
-                        "ItemCode": item_code,
-                        "ItemName": item_pedido['ItemName'],
-                        "Quantity": quantidade,
-                        "UomCode": uom_code
-                    })
-            except (ValueError, TypeError):
-                flash(f"Valor inválido para a quantidade do item {item_code}.", 'danger')
-                has_error = True
-                break
+        quantidades = {item['ItemCode']: request.form.get(f"quantidade_{item['ItemCode']}") for item in itens_pedido}
+        itens_pacote, erros = pedidos_service.montar_itens_pacote(itens_pedido, quantidades, quantidades_separadas)
 
-        if has_error:
+        if erros:
+            for erro in erros:
+                flash(erro, 'danger')
             return redirect(url_for('pedidos.separar_picking', abs_entry=abs_entry, localizacao=localizacao))
 
         if not itens_pacote:
@@ -231,42 +230,175 @@ def separar_picking(abs_entry, localizacao):
         else:
             try:
                 novo_pacote = {
-                    "id": len(session['pickings_in_progress'][picking_key]['pacotes']) + 1,
                     "peso": float(request.form.get('peso_pacote')),
                     "localizacao": request.form.get('localizacao'),
                     "report": request.form.get('report', ''),
                     "itens": itens_pacote
                 }
-                session['pickings_in_progress'][picking_key]['pacotes'].append(novo_pacote)
-                session.modified = True
+                picking_sessao_repository.adicionar_pacote(sid, picking_key, novo_pacote)
                 flash('Pacote criado com sucesso!', 'success')
             except (ValueError, TypeError):
                 flash('O peso do pacote deve ser um número válido.', 'danger')
 
         return redirect(url_for('pedidos.separar_picking', abs_entry=abs_entry, localizacao=localizacao))
-        
-    items_list = picking_items_df.to_dict(orient='records')
-    for item in items_list:
-        for key, value in item.items():
-            if pd.isna(value):
-                item[key] = None    
 
     return render_template('pedidos/picking/separacao_picking.html',
-                           items=items_list,
+                           items=itens_pedido,
                            abs_entry=abs_entry,
                            localizacao=localizacao,
-                           pacotes=session['pickings_in_progress'][picking_key]['pacotes'],
+                           pacotes=pacotes,
                            quantidades_separadas=quantidades_separadas)
 
+# --- API JSON da separação: cada operação lê apenas o store da sessão (sem parquet) ---
+
+def _api_picking_context(abs_entry, localizacao):
+    picking_key = f"{abs_entry}_{localizacao}"
+    sid = _picking_sid()
+    if not picking_sessao_repository.picking_existe(sid, picking_key):
+        return None
+    itens_pedido = _get_itens_pedido(sid, picking_key, abs_entry, localizacao)
+    return sid, picking_key, itens_pedido
+
+def _api_resposta(itens_pedido, pacotes, status=200, **extra):
+    return jsonify({
+        'status': 'success',
+        'pacotes': pacotes,
+        'totais': pedidos_service.calcular_totais_separacao(itens_pedido, pacotes),
+        **extra
+    }), status
+
+def _api_erro(mensagem, status=400, erros=None):
+    return jsonify({'status': 'error', 'message': mensagem, 'erros': erros or [mensagem]}), status
+
+def _api_erro_tipo_pedido(abs_entry):
+    """order_type_required das rotas JSON: resposta de erro se o usuário não pode acessar o pedido; None se pode."""
+    erros = erros_tipo_pedidos({abs_entry}, get_current_user_permissions())
+    if erros:
+        return _api_erro(erros[0], 403, erros)
+    return None
+
+@pedidos_bp.route('/picking/api/<int:abs_entry>/<localizacao>/pacotes', methods=['GET', 'POST'])
+@roles_required(list(UserPermissions.PEDIDOS_VIEW_ROLES))
+def api_pacotes(abs_entry, localizacao):
+    erro = _api_erro_tipo_pedido(abs_entry)
+    if erro:
+        return erro
+    contexto = _api_picking_context(abs_entry, localizacao)
+    if contexto is None:
+        return _api_erro('Nenhuma separação em andamento para este picking.', 404)
+    sid, picking_key, itens_pedido = contexto
+    pacotes = picking_sessao_repository.get_pacotes(sid, picking_key)
+
+    if request.method == 'GET':
+        return _api_resposta(itens_pedido, pacotes)
+
+    quantidades_separadas = pedidos_service.calcular_quantidades_separadas(pacotes)
+    novo_pacote, erros = pedidos_service.montar_pacote(request.get_json(silent=True) or {}, itens_pedido, quantidades_separadas)
+    if erros:
+        return _api_erro(erros[0], 400, erros)
+
+    pacote = picking_sessao_repository.adicionar_pacote(sid, picking_key, novo_pacote)
+    return _api_resposta(itens_pedido, pacotes + [pacote], 201, pacote=pacote)
+
+@pedidos_bp.route('/picking/api/<int:abs_entry>/<localizacao>/pacotes/<int:pacote_id>', methods=['PUT', 'DELETE'])
+@roles_required(list(UserPermissions.PEDIDOS_VIEW_ROLES))
+def api_pacote(abs_entry, localizacao, pacote_id):
+    erro = _api_erro_tipo_pedido(abs_entry)
+    if erro:
+        return erro
+    contexto = _api_picking_context(abs_entry, localizacao)
+    if contexto is None:
+        return _api_erro('Nenhuma separação em andamento para este picking.', 404)
+    sid, picking_key, itens_pedido = contexto
+
+    if request.method == 'DELETE':
+        if not picking_sessao_repository.excluir_pacote(sid, picking_key, pacote_id):
+            return _api_erro(f'Pacote {pacote_id} não encontrado.', 404)
+        return _api_resposta(itens_pedido, picking_sessao_repository.get_pacotes(sid, picking_key))
+
+    pacotes = picking_sessao_repository.get_pacotes(sid, picking_key)
+    existente = next((p for p in pacotes if p['id'] == pacote_id), None)
+    if existente is None:
+        return _api_erro(f'Pacote {pacote_id} não encontrado.', 404)
+
+    quantidades_outros = pedidos_service.calcular_quantidades_separadas(pacotes, ignorar_pacote_id=pacote_id)
+    dados, erros = pedidos_service.montar_pacote(request.get_json(silent=True) or {}, itens_pedido, quantidades_outros)
+    if erros:
+        return _api_erro(erros[0], 400, erros)
+
+    pacote = {**dados, 'id': pacote_id, 'uid': existente.get('uid')}
+    picking_sessao_repository.atualizar_pacote(sid, picking_key, pacote)
+    pacotes = [pacote if p['id'] == pacote_id else p for p in pacotes]
+    return _api_resposta(itens_pedido, pacotes, pacote=pacote)
+
+@pedidos_bp.route('/picking/api/<int:abs_entry>/<localizacao>/validar', methods=['POST'])
+@roles_required(list(UserPermissions.PEDIDOS_VIEW_ROLES))
+def api_validar_pacote(abs_entry, localizacao):
+    erro = _api_erro_tipo_pedido(abs_entry)
+    if erro:
+        return erro
+    contexto = _api_picking_context(abs_entry, localizacao)
+    if contexto is None:
+        return _api_erro('Nenhuma separação em andamento para este picking.', 404)
+    sid, picking_key, itens_pedido = contexto
+    pacotes = picking_sessao_repository.get_pacotes(sid, picking_key)
+
+    data = request.get_json(silent=True) or {}
+    quantidades_separadas = pedidos_service.calcular_quantidades_separadas(pacotes, ignorar_pacote_id=data.get('pacote_id'))
+    _, erros = pedidos_service.montar_itens_pacote(itens_pedido, data.get('quantidades') or {}, quantidades_separadas)
+    return _api_resposta(itens_pedido, pacotes, valido=not erros, erros=erros)
+
+@pedidos_bp.route('/picking/api/<int:abs_entry>/<localizacao>/sync', methods=['POST'])
+@roles_required(list(UserPermissions.PEDIDOS_VIEW_ROLES))
+def api_sync_separacao(abs_entry, localizacao):
+    """Recebe em lote as operações registradas pelo cliente offline da separação."""
+    data = request.get_json(silent=True) or {}
+    operacoes = data.get('operacoes')
+    if not isinstance(operacoes, list):
+        return _api_erro('Lote de operações inválido.')
+
+    erros = erros_tipo_pedidos({abs_entry}, get_current_user_permissions())
+    if erros:
+        # Nenhuma operação é aplicada nem registrada; recusadas (e não com erro), saem da
+        # fila do cliente em vez de serem reenviadas indefinidamente.
+        resultados = [{'op_id': op.get('op_id'), 'status': 'rejeitada', 'erros': erros} for op in operacoes]
+        return jsonify({'status': 'success', 'resultados': resultados, 'finalizado': False, 'pacotes': []})
+
+    picking_key = f"{abs_entry}_{localizacao}"
+    sid = _picking_sid()
+    resultados = pedidos_service.aplicar_operacoes_separacao(sid, picking_key, abs_entry, localizacao, operacoes)
+
+    if any(r.get('finalizado') and not r.get('duplicada') for r in resultados):
+        flash('Separação finalizada e salva com sucesso!', 'success')
+
+    if not picking_sessao_repository.picking_existe(sid, picking_key):
+        return jsonify({
+            'status': 'success',
+            'resultados': resultados,
+            'finalizado': True,
+            'redirect': url_for('pedidos.listar_pedidos')
+        })
+
+    itens_pedido = _get_itens_pedido(sid, picking_key, abs_entry, localizacao)
+    return _api_resposta(itens_pedido, picking_sessao_repository.get_pacotes(sid, picking_key),
+                         resultados=resultados, finalizado=False)
+
+@pedidos_bp.route('/sw-separacao.js')
+def service_worker_separacao():
+    response = current_app.send_static_file('js/sw-separacao.js')
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
 @pedidos_bp.route('/picking/finalizar/<int:abs_entry>/<localizacao>', methods=['POST'])
 @order_type_required
 def finalizar_separacao(abs_entry, localizacao):
     picking_key = f"{abs_entry}_{localizacao}"
-    if 'pickings_in_progress' not in session or picking_key not in session['pickings_in_progress']:
+    sid = _picking_sid()
+    if not picking_sessao_repository.picking_existe(sid, picking_key):
         flash('Nenhuma separação em andamento para este picking.', 'danger')
         return redirect(url_for('pedidos.listar_pedidos'))
 
-    pacotes_sessao = session['pickings_in_progress'][picking_key]['pacotes']
+    pacotes_sessao = picking_sessao_repository.get_pacotes(sid, picking_key)
     discrepancy_report = request.form.get('discrepancy_report', '')
 
     success = pedidos_service.finalizar_processo_separacao(
@@ -278,24 +410,57 @@ def finalizar_separacao(abs_entry, localizacao):
     else:
         flash('Ocorreu um erro ao finalizar a separação.', 'danger')
 
-    session['pickings_in_progress'].pop(picking_key, None)
-    session.modified = True
+    picking_sessao_repository.remover_picking(sid, picking_key)
     return redirect(url_for('pedidos.listar_pedidos'))
 
+@pedidos_bp.route('/picking/finalizar-lote', methods=['POST'])
+@roles_required(list(UserPermissions.PEDIDOS_VIEW_ROLES))
+def finalizar_separacoes_lote():
+    """
+    Finaliza de uma vez várias separações em andamento do usuário. JSON:
+    {'separacoes': [{'abs_entry', 'localizacao', 'discrepancy_report'}]}. Tudo é validado
+    antes; com qualquer erro nada é gravado e as separações continuam em andamento.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        separacoes = [(int(s['abs_entry']), str(s['localizacao']), str(s.get('discrepancy_report') or ''))
+                      for s in data.get('separacoes')]
+    except (AttributeError, KeyError, TypeError, ValueError):
+        separacoes = None
+    if not separacoes:
+        return _api_erro('Lote de separações inválido.')
+
+    sid = _picking_sid()
+    erros = erros_tipo_pedidos({abs_entry for abs_entry, _, _ in separacoes}, get_current_user_permissions())
+    vistos = set()
+    for abs_entry, localizacao, _ in separacoes:
+        picking_key = f"{abs_entry}_{localizacao}"
+        if picking_key in vistos:
+            erros.append(f'Pedido {abs_entry} / {localizacao}: informado mais de uma vez.')
+        elif not picking_sessao_repository.picking_existe(sid, picking_key):
+            erros.append(f'Pedido {abs_entry} / {localizacao}: nenhuma separação em andamento.')
+        vistos.add(picking_key)
+    if erros:
+        return _api_erro('Nenhuma separação foi finalizada.', erros=erros)
+
+    lote = [
+        (abs_entry, localizacao, picking_sessao_repository.get_pacotes(sid, f"{abs_entry}_{localizacao}"), report)
+        for abs_entry, localizacao, report in separacoes
+    ]
+    if not pedidos_service.finalizar_separacoes_em_lote(lote):
+        return _api_erro('Ocorreu um erro ao finalizar as separações.', 500)
+
+    for abs_entry, localizacao, _, _ in lote:
+        picking_sessao_repository.remover_picking(sid, f"{abs_entry}_{localizacao}")
+    return jsonify({'status': 'success', 'finalizados': len(lote), 'redirect': url_for('pedidos.listar_pedidos')})
+
 @pedidos_bp.route('/picking/pacote/excluir/<int:abs_entry>/<localizacao>/<int:pacote_id>')
 @order_type_required
 def excluir_pacote_sessao(abs_entry, localizacao, pacote_id):
     picking_key = f"{abs_entry}_{localizacao}"
-    if 'pickings_in_progress' in session and picking_key in session['pickings_in_progress']:
-        pacotes = session['pickings_in_progress'][picking_key]['pacotes']
-        
-        pacote_encontrado = next((p for p in pacotes if p['id'] == pacote_id), None)
-        
-        if pacote_encontrado:
-            pacotes.remove(pacote_encontrado)
-            for i, p in enumerate(pacotes):
-                p['id'] = i + 1
-            session.modified = True
+    sid = _picking_sid()
+    if picking_sessao_repository.picking_existe(sid, picking_key):
+        if picking_sessao_repository.excluir_pacote(sid, picking_key, pacote_id):
             flash(f'Pacote {pacote_id} excluído.', 'success')
         else:
             flash(f'Pacote {pacote_id} não encontrado.', 'danger')
@@ -308,11 +473,12 @@ def excluir_pacote_sessao(abs_entry, localizacao, pacote_id):
 @order_type_required
 def editar_pacote_sessao(abs_entry, localizacao, pacote_id):
     picking_key = f"{abs_entry}_{localizacao}"
-    if 'pickings_in_progress' not in session or picking_key not in session['pickings_in_progress']:
+    sid = _picking_sid()
+    if not picking_sessao_repository.picking_existe(sid, picking_key):
         flash('Nenhuma separação em andamento para este picking.', 'warning')
         return redirect(url_for('pedidos.listar_pedidos'))
 
-    pacotes = session['pickings_in_progress'][picking_key]['pacotes']
+    pacotes = picking_sessao_repository.get_pacotes(sid, picking_key)
     pacote_para_editar = next((p for p in pacotes if p['id'] == pacote_id), None)
 
     if not pacote_para_editar:
@@ -378,14 +544,11 @@ def editar_pacote_sessao(abs_entry, localizacao, pacote_id):
         pacote_para_editar['localizacao'] = request.form.get('localizacao')
 
         if not pacote_para_editar['itens']:
-            pacotes.remove(pacote_para_editar)
-            # Re-indexar IDs se um pacote for removido
-            for i, p in enumerate(pacotes):
-                p['id'] = i + 1
-            session.modified = True
+            # A exclusão re-indexa os IDs dos pacotes seguintes
+            picking_sessao_repository.excluir_pacote(sid, picking_key, pacote_id)
             flash(f'Pacote {pacote_id} foi removido por estar vazio.', 'success')
         else:
-            session.modified = True
+            picking_sessao_repository.atualizar_pacote(sid, picking_key, pacote_para_editar)
             flash('Pacote atualizado com sucesso!', 'success')
             
         return redirect(url_for('pedidos.separar_picking', abs_entry=abs_entry, localizacao=localizacao))
@@ -399,7 +562,7 @@ def editar_pacote_sessao(abs_entry, localizacao, pacote_id):
 @pedidos_bp.route('/ordenacao')
 @roles_required(list(UserPermissions.EXPEDICA_GERENCIAL_ROLES))
 def ordenacao_pedidos():
-    perms = UserPermissions(session.get('user'))
+    perms = get_current_user_permissions()
 
     pedidos_finais, _, _ = pedidos_service.get_pedidos_para_listar()
     
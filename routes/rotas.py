@@ -20,17 +20,16 @@ def manage_rotas():
 @roles_required(list(UserPermissions.ROTA_ROLES))
 def planejamento_mapa():
     """Página de planejamento de rotas, baseada no mapa."""
-    pedidos_disponiveis = mapa_service.get_entregas_para_mapa() # Reutiliza o serviço do mapa
-    locations_json = json.dumps([p for p in pedidos_disponiveis if not p['GeoError']])
+    entregas = mapa_service.get_entregas_para_mapa() # Reutiliza o serviço do mapa
+    locations_json = json.dumps([p for p in entregas if not p['GeoError']])
     
     df_frota = frota_repository.get_frota_data()
     caminhoes_disponiveis = df_frota[df_frota['Status'] == 'Disponível'].to_dict('records')
     
     # Adicionar peso a cada pedido para o frontend
-    df_picking = rotas_service.get_pedidos_disponiveis()
-    pesos_map = df_picking.set_index('AbsEntry')['PesoTotal'].to_dict()
-    for pedido in pedidos_disponiveis:
-        pedido['Peso'] = pesos_map.get(pedido['AbsEntry'], 0)
+    # O resultado do serviço é compartilhado (services/memoizacao.py): o peso vai em cópias.
+    pesos_map = {p['AbsEntry']: p['PesoTotal'] for p in rotas_service.get_pedidos_disponiveis()}
+    pedidos_disponiveis = [{**pedido, 'Peso': pesos_map.get(pedido['AbsEntry'], 0)} for pedido in entregas]
         
     return render_template(
         'rotas/planejamento_mapa.html',
@@ -0,0 +1,91 @@
+# services/arrow_utils.py
+#
+# Helpers de pyarrow.compute usados pelas listas mais acessadas (pedidos, packing, painel,
+# mapa e planejamento). As tabelas vêm dos snapshots Arrow mapeados em memória; os dados
+# só viram dicionários Python na saída para o template/JSON.
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from data import schemas, snapshots
+
+COLUNA_INDICE = '__idx'
+
+def _normalizar(coluna):
+    # Colunas com dicionário (data/schemas.py) são decodificadas: joins e group_by do
+    # Arrow trabalham com os valores.
+    if pa.types.is_dictionary(coluna.type):
+        coluna = pc.cast(coluna, coluna.type.value_type)
+    if pa.types.is_large_string(coluna.type):
+        coluna = pc.cast(coluna, pa.string())
+    return coluna
+
+def tabela(nome, colunas):
+    """
+    Colunas `colunas` do snapshot do dataset (zero-copy), já com os tipos do schema
+    declarado. Um arquivo inexistente vira uma tabela vazia com o mesmo formato.
+    """
+    origem = snapshots.get_table(nome)
+    linhas = 0 if origem is None else origem.num_rows
+    arrays = []
+    for coluna in colunas:
+        if origem is not None and coluna in origem.column_names:
+            array = _normalizar(origem[coluna])
+        else:
+            array = pa.nulls(linhas, type=schemas.tipo_coluna(nome, coluna))
+        arrays.append(array)
+    return pa.table(arrays, names=list(colunas))
+
+def com_indice(t):
+    """Numera as linhas na ordem atual, para preservar a ordem depois de joins."""
+    if COLUNA_INDICE in t.column_names:
+        t = t.drop_columns([COLUNA_INDICE])
+    return t.append_column(COLUNA_INDICE, pa.array(range(t.num_rows), type=pa.int64()))
+
+def primeira_ocorrencia(t, chaves):
+    """Equivalente a drop_duplicates(subset=chaves) (mantém a primeira linha, na ordem original)."""
+    t = com_indice(t)
+    primeiras = t.group_by(chaves, use_threads=False).aggregate([(COLUNA_INDICE, 'min')])
+    indices = pc.sort_indices(primeiras[f'{COLUNA_INDICE}_min'])
+    return com_indice(t.take(pc.take(primeiras[f'{COLUNA_INDICE}_min'], indices)))
+
+def ordenar_pelo_indice(t):
+    return t.sort_by(COLUNA_INDICE)
+
+def texto_preenchido(coluna):
+    """Não nulo e não vazio após strip (dropna + str.strip() != '')."""
+    preenchido = pc.not_equal(pc.utf8_trim_whitespace(coluna), '')
+    return pc.fill_null(pc.and_(pc.is_valid(coluna), preenchido), False)
+
+def igual(coluna, valor):
+    return pc.fill_null(pc.equal(coluna, valor), False)
+
+def diferente(coluna, valor):
+    """Como no pandas, nulo é diferente de qualquer valor."""
+    return pc.fill_null(pc.not_equal(coluna, valor), True)
+
+def vazio(coluna):
+    """Nulo, ou texto vazio (para colunas de texto)."""
+    if pa.types.is_string(coluna.type) or pa.types.is_large_string(coluna.type):
+        return pc.fill_null(pc.or_(pc.is_null(coluna), pc.equal(coluna, '')), True)
+    return pc.is_null(coluna)
+
+def marcar_chaves(t, outra, chaves, flag):
+    """Adiciona a coluna booleana `flag`: a chave da linha existe em `outra` (semi-join)."""
+    distintas = outra.select(chaves).group_by(chaves).aggregate([])
+    distintas = distintas.append_column(flag, pa.array([True] * distintas.num_rows, type=pa.bool_()))
+    t = com_indice(t) if COLUNA_INDICE not in t.column_names else t
+    unida = ordenar_pelo_indice(t.join(distintas, keys=chaves, join_type='left outer'))
+    return unida.set_column(unida.column_names.index(flag), flag, pc.fill_null(unida[flag], False))
+
+def com_chaves(t, outra, chave):
+    """Semi-join: linhas de `t` cuja chave aparece em `outra` (isin)."""
+    return t.filter(pc.is_in(t[chave], value_set=pc.unique(outra[chave])))
+
+def sem_chaves(t, outra, chave):
+    """Anti-join: linhas de `t` cuja chave não aparece em `outra` (~isin)."""
+    return t.filter(pc.invert(pc.is_in(t[chave], value_set=pc.unique(outra[chave]))))
+
+def soma(coluna_ou_nome):
+    """Agregação de soma com o comportamento do pandas (grupo só com nulos soma 0)."""
+    return (coluna_ou_nome, 'sum', pc.ScalarAggregateOptions(min_count=0))
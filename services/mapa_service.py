@@ -1,58 +1,68 @@
 # services/mapa_service.py
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 import requests
+import threading
 import time
-from data import pedidos_repository, separacao_repository, geoloc_repository, regioes_repository
+import unicodedata
+from data import alteracoes_picking, observador, pedidos_repository, separacao_repository, geoloc_repository, regioes_repository
+from services import arrow_utils
+from services.memoizacao import memoizar
 from flask import current_app
 
+CAMPOS_ENDERECO = ['U_GI_Rua', 'U_GI_NumRua', 'U_GI_Bairro', 'U_GI_Cidade', 'U_GI_Estado']
+
+def _to_float(v):
+    try:
+        v = float(v)
+    except (TypeError, ValueError):
+        return None
+    return None if v != v else v
+
+@memoizar()
 def get_entregas_para_mapa():
-    df_picking = pedidos_repository.get_picking_data()
-    df_separacao = separacao_repository.get_separacao_data()
-    df_geoloc = geoloc_repository.get_geoloc_data()
+    colunas = ['AbsEntry', 'CardName', 'U_TU_QuemEntrega', 'U_SPS_Latitude', 'U_SPS_Longitude'] + CAMPOS_ENDERECO
+    picking = arrow_utils.tabela('picking', colunas)
 
-    if df_picking.empty:
+    if picking.num_rows == 0:
         return []
 
-    df_entregas = df_picking[df_picking['U_TU_QuemEntrega'] != '02'].copy()
+    entregas = picking.filter(arrow_utils.diferente(picking['U_TU_QuemEntrega'], '02'))
+    entregas = arrow_utils.primeira_ocorrencia(entregas, ['AbsEntry'])
 
-    if not df_geoloc.empty:
-        df_entregas.set_index('AbsEntry', inplace=True)
-        df_geoloc.set_index('AbsEntry', inplace=True)
-        df_entregas.update(df_geoloc)
-        df_entregas.reset_index(inplace=True)
-
-    pedidos_mapa = []
-    pedidos_agrupados = df_entregas.groupby('AbsEntry')
+    # Coordenadas corrigidas manualmente (geoloc) têm prioridade sobre as do picking.
+    geoloc = arrow_utils.tabela('geoloc', ['AbsEntry', 'U_SPS_Latitude', 'U_SPS_Longitude'])
+    geoloc = geoloc.rename_columns(['AbsEntry', '__lat', '__lon'])
+    entregas = arrow_utils.ordenar_pelo_indice(entregas.join(geoloc, keys='AbsEntry', join_type='left outer'))
+    latitudes = pc.coalesce(pc.cast(entregas['__lat'], pa.string()), pc.cast(entregas['U_SPS_Latitude'], pa.string()))
+    longitudes = pc.coalesce(pc.cast(entregas['__lon'], pa.string()), pc.cast(entregas['U_SPS_Longitude'], pa.string()))
+    entregas = entregas.select(['AbsEntry', 'CardName'] + CAMPOS_ENDERECO) \
+        .append_column('Latitude', latitudes).append_column('Longitude', longitudes) \
+        .sort_by('AbsEntry')
 
     def clean_value(v):
-        if pd.isna(v):
+        if v is None:
             return ''
         s = str(v).strip()
         return '' if s.lower() == 'nan' else s
 
-    for abs_entry, group in pedidos_agrupados:
-        pedido_info = group.iloc[0]
-        lat = pd.to_numeric(pedido_info.get('U_SPS_Latitude'), errors='coerce')
-        lon = pd.to_numeric(pedido_info.get('U_SPS_Longitude'), errors='coerce')
-        has_valid_coords = pd.notna(lat) and pd.notna(lon) and lat != 0 and lon != 0
+    pedidos_mapa = []
+    for pedido_info in entregas.to_pylist():
+        lat = _to_float(pedido_info['Latitude'])
+        lon = _to_float(pedido_info['Longitude'])
+        has_valid_coords = lat is not None and lon is not None and lat != 0 and lon != 0
 
         status = 'Pendente'
 
-        endereco_parts = [
-            clean_value(pedido_info.get('U_GI_Rua', '')),
-            clean_value(pedido_info.get('U_GI_NumRua', '')),
-            clean_value(pedido_info.get('U_GI_Bairro', '')),
-            clean_value(pedido_info.get('U_GI_Cidade', '')),
-            clean_value(pedido_info.get('U_GI_Estado', ''))
-        ]
-        
+        endereco_parts = [clean_value(pedido_info[campo]) for campo in CAMPOS_ENDERECO]
         endereco = ", ".join([p for p in endereco_parts if p])
 
-        cidade = clean_value(pedido_info.get('U_GI_Cidade', ''))
+        cidade = clean_value(pedido_info['U_GI_Cidade'])
 
         pedidos_mapa.append({
-            'AbsEntry': int(abs_entry),
+            'AbsEntry': int(pedido_info['AbsEntry']),
             'CardName': pedido_info['CardName'],
             'Status': status,
             'Latitude': lat if has_valid_coords else None,
@@ -197,4 +207,138 @@ def get_regioes():
 
 def save_regioes(regioes):
     df_regioes = pd.DataFrame(regioes)
-    return regioes_repository.save_regioes_data(df_regioes)
\ No newline at end of file
+    salvo = regioes_repository.save_regioes_data(df_regioes)
+    if salvo:
+        _regioes_index_cache['versao'] = None
+    return salvo
+
+_regioes_index_lock = threading.Lock()
+_regioes_index_cache = {'versao': None, 'index': None, 'versao_picking': None, 'pedidos': None}
+
+def normalizar_cidade(nome):
+    """Normaliza o nome da cidade (sem acento, maiúsculo, espaços simples) para comparação."""
+    if nome is None or (not isinstance(nome, str) and pd.isna(nome)):
+        return ''
+    texto = str(nome).strip()
+    if texto.lower() == 'nan':
+        return ''
+    texto = ''.join(c for c in unicodedata.normalize('NFD', texto)
+                    if unicodedata.category(c) != 'Mn')
+    return ' '.join(texto.upper().split())
+
+def _pedidos_de_entrega(abs_entries=None):
+    """{AbsEntry: (cidade, peso)} dos pedidos de entrega no picking (só `abs_entries`, se informado)."""
+    picking = arrow_utils.tabela('picking', ['AbsEntry', 'U_TU_QuemEntrega', 'U_GI_Cidade', 'SWeight1', 'RelQtty'])
+    if abs_entries is not None:
+        picking = picking.filter(pc.is_in(picking['AbsEntry'], value_set=pa.array(sorted(abs_entries), type=pa.int64())))
+    picking = picking.filter(arrow_utils.diferente(picking['U_TU_QuemEntrega'], '02'))
+    if picking.num_rows == 0:
+        return {}
+
+    df_entregas = picking.to_pandas()
+    pesos = df_entregas['SWeight1'].fillna(0) * df_entregas['RelQtty'].fillna(0)
+    df_pedidos = pd.DataFrame({
+        'AbsEntry': df_entregas['AbsEntry'],
+        'Cidade': df_entregas['U_GI_Cidade'],
+        'Peso': pesos
+    }).groupby('AbsEntry').agg(Cidade=('Cidade', 'first'), Peso=('Peso', 'sum'))
+    return {int(abs_entry): (cidade, float(peso))
+            for abs_entry, cidade, peso in zip(df_pedidos.index, df_pedidos['Cidade'], df_pedidos['Peso'])}
+
+def _build_regioes_index(pedidos):
+    regioes = get_regioes()
+
+    cidade_para_regioes = {}
+    regioes_index = {}
+    for regiao in regioes:
+        nome = regiao.get('Nome')
+        cidades = regiao.get('Cidades') or []
+        regioes_index[nome] = {
+            'Nome': nome,
+            'Cidades': list(cidades),
+            'Pedidos': [],
+            'NumPedidos': 0,
+            'PesoTotal': 0.0
+        }
+        for cidade in cidades:
+            chave = normalizar_cidade(cidade)
+            if chave and nome not in cidade_para_regioes.setdefault(chave, []):
+                cidade_para_regioes[chave].append(nome)
+
+    pedido_para_regioes = {}
+    sem_regiao = []
+
+    for abs_entry in sorted(pedidos):
+        cidade, peso = pedidos[abs_entry]
+        nomes = cidade_para_regioes.get(normalizar_cidade(cidade), [])
+        if not nomes:
+            sem_regiao.append(abs_entry)
+            continue
+        pedido_para_regioes[abs_entry] = nomes
+        for nome in nomes:
+            info = regioes_index[nome]
+            info['Pedidos'].append(abs_entry)
+            info['NumPedidos'] += 1
+            info['PesoTotal'] += peso
+
+    return {
+        'cidades': cidade_para_regioes,
+        'regioes': regioes_index,
+        'pedidos': pedido_para_regioes,
+        'sem_regiao': sem_regiao
+    }
+
+def _atualizar_pedidos(cache):
+    """
+    Cidade e peso por pedido. Quando o feed de alterações do picking cobre o intervalo
+    desde a última versão usada, só os pedidos alterados são relidos.
+    """
+    atual, alterados = alteracoes_picking.pedidos_alterados(cache['versao_picking'])
+    if alterados is None or cache['pedidos'] is None:
+        pedidos = _pedidos_de_entrega()
+    else:
+        pedidos = {k: v for k, v in cache['pedidos'].items() if k not in alterados}
+        if alterados:
+            pedidos.update(_pedidos_de_entrega(alterados))
+    cache['pedidos'] = pedidos
+    cache['versao_picking'] = atual
+    return pedidos
+
+def get_regioes_index():
+    """
+    Índice cidade normalizada -> região(ões), com contagem de pedidos e peso total
+    por região. Reconstruído apenas quando o arquivo de regiões ou o de picking mudam;
+    numa nova exportação do picking, só os pedidos alterados são reagrupados.
+    """
+    versao = (regioes_repository.get_regioes_file_version(),
+              pedidos_repository.get_picking_file_version())
+    cache = _regioes_index_cache
+    if cache['versao'] == versao and cache['index'] is not None:
+        return cache['index']
+
+    with _regioes_index_lock:
+        if cache['versao'] != versao or cache['index'] is None:
+            pedidos = _atualizar_pedidos(cache)
+            cache['index'] = _build_regioes_index(pedidos)
+            cache['versao'] = versao
+        return cache['index']
+
+def _reconstruir_regioes_index(recarregados):
+    # Nova exportação ou regiões alteradas: o índice é refeito na thread do observador.
+    if recarregados & {'picking', 'regioes'}:
+        get_regioes_index()
+
+observador.ao_recarregar(_reconstruir_regioes_index)
+
+def get_regiao_de_cidade(cidade):
+    return get_regioes_index()['cidades'].get(normalizar_cidade(cidade), [])
+
+def get_pedidos_por_regiao(nome_regiao=None):
+    index = get_regioes_index()
+    regioes = list(index['regioes'].values())
+    if nome_regiao:
+        regioes = [r for r in regioes if r['Nome'] == nome_regiao]
+    return {
+        'regioes': regioes,
+        'sem_regiao': index['sem_regiao']
+    }
@@ -0,0 +1,97 @@
+# services/memoizacao.py
+#
+# Memoização dos resultados derivados mais pedidos (quadro de pedidos, fila de packing,
+# painel, mapa, rotas): o mesmo resultado era recalculado para cada usuário entre uma
+# alteração e outra dos dados.
+
+import functools
+import os
+import threading
+from collections import OrderedDict
+
+from data import snapshots
+
+# Entradas (combinações de argumentos) guardadas por função; 0 desativa a memoização.
+MAX_ENTRADAS = int(os.getenv('SGD_MEMOIZACAO_ENTRADAS', '32'))
+
+_memoizadas = {}
+
+
+class Memoizacao:
+    """
+    Cache LRU, por processo, dos resultados de uma função de services/.
+
+    A chave são os argumentos da chamada. Durante o cálculo são registrados os datasets
+    que a função leu e a versão de cada um (snapshots.registrar_leituras); o resultado só
+    é reaproveitado enquanto todos continuam na mesma versão, então não há invalidação
+    manual. O resultado é compartilhado entre as chamadas: quem for alterá-lo deve
+    trabalhar em uma cópia.
+    """
+
+    def __init__(self, funcao, max_entries=MAX_ENTRADAS):
+        self.funcao = funcao
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entradas = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __call__(self, *args, **kwargs):
+        if self.max_entries <= 0:
+            return self.funcao(*args, **kwargs)
+        chave = (args, tuple(sorted(kwargs.items())))
+        with self._lock:
+            entrada = self._entradas.get(chave)
+        if entrada is not None:
+            leituras, resultado = entrada
+            if all(snapshots.versao_leitura(nome) == versao for nome, versao in leituras.items()):
+                with self._lock:
+                    if chave in self._entradas:
+                        self._entradas.move_to_end(chave)
+                    self.hits += 1
+                # Uma função memoizada que chama outra também depende dos datasets desta.
+                snapshots.anotar_leituras(leituras)
+                return resultado
+
+        with snapshots.registrar_leituras() as leituras:
+            resultado = self.funcao(*args, **kwargs)
+
+        with self._lock:
+            self.misses += 1
+            self._entradas[chave] = (leituras, resultado)
+            self._entradas.move_to_end(chave)
+            while len(self._entradas) > self.max_entries:
+                self._entradas.popitem(last=False)
+        return resultado
+
+    def clear(self):
+        with self._lock:
+            self._entradas.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'entries': len(self._entradas),
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_ratio': (self.hits / total) if total else 0.0
+            }
+
+
+def memoizar(max_entries=MAX_ENTRADAS):
+    """Decorator: memoiza a função (argumentos hasheáveis) pelas versões dos datasets que ela lê."""
+    def decorator(funcao):
+        memoizada = Memoizacao(funcao, max_entries=max_entries)
+        _memoizadas[f"{funcao.__module__}.{funcao.__qualname__}"] = memoizada
+        @functools.wraps(funcao)
+        def wrapper(*args, **kwargs):
+            return memoizada(*args, **kwargs)
+        wrapper.memoizacao = memoizada
+        return wrapper
+    return decorator
+
+
+def estatisticas():
+    """{função: stats} das funções memoizadas neste processo."""
+    return {nome: memoizada.stats() for nome, memoizada in sorted(_memoizadas.items())}
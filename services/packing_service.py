@@ -1,95 +1,116 @@
-import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime
+from services import arrow_utils
+from services.memoizacao import memoizar
 from data import packing_repository, pedidos_repository, separacao_repository
 
-def get_pedidos_para_packing(user_perms):
-    df_pacotes = pedidos_repository.get_pacotes_data()
-    df_picking = pedidos_repository.get_picking_data()
-    df_packing_finalizado = packing_repository.get_packing_data()
-    df_separacao = separacao_repository.get_separacao_data()
+COLUNAS_PACOTE = ['AbsEntry', 'Localizacao', 'PackageID', 'Weight', 'ItemCode', 'ItemName',
+                  'Quantity', 'UomCode', 'Report', 'Location']
+
+@memoizar(max_entries=1)
+def _indice_pacotes():
+    """
+    Índice dos pacotes por (AbsEntry, Localizacao), construído uma vez por versão do
+    dataset: 'ordenados' (linhas agrupadas pelo par, na ordem de gravação dentro de cada
+    um), 'faixas' ({(AbsEntry, Localizacao): (início, fim)} em 'ordenados') e 'primeiras'
+    (a primeira linha de cada par, na ordem de gravação).
+    """
+    chaves = ['AbsEntry', 'Localizacao']
+    pacotes = arrow_utils.com_indice(arrow_utils.tabela('pacotes', COLUNAS_PACOTE))
+    ordenados = pacotes.sort_by([(c, 'ascending') for c in chaves + [arrow_utils.COLUNA_INDICE]])
+    posicoes = ordenados.select(chaves).append_column('__pos', pa.array(range(ordenados.num_rows), type=pa.int64()))
+    grupos = posicoes.group_by(chaves, use_threads=False).aggregate([('__pos', 'min'), ('__pos', 'max')])
+
+    inicios = grupos['__pos_min']
+    faixas = {
+        (abs_entry, localizacao): (inicio, fim + 1)
+        for abs_entry, localizacao, inicio, fim in zip(
+            grupos['AbsEntry'].to_pylist(), grupos['Localizacao'].to_pylist(),
+            inicios.to_pylist(), grupos['__pos_max'].to_pylist(),
+        )
+    }
+    primeiras = arrow_utils.ordenar_pelo_indice(ordenados.take(inicios))
+    return {'ordenados': ordenados, 'faixas': faixas, 'primeiras': primeiras}
 
-    if df_pacotes.empty or df_picking.empty:
+def get_pedidos_para_packing(user_perms):
+    return _pedidos_para_packing(user_perms.can_view_entregas(), user_perms.can_view_retira())
+
+@memoizar()
+def _pedidos_para_packing(ver_entregas, ver_retira):
+    """Fila de packing para quem vê entregas e/ou retiras (a chave do cache são essas duas permissões)."""
+    chaves = ['AbsEntry', 'Localizacao']
+    # Uma linha por pedido/localização (a primeira gravada), direto do índice: o custo
+    # acompanha o tamanho da fila, e não o total de pacotes.
+    pacotes = _indice_pacotes()['primeiras'].select(chaves + ['PackageID', 'Weight', 'Location', arrow_utils.COLUNA_INDICE])
+    picking = arrow_utils.tabela('picking', ['AbsEntry', 'CardName', 'U_TU_QuemEntrega'])
+
+    if pacotes.num_rows == 0 or picking.num_rows == 0:
         return []
 
-    df_pacotes.dropna(subset=['Localizacao'], inplace=True)
-    df_pacotes = df_pacotes[df_pacotes['Localizacao'].str.strip() != '']
+    pacotes = pacotes.filter(arrow_utils.texto_preenchido(pacotes['Localizacao']))
+    picking_info = arrow_utils.primeira_ocorrencia(picking, ['AbsEntry']).drop_columns([arrow_utils.COLUNA_INDICE])
+    pacotes = arrow_utils.ordenar_pelo_indice(pacotes.join(picking_info, keys='AbsEntry', join_type='left outer'))
 
-    df_picking_info = df_picking.drop_duplicates(subset=['AbsEntry'])[['AbsEntry', 'CardName', 'U_TU_QuemEntrega']]
+    # Entregas primeiro, depois retiras (mesma ordem do concat anterior).
+    is_retira = arrow_utils.igual(pacotes['U_TU_QuemEntrega'], '02')
+    grupos_visiveis = []
+    if ver_entregas:
+        grupos_visiveis.append(pacotes.filter(pc.invert(is_retira)))
+    if ver_retira:
+        grupos_visiveis.append(pacotes.filter(is_retira))
 
-    df_pacotes_com_tipo = pd.merge(df_pacotes, df_picking_info[['AbsEntry', 'U_TU_QuemEntrega']], on='AbsEntry', how='left')
-    
-    pedidos_visiveis = []
-    if user_perms.can_view_entregas():
-        pedidos_visiveis.append(df_pacotes_com_tipo[df_pacotes_com_tipo['U_TU_QuemEntrega'] != '02'])
-    if user_perms.can_view_retira():
-        pedidos_visiveis.append(df_pacotes_com_tipo[df_pacotes_com_tipo['U_TU_QuemEntrega'] == '02'])
-    
-    if not pedidos_visiveis:
+    if not grupos_visiveis:
         return []
-    df_pacotes_filtrados = pd.concat(pedidos_visiveis)
-
-    pedidos_para_packing_base = df_pacotes_filtrados.drop_duplicates(subset=['AbsEntry', 'Localizacao'])
-    
-    pedidos_para_packing_com_nome = pd.merge(pedidos_para_packing_base, df_picking_info[['AbsEntry', 'CardName']], on='AbsEntry', how='left')
-
-    finalizados_keys = set(zip(df_packing_finalizado['AbsEntry'], df_packing_finalizado['Localizacao']))
-    incompletos_keys = set()
-    df_incompleto = df_separacao[df_separacao['DiscrepancyLog'].notna() & (df_separacao['DiscrepancyLog'] != '')]
-    if not df_incompleto.empty:
-        incompletos_keys = set(zip(df_incompleto['AbsEntry'], df_incompleto['Localizacao']))
+    visiveis = arrow_utils.com_indice(pa.concat_tables(grupos_visiveis))
 
-    pedidos_para_packing_final = []
-    for _, row in pedidos_para_packing_com_nome.iterrows():
-        key = (row['AbsEntry'], row['Localizacao'])
+    separacao = arrow_utils.tabela('separacao', chaves + ['DiscrepancyLog'])
+    incompletos = separacao.filter(arrow_utils.texto_preenchido(pc.cast(separacao['DiscrepancyLog'], pa.string())))
+    visiveis = arrow_utils.marcar_chaves(visiveis, incompletos, chaves, '__incompleto')
+    visiveis = arrow_utils.marcar_chaves(visiveis, arrow_utils.tabela('packing', chaves), chaves, '__finalizado')
 
-        if key in incompletos_keys:
-            continue
-
-        pedido_dict = row.to_dict()
-        pedido_dict['Status'] = 'Finalizado' if key in finalizados_keys else 'Aguardando Início'
-        pedidos_para_packing_final.append(pedido_dict)
+    visiveis = visiveis.filter(pc.invert(visiveis['__incompleto']))
+    status = pc.if_else(visiveis['__finalizado'], 'Finalizado', 'Aguardando Início')
+    visiveis = visiveis.drop_columns([arrow_utils.COLUNA_INDICE, '__incompleto', '__finalizado'])
 
-    return pedidos_para_packing_final
+    return visiveis.append_column('Status', status).to_pylist()
 
 def get_pacotes_para_conferencia(abs_entry, localizacao):
-
-    df_pacotes = pedidos_repository.get_pacotes_data()
-    
-    if df_pacotes.empty:
+    """Pacotes do pedido/localização ({'id', 'peso_original', 'itens'}), pelo índice; None se não houver."""
+    indice = _indice_pacotes()
+    faixa = indice['faixas'].get((abs_entry, localizacao))
+    if faixa is None:
         return None
 
-    df_pacotes['AbsEntry'] = pd.to_numeric(df_pacotes['AbsEntry'], errors='coerce').fillna(0).astype(int)
-
-    pacotes_pedido = df_pacotes[
-        (df_pacotes['AbsEntry'] == abs_entry) & 
-        (df_pacotes['Localizacao'] == localizacao)
-    ]
-
-    if pacotes_pedido.empty:
-        return None
+    inicio, fim = faixa
+    linhas = indice['ordenados'].slice(inicio, fim - inicio).select(COLUNAS_PACOTE).to_pylist()
 
     pacotes_agrupados = {}
-    for _, row in pacotes_pedido.iterrows():
+    for row in linhas:
         package_id = row['PackageID']
         if package_id not in pacotes_agrupados:
             pacotes_agrupados[package_id] = {
                 'id': package_id,
-                'peso_original': float(row['Weight']),
+                'peso_original': float(row['Weight']) if row['Weight'] is not None else float('nan'),
                 'itens': []
             }
-        pacotes_agrupados[package_id]['itens'].append(row.to_dict())
-    
+        pacotes_agrupados[package_id]['itens'].append(row)
+
     return list(pacotes_agrupados.values())
 
-def finalizar_processo_packing(abs_entry, localizacao, form_data, pacotes_info, user_email):
+TOLERANCIA_PESO = 0.05
 
+def _conferir_pacotes(pacotes_info, conferencia_do_pacote):
+    """
+    Valida a conferência de cada pacote. `conferencia_do_pacote(package_id)` retorna
+    (peso conferido, confirmado). Retorna (erros, anomalias).
+    """
     erros = []
     anomalias = []
 
     for pacote in pacotes_info:
         package_id = pacote['id']
-        peso_conferido_str = form_data.get(f'peso_pacote_{package_id}')
-        confirmado = form_data.get(f'confirm_pacote_{package_id}')
+        peso_conferido_str, confirmado = conferencia_do_pacote(package_id)
 
         if not confirmado:
             erros.append(f'O Pacote {package_id} precisa ser marcado como confirmado.')
@@ -98,37 +119,78 @@ def finalizar_processo_packing(abs_entry, localizacao, form_data, pacotes_info,
         try:
             peso_conferido = float(peso_conferido_str)
             peso_original = float(pacote['peso_original'])
-            tolerancia = 0.05
 
-            if abs(peso_conferido - peso_original) > (peso_original * tolerancia):
+            if abs(peso_conferido - peso_original) > (peso_original * TOLERANCIA_PESO):
                 anomalia_msg = f"Divergência de peso no Pacote {package_id}. Registrado: {peso_original:.2f} kg, Conferido: {peso_conferido:.2f} kg."
                 anomalias.append(anomalia_msg)
 
         except (ValueError, TypeError):
             erros.append(f'O peso informado para o Pacote {package_id} é inválido.')
 
-    if erros:
-        return erros
-    
-    df_packing = packing_repository.get_packing_data()
-    now = datetime.now().isoformat()
-    
-    packing_records = [{
+    return erros, anomalias
+
+def _registros_packing(abs_entry, localizacao, pacotes_info, anomalias, user_email, now):
+    return [{
         'AbsEntry': abs_entry,
         'Localizacao': localizacao,
         'PackageID': pacote['id'],
         'User': user_email,
         'StartTime': now,
         'EndTime': now,
-        'Anomalias': "; ".join(anomalias) 
+        'Anomalias': "; ".join(anomalias)
     } for pacote in pacotes_info]
-    
-    nova_conferencia = pd.DataFrame(packing_records)
-
-    df_packing = df_packing[~((df_packing['AbsEntry'] == abs_entry) & (df_packing['Localizacao'] == localizacao))]
-    
-    df_packing_final = pd.concat([df_packing, nova_conferencia], ignore_index=True)
-    
-    packing_repository.save_packing_data(df_packing_final)
-    
-    return []
\ No newline at end of file
+
+def finalizar_processo_packing(abs_entry, localizacao, form_data, pacotes_info, user_email):
+    erros, anomalias = _conferir_pacotes(
+        pacotes_info,
+        lambda package_id: (form_data.get(f'peso_pacote_{package_id}'), form_data.get(f'confirm_pacote_{package_id}'))
+    )
+    if erros:
+        return erros
+
+    packing_records = _registros_packing(abs_entry, localizacao, pacotes_info, anomalias, user_email, datetime.now())
+    packing_repository.substituir_packing(abs_entry, localizacao, packing_records)
+
+    return []
+
+def finalizar_packing_em_lote(conferencias, user_email):
+    """
+    Finaliza o packing de vários pedidos/localizações de uma vez. `conferencias` é uma
+    lista de {'abs_entry', 'localizacao', 'pacotes': {package_id: {'peso', 'confirmado'}}}.
+    Tudo é validado antes: com qualquer erro nada é gravado e a lista de erros (com o
+    pedido e a localização de cada um) é retornada. Sem erros, as conferências são
+    gravadas juntas, em uma única alteração do dataset de packing. Retorna [].
+    """
+    erros = []
+    linhas_por_chave = {}
+    now = datetime.now()
+
+    for conferencia in conferencias:
+        abs_entry, localizacao = conferencia['abs_entry'], conferencia['localizacao']
+        prefixo = f"Pedido {abs_entry} / {localizacao}"
+        if (abs_entry, localizacao) in linhas_por_chave:
+            erros.append(f"{prefixo}: informado mais de uma vez.")
+            continue
+
+        pacotes_info = get_pacotes_para_conferencia(abs_entry, localizacao)
+        if pacotes_info is None:
+            erros.append(f"{prefixo}: nenhum pacote encontrado.")
+            continue
+
+        informados = {str(k): v or {} for k, v in (conferencia.get('pacotes') or {}).items()}
+
+        def conferencia_do_pacote(package_id):
+            informado = informados.get(str(package_id), {})
+            return informado.get('peso'), informado.get('confirmado')
+
+        erros_pedido, anomalias = _conferir_pacotes(pacotes_info, conferencia_do_pacote)
+        erros.extend(f"{prefixo}: {erro}" for erro in erros_pedido)
+        linhas_por_chave[(abs_entry, localizacao)] = _registros_packing(
+            abs_entry, localizacao, pacotes_info, anomalias, user_email, now
+        )
+
+    if erros:
+        return erros
+    if not packing_repository.substituir_packing_em_lote(linhas_por_chave):
+        return ['Ocorreu um erro ao gravar as conferências de packing.']
+    return []
@@ -1,70 +1,79 @@
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime
-from data import pedidos_repository, separacao_repository, packing_repository, sequencia_repository
+from services import arrow_utils
+from services.memoizacao import memoizar
+from data import (pedidos_repository, separacao_repository, packing_repository, sequencia_repository,
+                  picking_sessao_repository)
 
-def get_pedidos_para_listar():
-    df_picking = pedidos_repository.get_picking_data()
-    df_separacao = separacao_repository.get_separacao_data()
-    df_packing = packing_repository.get_packing_data()
-    df_sequencia = sequencia_repository.get_sequencia_data()
-    sync_time = pedidos_repository.get_picking_file_mtime()
+# Campos do pedido usados pelos templates do quadro e da ordenação.
+CAMPOS_PEDIDO = ['AbsEntry', 'CardName', 'U_TU_QuemEntrega', 'Localizacao']
 
-    if df_picking.empty:
-        return [], set(), sync_time
+def _status_das_localizacoes():
+    """
+    Tabela (AbsEntry, Localizacao, Status, User) com uma linha por pedido/localização válida,
+    na ordem do arquivo de picking. Calculada inteiramente em Arrow.
+    """
+    chaves = ['AbsEntry', 'Localizacao']
+    picking = arrow_utils.tabela('picking', CAMPOS_PEDIDO)
+    picking = picking.filter(arrow_utils.texto_preenchido(picking['Localizacao']))
+    base = arrow_utils.primeira_ocorrencia(picking, chaves)
 
-    df_picking.dropna(subset=['Localizacao'], inplace=True)
-    df_picking = df_picking[df_picking['Localizacao'].str.strip() != '']
+    separacao = arrow_utils.primeira_ocorrencia(
+        arrow_utils.tabela('separacao', chaves + ['User', 'EndTime', 'DiscrepancyLog']), chaves
+    ).drop_columns([arrow_utils.COLUNA_INDICE])
+    separacao = separacao.append_column('__separacao', pa.array([True] * separacao.num_rows, type=pa.bool_()))
+    base = arrow_utils.ordenar_pelo_indice(base.join(separacao, keys=chaves, join_type='left outer'))
+    base = arrow_utils.marcar_chaves(base, arrow_utils.tabela('packing', chaves), chaves, '__packing')
 
-    packing_finalizado_keys = set()
-    if not df_packing.empty:
-        packing_finalizado_keys = set(zip(df_packing['AbsEntry'], df_packing['Localizacao']))
+    tem_separacao = pc.fill_null(base['__separacao'], False)
+    em_separacao = pc.and_(tem_separacao, arrow_utils.vazio(base['EndTime']))
+    incompleto = arrow_utils.texto_preenchido(pc.cast(base['DiscrepancyLog'], pa.string()))
 
-    df_separacao_indexed = df_separacao.set_index(['AbsEntry', 'Localizacao'])
+    status = pc.if_else(
+        pc.invert(tem_separacao), 'Pendente',
+        pc.if_else(em_separacao, 'Em separação',
+                   pc.if_else(incompleto, 'Picking Incompleto',
+                              pc.if_else(base['__packing'], 'Packing Finalizado', 'Aguardando Packing')))
+    )
+    usuario = pc.if_else(em_separacao, pc.cast(base['User'], pa.string()), pa.scalar(None, pa.string()))
+    return base.select(CAMPOS_PEDIDO).append_column('Status', status).append_column('User', usuario)
+
+@memoizar()
+def get_pedidos_para_listar():
+    sync_time = pedidos_repository.get_picking_file_mtime()
+    localizacoes = _status_das_localizacoes()
+
+    if localizacoes.num_rows == 0:
+        return [], set(), sync_time
 
     pedidos_agrupados = {}
     all_statuses = set()
-
-    for _, row in df_picking.drop_duplicates(subset=['AbsEntry', 'Localizacao']).iterrows():
+    # Fronteira com o template: só aqui os dados viram objetos Python.
+    for row in localizacoes.to_pylist():
         abs_entry = row['AbsEntry']
-        localizacao = row['Localizacao']
-        key = (abs_entry, localizacao)
-
-        status = 'Pendente'
-        user = None
-
-        if key in df_separacao_indexed.index:
-            separacao_info = df_separacao_indexed.loc[key]
-            end_time = separacao_info.get('EndTime')
-            
-            if pd.isna(end_time) or end_time is None or end_time == '':
-                status = "Em separação"
-                user = separacao_info['User']
-            else:
-                if separacao_info.get('DiscrepancyLog'):
-                    status = 'Picking Incompleto'
-                elif key in packing_finalizado_keys:
-                    status = 'Packing Finalizado'
-                else:
-                    status = 'Aguardando Packing'
-        
+        status = row['Status']
+        user = row['User']
         all_statuses.add(status)
 
         location_info = {
-            'Localizacao': localizacao,
+            'Localizacao': row['Localizacao'],
             'Status': status,
             'StatusCompleto': f"Em separação por {user}" if status == "Em separação" else status,
             'UserInSeparation': user
         }
 
         if abs_entry not in pedidos_agrupados:
-            pedidos_agrupados[abs_entry] = row.to_dict()
+            pedidos_agrupados[abs_entry] = {campo: row[campo] for campo in CAMPOS_PEDIDO}
             pedidos_agrupados[abs_entry]['locations'] = []
-        
+
         pedidos_agrupados[abs_entry]['locations'].append(location_info)
 
     lista_pedidos = list(pedidos_agrupados.values())
-    if not df_sequencia.empty:
-        sequencia_map = {row['AbsEntry']: row['Ordem'] for _, row in df_sequencia.iterrows()}
+    sequencia = arrow_utils.tabela('sequencia', ['AbsEntry', 'Ordem'])
+    if sequencia.num_rows > 0:
+        sequencia_map = dict(zip(sequencia['AbsEntry'].to_pylist(), sequencia['Ordem'].to_pylist()))
         
         pedidos_ordenados = sorted(
             [p for p in lista_pedidos if p['AbsEntry'] in sequencia_map],
@@ -82,34 +91,180 @@ def get_pedidos_para_listar():
 
     return lista_pedidos, sorted(list(all_statuses)), sync_time
 
+@memoizar()
+def get_painel_retirada():
+    """
+    Status dos pedidos "Cliente Retira" para o painel (ainda não finalizados no packing),
+    ordenados pelo cliente. Retorna None quando não há dados de picking.
+    """
+    picking = arrow_utils.tabela('picking', ['AbsEntry', 'CardName', 'U_TU_QuemEntrega', 'RelQtty'])
+    if picking.num_rows == 0:
+        return None
+
+    retirada = picking.filter(arrow_utils.igual(picking['U_TU_QuemEntrega'], '02'))
+    pedidos = retirada.group_by('AbsEntry', use_threads=False).aggregate([
+        ('CardName', 'first'), arrow_utils.soma('RelQtty')
+    ]).sort_by('AbsEntry')
+
+    packing = arrow_utils.tabela('packing', ['AbsEntry'])
+    pedidos = arrow_utils.sem_chaves(pedidos, packing, 'AbsEntry')
+
+    separacao = arrow_utils.tabela('separacao', ['AbsEntry', 'EndTime'])
+    finalizada = separacao.filter(pc.invert(arrow_utils.vazio(separacao['EndTime'])))
+    pedidos = arrow_utils.marcar_chaves(pedidos, separacao, ['AbsEntry'], '__iniciada')
+    pedidos = arrow_utils.marcar_chaves(pedidos, finalizada, ['AbsEntry'], '__finalizada')
+
+    pacotes = arrow_utils.tabela('pacotes', ['AbsEntry', 'Quantity', 'Location'])
+    por_pedido = pacotes.group_by('AbsEntry', use_threads=False).aggregate([
+        arrow_utils.soma('Quantity'), ('Location', 'distinct')
+    ])
+    pacotes_map = {
+        row['AbsEntry']: row for row in por_pedido.to_pylist()
+    }
+
+    pedidos_status = []
+    for row in pedidos.to_pylist():
+        abs_entry = row['AbsEntry']
+        status = 'Pendente'
+        percentual = 0
+        localizacao_retirada = ""
+        pacotes_pedido = pacotes_map.get(abs_entry)
+
+        if row['__finalizada']:
+            status = 'Aguardando Retirada'
+            percentual = 100
+            if pacotes_pedido:
+                localizacao_retirada = ", ".join(filter(None, pacotes_pedido['Location_distinct']))
+
+        elif row['__iniciada']:
+            status = 'Em Separação'
+            total_qtd_pedido = row['RelQtty_sum']
+            if pacotes_pedido and total_qtd_pedido > 0:
+                percentual = (pacotes_pedido['Quantity_sum'] / total_qtd_pedido) * 100
+
+        pedidos_status.append({
+            'AbsEntry': int(abs_entry),
+            'CardName': row['CardName_first'],
+            'Status': status,
+            'Percentual': int(round(percentual)),
+            'Localizacao': localizacao_retirada
+        })
+    pedidos_status.sort(key=lambda x: x['CardName'])
+    return pedidos_status
+
+UNIDADES_DECIMAIS = ('KG', 'METROS')
+
+def get_itens_do_picking(abs_entry, localizacao):
+    """Itens do pedido/localização no formato guardado na sessão de separação."""
+    df = pedidos_repository.get_picking_data()
+    if df.empty:
+        return []
+    itens = df[(df['AbsEntry'] == abs_entry) & (df['Localizacao'] == localizacao)]
+    return [{
+        'ItemCode': item_code,
+        'ItemName': item_name,
+        'UomCode': uom_code,
+        'RelQtty': float(rel_qtty),
+        'SWeight1': float(peso) if pd.notna(peso) else 0.0
+    } for item_code, item_name, uom_code, rel_qtty, peso in zip(
+        itens['ItemCode'], itens['ItemName'], itens['UomCode'], itens['RelQtty'], itens['SWeight1']
+    )]
+
+def calcular_quantidades_separadas(pacotes, ignorar_pacote_id=None):
+    quantidades = {}
+    for pacote in pacotes:
+        if pacote['id'] == ignorar_pacote_id:
+            continue
+        for item in pacote['itens']:
+            item_code = item['ItemCode']
+            quantidades[item_code] = quantidades.get(item_code, 0) + item['Quantity']
+    return quantidades
+
+def montar_itens_pacote(itens_pedido, quantidades, quantidades_separadas):
+    """
+    Valida as quantidades informadas para um pacote contra o RelQtty do pedido.
+    'quantidades' mapeia ItemCode -> valor informado (str ou número).
+    Retorna (itens_pacote, erros).
+    """
+    itens_pacote = []
+    erros = []
+    for item in itens_pedido:
+        item_code = item['ItemCode']
+        uom_code = item['UomCode']
+        valor = quantidades.get(item_code)
+        try:
+            quantidade = float(str(valor).replace(',', '.')) if valor not in (None, '') else 0
+        except (ValueError, TypeError):
+            erros.append(f"Valor inválido para a quantidade do item {item_code}.")
+            continue
+
+        if quantidade <= 0:
+            continue
+        if uom_code not in UNIDADES_DECIMAIS and quantidade != int(quantidade):
+            erros.append(f"Item {item_code} não aceita quantidade decimal (Unidade: {uom_code}).")
+            continue
+        if quantidades_separadas.get(item_code, 0) + quantidade > item['RelQtty']:
+            erros.append(f"Quantidade para o item {item_code} excede o solicitado no pedido.")
+            continue
+
+        itens_pacote.append({
+            "ItemCode": item_code,
+            "ItemName": item['ItemName'],
+            "Quantity": quantidade,
+            "UomCode": uom_code
+        })
+    return itens_pacote, erros
+
+def montar_pacote(dados, itens_pedido, quantidades_separadas):
+    """Monta um pacote a partir de um payload JSON (quantidades, peso, localizacao, report). Retorna (pacote, erros)."""
+    itens_pacote, erros = montar_itens_pacote(itens_pedido, dados.get('quantidades') or {}, quantidades_separadas)
+    if not erros and not itens_pacote:
+        erros.append("Nenhum item foi adicionado ao pacote. Preencha as quantidades.")
+    try:
+        peso = float(str(dados.get('peso')).replace(',', '.'))
+    except (ValueError, TypeError):
+        erros.append('O peso do pacote deve ser um número válido.')
+        peso = None
+    return {
+        'peso': peso,
+        'localizacao': dados.get('localizacao'),
+        'report': dados.get('report', ''),
+        'itens': itens_pacote
+    }, erros
+
+def calcular_totais_separacao(itens_pedido, pacotes):
+    quantidades_separadas = calcular_quantidades_separadas(pacotes)
+    itens = [{
+        'ItemCode': item['ItemCode'],
+        'RelQtty': item['RelQtty'],
+        'Separado': quantidades_separadas.get(item['ItemCode'], 0),
+        'Pendente': item['RelQtty'] - quantidades_separadas.get(item['ItemCode'], 0)
+    } for item in itens_pedido]
+    peso_total = 0.0
+    for pacote in pacotes:
+        try:
+            peso_total += float(pacote.get('peso') or 0)
+        except (ValueError, TypeError):
+            pass
+    return {
+        'itens': itens,
+        'num_pacotes': len(pacotes),
+        'peso_total': peso_total,
+        'completo': all(item['Pendente'] <= 0 for item in itens)
+    }
+
 def iniciar_nova_separacao(abs_entry, localizacao, user_email):
-    df_separacao = separacao_repository.get_separacao_data()
-    condition = (df_separacao['AbsEntry'] == abs_entry) & (df_separacao['Localizacao'] == localizacao)
-    separacao_existente = df_separacao[condition]
-
-    start_time = datetime.now().isoformat()
-
-    if separacao_existente.empty:
-        nova_separacao = pd.DataFrame([{
-            'AbsEntry': abs_entry, 'Localizacao': localizacao, 'User': user_email,
-            'StartTime': start_time, 'EndTime': None, 'DiscrepancyLog': '', 'DiscrepancyReport': ''
-        }])
-        df_separacao = pd.concat([df_separacao, nova_separacao], ignore_index=True)
-    else:
-        df_separacao.loc[condition, 'User'] = user_email
-        df_separacao.loc[condition, 'StartTime'] = start_time
-        df_separacao.loc[condition, 'EndTime'] = None
-        df_separacao.loc[condition, 'DiscrepancyLog'] = ''
-        df_separacao.loc[condition, 'DiscrepancyReport'] = ''
+    start_time = datetime.now()
 
-    separacao_repository.save_separacao_data(df_separacao)
-    return start_time
+    # Cria a separação ou reinicia a existente.
+    separacao_repository.definir_separacao(abs_entry, localizacao, {
+        'User': user_email, 'StartTime': start_time, 'EndTime': None,
+        'DiscrepancyLog': '', 'DiscrepancyReport': ''
+    }, inserir=True)
+    return start_time.isoformat()
 
 
-def finalizar_processo_separacao(abs_entry, localizacao, pacotes_sessao, discrepancy_report_text):
-    df_original = pedidos_repository.get_picking_data()
-    itens_originais = df_original[(df_original['AbsEntry'] == abs_entry) & (df_original['Localizacao'] == localizacao)]
-    
+def _log_discrepancias(itens_originais, pacotes_sessao):
     quantidades_separadas = {}
     for pacote in pacotes_sessao:
         for item in pacote['itens']:
@@ -124,51 +279,143 @@ def finalizar_processo_separacao(abs_entry, localizacao, pacotes_sessao, discrep
         if qtd_pedido != qtd_separada:
             log_entry = f"Item {item_code}: Pedido={qtd_pedido}, Separado={qtd_separada}"
             discrepancy_log.append(log_entry)
-            
-    log_string = " | ".join(discrepancy_log)
 
+    return " | ".join(discrepancy_log)
+
+def _linhas_pacotes(abs_entry, localizacao, pacotes_sessao):
     pacotes_data = []
     for pacote in pacotes_sessao:
         for item in pacote['itens']:
             pacotes_data.append({
                 'AbsEntry': abs_entry, 'Localizacao': localizacao,
                 'PackageID': pacote['id'], 'Weight': pacote['peso'],
-                'ItemCode': item['ItemCode'], 
+                'ItemCode': item['ItemCode'],
                 'ItemName': item['ItemName'],
                 'Quantity': item['Quantity'],
                 'UomCode': item.get('UomCode', ''),
-                'Report': pacote.get('report', ''), 
+                'Report': pacote.get('report', ''),
                 'Location': pacote.get('localizacao', '')
             })
-    
-    if pacotes_data:
-        df_pacotes_novos = pd.DataFrame(pacotes_data)
-        df_existente = pedidos_repository.get_pacotes_data()
-        if not df_existente.empty:
-            df_existente['AbsEntry'] = df_existente['AbsEntry'].astype(int)
-        
-        df_existente = df_existente[~((df_existente['AbsEntry'] == abs_entry) & (df_existente['Localizacao'] == localizacao))]
-        df_pacotes_final = pd.concat([df_existente, df_pacotes_novos], ignore_index=True)
-        pedidos_repository.save_pacotes_data(df_pacotes_final)
-
-    df_separacao = separacao_repository.get_separacao_data()
-    condition = (df_separacao['AbsEntry'] == abs_entry) & (df_separacao['Localizacao'] == localizacao)
-    df_separacao.loc[condition, 'EndTime'] = datetime.now().isoformat()
-    df_separacao.loc[condition, 'DiscrepancyLog'] = log_string
-    df_separacao.loc[condition, 'DiscrepancyReport'] = discrepancy_report_text
-    
-    return separacao_repository.save_separacao_data(df_separacao)
+    return pacotes_data
+
+def finalizar_processo_separacao(abs_entry, localizacao, pacotes_sessao, discrepancy_report_text):
+    return finalizar_separacoes_em_lote([(abs_entry, localizacao, pacotes_sessao, discrepancy_report_text)])
+
+def finalizar_separacoes_em_lote(separacoes):
+    """
+    Finaliza várias separações, cada uma (abs_entry, localizacao, pacotes da sessão,
+    relatório de divergências). O picking é lido uma vez, e os pacotes e as separações
+    de todas são gravados juntos: uma única alteração por dataset.
+    """
+    df_original = pedidos_repository.get_picking_data()
+    chaves = {(abs_entry, localizacao) for abs_entry, localizacao, _, _ in separacoes}
+    df_original = df_original[df_original['AbsEntry'].isin({abs_entry for abs_entry, _ in chaves})]
+    itens_por_chave = dict(iter(df_original.groupby(['AbsEntry', 'Localizacao'], observed=True, sort=False)))
+    sem_itens = df_original.iloc[0:0]
+
+    end_time = datetime.now()
+    pacotes_por_chave = {}
+    separacoes_por_chave = {}
+    for abs_entry, localizacao, pacotes_sessao, discrepancy_report_text in separacoes:
+        itens_originais = itens_por_chave.get((abs_entry, localizacao), sem_itens)
+        pacotes_data = _linhas_pacotes(abs_entry, localizacao, pacotes_sessao)
+        if pacotes_data:
+            pacotes_por_chave[(abs_entry, localizacao)] = pacotes_data
+        separacoes_por_chave[(abs_entry, localizacao)] = {
+            'EndTime': end_time,
+            'DiscrepancyLog': _log_discrepancias(itens_originais, pacotes_sessao),
+            'DiscrepancyReport': discrepancy_report_text
+        }
+
+    if pacotes_por_chave:
+        pedidos_repository.substituir_pacotes_em_lote(pacotes_por_chave)
+
+    return separacao_repository.definir_separacoes_em_lote(separacoes_por_chave)
 
 def salvar_sequencia_pedidos(tipo, nova_ordem):
-    df_sequencia_atual = sequencia_repository.get_sequencia_data()
-    
-    df_sequencia_filtrada = df_sequencia_atual[df_sequencia_atual['Tipo'] != tipo]
-    
     novos_dados = [{'AbsEntry': int(abs_entry), 'Tipo': tipo, 'Ordem': i} 
                    for i, abs_entry in enumerate(nova_ordem)]
     
     df_nova_sequencia = pd.DataFrame(novos_dados)
 
-    df_final = pd.concat([df_sequencia_filtrada, df_nova_sequencia], ignore_index=True)
+    def aplicar(df_sequencia_atual):
+        df_sequencia_filtrada = df_sequencia_atual[df_sequencia_atual['Tipo'] != tipo]
+        return pd.concat([df_sequencia_filtrada, df_nova_sequencia], ignore_index=True)
     
-    return sequencia_repository.save_sequencia_data(df_final)
\ No newline at end of file
+    return sequencia_repository.atualizar_sequencia_data(aplicar)
+
+def _aplicar_operacao_separacao(sid, picking_key, abs_entry, localizacao, operacao):
+    """Retorna (resultado, registrar). Operações com erro transitório não são registradas e podem ser reenviadas."""
+    if not picking_sessao_repository.picking_existe(sid, picking_key):
+        return {'status': 'rejeitada', 'erros': ['Nenhuma separação em andamento para este picking.']}, True
+
+    tipo = operacao.get('tipo')
+    dados = operacao.get('dados') or {}
+    pacotes = picking_sessao_repository.get_pacotes(sid, picking_key)
+
+    if tipo == 'finalizar':
+        if not finalizar_processo_separacao(abs_entry, localizacao, pacotes, dados.get('discrepancy_report', '')):
+            return {'status': 'erro', 'erros': ['Ocorreu um erro ao finalizar a separação.']}, False
+        picking_sessao_repository.remover_picking(sid, picking_key)
+        return {'status': 'aplicada', 'finalizado': True}, True
+
+    itens_pedido = picking_sessao_repository.get_itens_pedido(sid, picking_key)
+    if itens_pedido is None:
+        itens_pedido = get_itens_do_picking(abs_entry, localizacao)
+
+    if tipo == 'adicionar':
+        pacote, erros = montar_pacote(dados, itens_pedido, calcular_quantidades_separadas(pacotes))
+        if erros:
+            return {'status': 'rejeitada', 'erros': erros}, True
+        pacote = picking_sessao_repository.adicionar_pacote(sid, picking_key, {**pacote, 'uid': dados.get('uid')})
+        return {'status': 'aplicada', 'pacote_uid': pacote['uid']}, True
+
+    existente = next((p for p in pacotes if p.get('uid') == dados.get('uid')), None)
+    if existente is None:
+        return {'status': 'rejeitada', 'erros': ['Pacote não encontrado.']}, True
+
+    if tipo == 'excluir':
+        picking_sessao_repository.excluir_pacote(sid, picking_key, existente['id'])
+        return {'status': 'aplicada', 'pacote_uid': existente['uid']}, True
+
+    if tipo == 'editar':
+        quantidades_outros = calcular_quantidades_separadas(pacotes, ignorar_pacote_id=existente['id'])
+        pacote, erros = montar_pacote(dados, itens_pedido, quantidades_outros)
+        if erros:
+            return {'status': 'rejeitada', 'erros': erros}, True
+        picking_sessao_repository.atualizar_pacote(
+            sid, picking_key, {**pacote, 'id': existente['id'], 'uid': existente['uid']}
+        )
+        return {'status': 'aplicada', 'pacote_uid': existente['uid']}, True
+
+    return {'status': 'rejeitada', 'erros': [f'Operação desconhecida: {tipo}.']}, True
+
+def aplicar_operacoes_separacao(sid, picking_key, abs_entry, localizacao, operacoes):
+    """
+    Aplica, em ordem, um lote de operações enviadas pelo cliente offline da separação
+    (adicionar/editar/excluir pacote e finalizar). Cada operação traz um 'op_id' gerado
+    no cliente; a operação e seu registro são gravados na mesma transação, de modo que
+    lotes reenviados são aplicados exatamente uma vez.
+    """
+    resultados = []
+    for operacao in operacoes:
+        op_id = str(operacao.get('op_id') or '')
+        if not op_id:
+            resultados.append({'op_id': None, 'status': 'rejeitada', 'erros': ['Operação sem op_id.']})
+            continue
+
+        with picking_sessao_repository.transacao():
+            anterior = picking_sessao_repository.get_operacao(op_id)
+            if anterior is not None:
+                resultados.append({**anterior, 'duplicada': True})
+                continue
+            resultado, registrar = _aplicar_operacao_separacao(sid, picking_key, abs_entry, localizacao, operacao)
+            resultado['op_id'] = op_id
+            if registrar:
+                picking_sessao_repository.registrar_operacao(op_id, sid, picking_key, resultado)
+        resultados.append(resultado)
+
+        if resultado['status'] == 'erro':
+            # Mantém a ordem: as operações seguintes serão reenviadas junto com esta.
+            break
+    return resultados
\ No newline at end of file
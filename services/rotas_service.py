@@ -1,32 +1,48 @@
 # services/rotas_service.py
 
 import pandas as pd
+import pyarrow as pa
+import pyarrow.compute as pc
 from datetime import datetime
 from data import rotas_repository, pedidos_repository, frota_repository
+from services import arrow_utils
+from services.memoizacao import memoizar
 
+@memoizar()
 def get_pedidos_disponiveis():
     """
-    Retorna um DataFrame com pedidos que ainda não foram alocados a uma rota.
+    Retorna os pedidos que ainda não foram alocados a uma rota, um por pedido:
+    [{'AbsEntry', 'CardName', 'PesoTotal'}], ordenados por AbsEntry.
     """
-    df_picking = pedidos_repository.get_picking_data()
-    df_paradas = rotas_repository.get_paradas_data()
+    picking = arrow_utils.tabela('picking', ['AbsEntry', 'CardName', 'U_TU_QuemEntrega', 'SWeight1', 'RelQtty'])
+    # Paradas de rotas que não existem (gravação interrompida) não prendem o pedido.
+    paradas = arrow_utils.com_chaves(
+        arrow_utils.tabela('paradas', ['ID_Rota', 'AbsEntry']), arrow_utils.tabela('rotas', ['ID_Rota']), 'ID_Rota'
+    )
     
     # Consideramos apenas entregas, não retiradas
-    df_entregas = df_picking[df_picking['U_TU_QuemEntrega'] != '02'].copy()
-    
-    pedidos_alocados = set(df_paradas['AbsEntry'])
+    entregas = picking.filter(arrow_utils.diferente(picking['U_TU_QuemEntrega'], '02'))
     
     # Filtra pedidos que ainda não estão em nenhuma parada
-    df_disponiveis = df_entregas[~df_entregas['AbsEntry'].isin(pedidos_alocados)]
+    disponiveis = arrow_utils.sem_chaves(entregas, paradas, 'AbsEntry')
     
     # Agrupa para ter um pedido por linha, e calcula o peso total
-    df_agg = df_disponiveis.groupby('AbsEntry').agg(
-        CardName=('CardName', 'first'),
-        PesoTotal=('SWeight1', lambda x: (x * df_disponiveis.loc[x.index, 'RelQtty']).sum())
-    ).reset_index()
+    peso = pc.multiply(pc.cast(disponiveis['SWeight1'], pa.float64()), pc.cast(disponiveis['RelQtty'], pa.float64()))
+    disponiveis = disponiveis.append_column('PesoItem', peso)
+    agregado = disponiveis.group_by('AbsEntry', use_threads=False).aggregate([
+        ('CardName', 'first'), arrow_utils.soma('PesoItem')
+    ]).sort_by('AbsEntry')
 
-    return df_agg
+    return [
+        {'AbsEntry': abs_entry, 'CardName': card_name, 'PesoTotal': peso_total}
+        for abs_entry, card_name, peso_total in zip(
+            agregado['AbsEntry'].to_pylist(),
+            agregado['CardName_first'].to_pylist(),
+            agregado['PesoItem_sum'].to_pylist(),
+        )
+    ]
 
+@memoizar()
 def get_rotas_com_detalhes():
     """
     Lista todas as rotas com informações agregadas como peso total e número de paradas.
@@ -38,9 +54,9 @@ def get_rotas_com_detalhes():
     if df_rotas.empty:
         return []
 
-    # Calcula o peso de cada item no picking
-    df_picking['PesoItem'] = df_picking['SWeight1'] * df_picking['RelQtty']
-    peso_por_pedido = df_picking.groupby('AbsEntry')['PesoItem'].sum()
+    # Calcula o peso de cada item no picking (o DataFrame é compartilhado: não ganha a coluna)
+    peso_item = df_picking['SWeight1'] * df_picking['RelQtty']
+    peso_por_pedido = peso_item.groupby(df_picking['AbsEntry']).sum()
 
     # Agrega dados das paradas
     paradas_agg = df_paradas.groupby('ID_Rota').agg(
@@ -58,7 +74,12 @@ def get_rotas_com_detalhes():
     df_merged['Num_Paradas'] = df_merged['Num_Paradas'].fillna(0).astype(int)
     df_merged['Peso_Total_KG'] = df_merged['Peso_Total_KG'].fillna(0)
     
-    return df_merged.sort_values(by='Data_Rota', ascending=False).to_dict('records')
+    df_merged = df_merged.sort_values(by='Data_Rota', ascending=False)
+    # NaT é verdadeiro e seu strftime falha: datas ausentes vão para o template como None.
+    for coluna in df_merged.select_dtypes(include=['datetime', 'datetimetz']).columns:
+        df_merged[coluna] = df_merged[coluna].astype(object).where(df_merged[coluna].notna(), None)
+
+    return df_merged.to_dict('records')
 
 
 def create_nova_rota(dados_rota):
@@ -68,16 +89,16 @@ def create_nova_rota(dados_rota):
     - id_caminhao, data_rota, tipo, meta_kg, data_limite, observacoes
     - pedidos: uma lista de dicionários {'AbsEntry': id, 'CardName': nome}
     """
-    df_rotas = rotas_repository.get_rotas_data()
-    df_paradas = rotas_repository.get_paradas_data()
-    df_frota = frota_repository.get_frota_data()
+    caminhao = frota_repository.get_veiculo(dados_rota['id_caminhao'])
+    if caminhao is None:
+        return False, None
 
     id_rota = rotas_repository.get_next_rota_id()
-    
-    caminhao = df_frota[df_frota['ID_Caminhao'] == dados_rota['id_caminhao']].iloc[0]
+    if id_rota is None:
+        return False, None
 
     # Cria a nova rota
-    nova_rota_df = pd.DataFrame([{
+    nova_rota = {
         'ID_Rota': id_rota,
         'ID_Caminhao': dados_rota['id_caminhao'],
         'Placa_Caminhao': caminhao['Placa'],
@@ -88,8 +109,7 @@ def create_nova_rota(dados_rota):
         'Data_Limite': pd.to_datetime(dados_rota.get('data_limite')) if dados_rota.get('data_limite') else None,
         'Observacoes': dados_rota.get('observacoes', ''),
         'Tipo': dados_rota['tipo']
-    }])
-    df_rotas = pd.concat([df_rotas, nova_rota_df], ignore_index=True)
+    }
 
     # Cria as paradas
     novas_paradas = []
@@ -101,13 +121,9 @@ def create_nova_rota(dados_rota):
             'Ordem_Visita': i + 1, # Ordem inicial, pode ser otimizada depois
             'Status_Parada': 'Pendente'
         })
-    
-    if novas_paradas:
-        paradas_df = pd.DataFrame(novas_paradas)
-        df_paradas = pd.concat([df_paradas, paradas_df], ignore_index=True)
 
-    # Salva ambos os dataframes
-    if rotas_repository.save_rotas_data(df_rotas) and rotas_repository.save_paradas_data(df_paradas):
+    # Salva rota e paradas na mesma transação
+    if rotas_repository.create_rota_com_paradas(nova_rota, novas_paradas):
         return True, id_rota
     
     return False, None
\ No newline at end of file
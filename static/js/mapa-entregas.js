@@ -287,14 +287,32 @@ document.addEventListener('DOMContentLoaded', function () {
     document.addEventListener('MSFullscreenChange', updateFullscreenUI);
 
     const filterContainer = document.getElementById('filter-container');
+    let pedidosPorRegiao = {};
+    let resumoRegioes = {};
+
+    async function carregarPedidosPorRegiao() {
+        try {
+            const response = await fetch('/mapa/api/pedidos-por-regiao');
+            const result = await response.json();
+            pedidosPorRegiao = {};
+            resumoRegioes = {};
+            result.regioes.forEach(r => {
+                pedidosPorRegiao[r.Nome] = new Set(r.Pedidos.map(String));
+                resumoRegioes[r.Nome] = r;
+            });
+        } catch (error) {
+            console.error('Erro ao carregar pedidos por região:', error);
+        }
+    }
+
     const filterToggle = document.getElementById('filter-toggle');
     const filterTypeLabel = document.getElementById('filter-type-label');
 
-    function createFilterButton(name, type) {
+    function createFilterButton(name, type, label) {
         const btn = document.createElement('button');
         btn.type = 'button';
         btn.className = 'filter-btn';
-        btn.textContent = name;
+        btn.textContent = label || name;
         btn.setAttribute('data-filter', name);
         btn.setAttribute('data-type', type);
         btn.setAttribute('aria-pressed', 'false');
@@ -316,7 +334,9 @@ document.addEventListener('DOMContentLoaded', function () {
         const type = isRegion ? 'regiao' : 'cidade';
 
         items.forEach(item => {
-            const btn = createFilterButton(item.Nome, type);
+            const resumo = isRegion ? resumoRegioes[item.Nome] : null;
+            const label = resumo ? `${item.Nome} (${resumo.NumPedidos} · ${resumo.PesoTotal.toFixed(0)} kg)` : item.Nome;
+            const btn = createFilterButton(item.Nome, type, label);
             filterContainer.appendChild(btn);
         });
     }
@@ -351,8 +371,8 @@ document.addEventListener('DOMContentLoaded', function () {
             if (!show) {
                 if (isRegion) {
                     show = activeFilters.some(regiaoNome => {
-                        const regiao = regioes.find(r => r.Nome === regiaoNome);
-                        return regiao && regiao.Cidades.includes(city);
+                        const pedidos = pedidosPorRegiao[regiaoNome];
+                        return pedidos && pedidos.has(String(abs));
                     });
                 } else {
                     show = activeFilters.includes(city);
@@ -469,6 +489,7 @@ document.addEventListener('DOMContentLoaded', function () {
         const result = await response.json();
         if (result.status === 'success') {
             alert('Regiões salvas com sucesso!');
+            await carregarPedidosPorRegiao();
             populateFilters();
         } else {
             alert('Erro ao salvar as regiões: ' + result.message);
@@ -480,4 +501,7 @@ document.addEventListener('DOMContentLoaded', function () {
     populateFilters();
     setVisibilityFromButtons();
     renderRegioes();
+    carregarPedidosPorRegiao().then(() => {
+        if (filterToggle.checked) populateFilters();
+    });
 });
\ No newline at end of file
@@ -26,6 +26,34 @@ document.addEventListener('DOMContentLoaded', function () {
     const tipoRotaSelect = document.getElementById('tipo_rota');
     const camposRotaPendente = document.getElementById('campos-rota-pendente');
     const formCriarRota = document.getElementById('form-criar-rota');
+    const filtroRegiao = document.getElementById('filtro-regiao');
+    let pedidosPorRegiao = {};
+
+    async function carregarRegioes() {
+        try {
+            const response = await fetch('/mapa/api/pedidos-por-regiao');
+            const result = await response.json();
+            result.regioes.forEach(r => {
+                pedidosPorRegiao[r.Nome] = new Set(r.Pedidos.map(String));
+                const option = document.createElement('option');
+                option.value = r.Nome;
+                option.textContent = `${r.Nome} (${r.NumPedidos} pedidos · ${r.PesoTotal.toFixed(0)} kg)`;
+                filtroRegiao.appendChild(option);
+            });
+        } catch (error) {
+            console.error('Erro ao carregar regiões:', error);
+        }
+    }
+
+    filtroRegiao.addEventListener('change', () => {
+        const pedidos = pedidosPorRegiao[filtroRegiao.value];
+        sidebar.querySelectorAll('.pedido-item').forEach(item => {
+            const show = !pedidos || pedidos.has(item.dataset.absentry);
+            item.style.display = show ? '' : 'none';
+        });
+    });
+
+    carregarRegioes();
 
     function updateFooter() {
         const count = selectedPedidos.size;
@@ -0,0 +1,343 @@
+// static/js/separacao-picking.js
+//
+// Separação offline-first: cada ação (adicionar/editar/excluir pacote, finalizar) é gravada
+// em uma fila local (localStorage), aplicada imediatamente na tela e sincronizada em lote
+// com o servidor quando houver conexão. Cada operação leva um op_id único, então lotes
+// reenviados são aplicados uma única vez no servidor.
+
+document.addEventListener('DOMContentLoaded', () => {
+    const config = separacaoConfig;
+    const chaveFila = `sgd-separacao-fila-${config.pickingKey}`;
+    const SYNC_DEBOUNCE_MS = 800;
+    const SYNC_INTERVALO_MS = 15000;
+
+    const formPacote = document.getElementById('form-pacote');
+    const pacotesContainer = document.getElementById('pacotes-container');
+    const finalizarContainer = document.getElementById('finalizar-container');
+    const semPacotes = document.getElementById('sem-pacotes');
+    const mensagens = document.getElementById('mensagens-separacao');
+    const statusSync = document.getElementById('status-sync');
+
+    let pacotesServidor = config.pacotes || [];
+    let fila = carregarFila();
+    let pacotes = [];
+    let quantidadesSeparadas = {};
+    let sincronizando = false;
+    let syncTimer = null;
+
+    const isDecimal = uom => uom === 'KG' || uom === 'METROS';
+    const formatQtd = (valor, uom) => (parseFloat(valor) || 0).toFixed(isDecimal(uom) ? 3 : 0);
+
+    function novoId() {
+        if (window.crypto && crypto.randomUUID) return crypto.randomUUID().replace(/-/g, '');
+        return Date.now().toString(16) + Math.random().toString(16).slice(2);
+    }
+
+    function carregarFila() {
+        try {
+            return JSON.parse(localStorage.getItem(chaveFila)) || [];
+        } catch (error) {
+            return [];
+        }
+    }
+
+    function salvarFila() {
+        if (fila.length > 0) {
+            localStorage.setItem(chaveFila, JSON.stringify(fila));
+        } else {
+            localStorage.removeItem(chaveFila);
+        }
+    }
+
+    function escapeHtml(texto) {
+        const div = document.createElement('div');
+        div.textContent = texto == null ? '' : String(texto);
+        return div.innerHTML;
+    }
+
+    function mostrarMensagem(texto, categoria) {
+        mensagens.innerHTML = `<div class="alert alert-${categoria}">${escapeHtml(texto).replace(/\n/g, '<br>')}</div>`;
+    }
+
+    function urlPacote(base, id) {
+        return base.replace(/\/0$/, `/${id}`);
+    }
+
+    // --- Estado local: pacotes do servidor + operações ainda não confirmadas ---
+
+    function calcularQuantidades(lista, ignorarUid) {
+        const quantidades = {};
+        lista.forEach(pacote => {
+            if (pacote.uid === ignorarUid) return;
+            pacote.itens.forEach(item => {
+                quantidades[item.ItemCode] = (quantidades[item.ItemCode] || 0) + parseFloat(item.Quantity);
+            });
+        });
+        return quantidades;
+    }
+
+    function aplicarOperacao(lista, op) {
+        const dados = op.dados || {};
+        if (op.tipo === 'adicionar') {
+            if (lista.some(p => p.uid === dados.uid)) return lista;
+            return lista.concat([{ ...dados.pacote, uid: dados.uid, pendente: true }]);
+        }
+        if (op.tipo === 'editar') {
+            return lista.map(p => p.uid === dados.uid ? { ...p, ...dados.pacote, pendente: true } : p);
+        }
+        if (op.tipo === 'excluir') {
+            return lista.filter(p => p.uid !== dados.uid);
+        }
+        return lista;
+    }
+
+    function recalcularEstado() {
+        pacotes = fila.reduce(aplicarOperacao, pacotesServidor.map(p => ({ ...p })));
+        pacotes.forEach((p, i) => p.id = i + 1);
+        quantidadesSeparadas = calcularQuantidades(pacotes);
+    }
+
+    function montarItensPacote(valores, jaSeparado) {
+        const itens = [];
+        const erros = [];
+        config.itemsPedido.forEach(item => {
+            const bruto = valores[item.ItemCode];
+            if (bruto === undefined || bruto === '') return;
+            const quantidade = parseFloat(String(bruto).replace(',', '.'));
+            if (isNaN(quantidade)) {
+                erros.push(`Valor inválido para a quantidade do item ${item.ItemCode}.`);
+                return;
+            }
+            if (quantidade <= 0) return;
+            if (!isDecimal(item.UomCode) && quantidade !== Math.trunc(quantidade)) {
+                erros.push(`Item ${item.ItemCode} não aceita quantidade decimal (Unidade: ${item.UomCode}).`);
+                return;
+            }
+            if ((jaSeparado[item.ItemCode] || 0) + quantidade > parseFloat(item.RelQtty)) {
+                erros.push(`Quantidade para o item ${item.ItemCode} excede o solicitado no pedido.`);
+                return;
+            }
+            itens.push({ ItemCode: item.ItemCode, ItemName: item.ItemName, Quantity: quantidade, UomCode: item.UomCode });
+        });
+        return { itens, erros };
+    }
+
+    // --- Renderização ---
+
+    function renderPacote(pacote) {
+        const itens = pacote.itens.map(item => `
+            <li>${escapeHtml(item.ItemName)} (${escapeHtml(item.ItemCode)}) - Qtd: ${formatQtd(item.Quantity, item.UomCode)} ${escapeHtml(item.UomCode)}</li>
+        `).join('');
+        const editar = pacote.pendente ? '' :
+            `<a href="${urlPacote(config.editarPacoteUrl, pacote.id)}" class="btn btn-secondary">Editar</a>`;
+        return `
+            <div class="pedido-card" style="margin-bottom: 20px; cursor: default;" data-pacote-uid="${escapeHtml(pacote.uid)}">
+                <div class="card-header" style="padding-bottom: 0.5rem; margin-bottom: 1rem;">
+                    <h3 class="card-title">Pacote ${pacote.id}${pacote.pendente ? ' <small>(não sincronizado)</small>' : ''}</h3>
+                    <div class="card-meta">
+                        <span><strong>Peso:</strong> ${escapeHtml(pacote.peso)} kg</span>
+                        <span><strong>Local:</strong> ${escapeHtml(pacote.localizacao)}</span>
+                    </div>
+                </div>
+                ${pacote.report ? `<p><strong>Observação:</strong> ${escapeHtml(pacote.report)}</p>` : ''}
+                <ul>${itens}</ul>
+                <div class="action-buttons" style="margin-top: 1rem;">
+                    ${editar}
+                    <a href="${urlPacote(config.excluirPacoteUrl, pacote.id)}" class="btn btn-danger btn-excluir-pacote" data-pacote-uid="${escapeHtml(pacote.uid)}">Excluir</a>
+                </div>
+            </div>
+        `;
+    }
+
+    function render() {
+        recalcularEstado();
+        config.itemsPedido.forEach(item => {
+            const row = formPacote.querySelector(`tr[data-item-code="${CSS.escape(item.ItemCode)}"]`);
+            if (!row) return;
+            const separado = quantidadesSeparadas[item.ItemCode] || 0;
+            row.querySelector('.qtd-separada').textContent = formatQtd(separado, item.UomCode);
+            row.querySelector('.qtd-pendente').textContent = formatQtd(parseFloat(item.RelQtty) - separado, item.UomCode);
+        });
+
+        pacotesContainer.innerHTML = pacotes.map(renderPacote).join('');
+        const temPacotes = pacotes.length > 0;
+        finalizarContainer.style.display = temPacotes ? '' : 'none';
+        semPacotes.style.display = temPacotes ? 'none' : '';
+        atualizarStatusSync();
+    }
+
+    function atualizarStatusSync() {
+        if (fila.length === 0) {
+            statusSync.textContent = 'Todas as alterações estão sincronizadas.';
+        } else if (!navigator.onLine) {
+            statusSync.textContent = `Sem conexão: ${fila.length} alteração(ões) serão enviadas quando a rede voltar.`;
+        } else {
+            statusSync.textContent = `Sincronizando ${fila.length} alteração(ões)...`;
+        }
+    }
+
+    // --- Fila e sincronização ---
+
+    function enfileirar(tipo, dados) {
+        fila.push({ op_id: novoId(), tipo: tipo, dados: dados, criado_em: new Date().toISOString() });
+        salvarFila();
+        render();
+        agendarSync();
+    }
+
+    function agendarSync(imediato) {
+        clearTimeout(syncTimer);
+        syncTimer = setTimeout(sincronizar, imediato ? 0 : SYNC_DEBOUNCE_MS);
+    }
+
+    function paraServidor(op) {
+        const dados = op.dados || {};
+        if (op.tipo === 'adicionar' || op.tipo === 'editar') {
+            const pacote = dados.pacote;
+            const quantidades = {};
+            pacote.itens.forEach(item => quantidades[item.ItemCode] = item.Quantity);
+            return {
+                op_id: op.op_id,
+                tipo: op.tipo,
+                dados: { uid: dados.uid, quantidades: quantidades, peso: pacote.peso,
+                         localizacao: pacote.localizacao, report: pacote.report }
+            };
+        }
+        return { op_id: op.op_id, tipo: op.tipo, dados: dados };
+    }
+
+    async function sincronizar() {
+        if (sincronizando || fila.length === 0) return;
+        if (!navigator.onLine) {
+            atualizarStatusSync();
+            return;
+        }
+
+        sincronizando = true;
+        const lote = fila.slice();
+        try {
+            const response = await fetch(config.apiSync, {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ operacoes: lote.map(paraServidor) })
+            });
+            const result = await response.json();
+            if (result.status !== 'success') throw new Error(result.message);
+
+            const confirmadas = new Set(result.resultados.filter(r => r.status !== 'erro').map(r => r.op_id));
+            fila = fila.filter(op => !confirmadas.has(op.op_id));
+            salvarFila();
+
+            const rejeitadas = result.resultados.filter(r => r.status === 'rejeitada' && !r.duplicada);
+            if (rejeitadas.length > 0) {
+                mostrarMensagem('Algumas alterações foram recusadas pelo servidor:\n' +
+                    rejeitadas.map(r => r.erros.join('\n')).join('\n'), 'danger');
+            }
+
+            if (result.finalizado) {
+                localStorage.removeItem(chaveFila);
+                window.location.href = result.redirect;
+                return;
+            }
+            pacotesServidor = result.pacotes;
+        } catch (error) {
+            // Sem conexão (ou sessão expirada): a fila permanece e será reenviada.
+        } finally {
+            sincronizando = false;
+            render();
+        }
+        if (fila.length > 0 && fila.length < lote.length) agendarSync();
+    }
+
+    window.addEventListener('online', () => agendarSync(true));
+    window.addEventListener('offline', atualizarStatusSync);
+    setInterval(() => { if (fila.length > 0) sincronizar(); }, SYNC_INTERVALO_MS);
+
+    if ('serviceWorker' in navigator) {
+        navigator.serviceWorker.register(config.serviceWorkerUrl, { scope: '/picking/' }).catch(() => {});
+    }
+
+    // --- Eventos da tela ---
+
+    formPacote.querySelectorAll('.quantidade-input').forEach(input => {
+        input.addEventListener('input', (e) => {
+            const weight = parseFloat(e.target.dataset.weight) || 0;
+            const quantity = parseFloat(e.target.value) || 0;
+            const pesoCalculadoCell = e.target.closest('tr').querySelector('.peso-calculado');
+            pesoCalculadoCell.textContent = (weight * quantity).toFixed(2);
+        });
+    });
+
+    formPacote.addEventListener('submit', (e) => {
+        e.preventDefault();
+        const valores = {};
+        formPacote.querySelectorAll('.quantidade-input').forEach(input => {
+            if (input.value) valores[input.dataset.itemCode] = input.value;
+        });
+
+        const { itens, erros } = montarItensPacote(valores, quantidadesSeparadas);
+        const peso = parseFloat(String(formPacote.querySelector('#peso_pacote').value).replace(',', '.'));
+        if (erros.length === 0 && itens.length === 0) erros.push('Nenhum item foi adicionado ao pacote. Preencha as quantidades.');
+        if (isNaN(peso)) erros.push('O peso do pacote deve ser um número válido.');
+        if (erros.length > 0) {
+            mostrarMensagem(erros.join('\n'), 'danger');
+            return;
+        }
+
+        enfileirar('adicionar', {
+            uid: novoId(),
+            pacote: {
+                peso: peso,
+                localizacao: formPacote.querySelector('#localizacao').value,
+                report: formPacote.querySelector('#report').value,
+                itens: itens
+            }
+        });
+        formPacote.reset();
+        formPacote.querySelectorAll('.peso-calculado').forEach(cell => cell.textContent = '0.00');
+        mostrarMensagem('Pacote criado com sucesso!', 'success');
+    });
+
+    pacotesContainer.addEventListener('click', (e) => {
+        const btn = e.target.closest('.btn-excluir-pacote');
+        if (!btn) return;
+        e.preventDefault();
+        if (!confirm('Tem certeza que deseja excluir este pacote?')) return;
+
+        enfileirar('excluir', { uid: btn.dataset.pacoteUid });
+        mostrarMensagem('Pacote excluído.', 'success');
+    });
+
+    const finalizarForm = document.getElementById('finalizar-separacao-form');
+    finalizarForm.addEventListener('submit', function(event) {
+        event.preventDefault(); // Impede o envio padrão do formulário
+
+        let isIncomplete = false;
+        let discrepancyMessage = 'Atenção: A separação está incompleta para os seguintes itens:\n\n';
+
+        config.itemsPedido.forEach(item => {
+            const pedido = parseFloat(item.RelQtty);
+            const separado = parseFloat(quantidadesSeparadas[item.ItemCode] || 0);
+
+            if (separado < pedido) {
+                isIncomplete = true;
+                discrepancyMessage += `- ${item.ItemName} (${item.ItemCode}): Pedido: ${pedido}, Separado: ${separado}\n`;
+            }
+        });
+
+        if (isIncomplete) {
+            discrepancyMessage += '\nDeseja mesmo finalizar a separação com itens faltantes? O picking será marcado como "Incompleto" e não poderá seguir para o packing até ser regularizado.';
+            if (!confirm(discrepancyMessage)) return;
+        }
+
+        if (fila.some(op => op.tipo === 'finalizar')) return;
+        enfileirar('finalizar', { discrepancy_report: document.getElementById('discrepancy_report').value });
+        if (!navigator.onLine) {
+            mostrarMensagem('Finalização registrada. Ela será enviada assim que a conexão voltar.', 'warning');
+        }
+        agendarSync(true);
+    });
+
+    render();
+    if (fila.length > 0) agendarSync(true);
+});
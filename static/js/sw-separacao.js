@@ -0,0 +1,55 @@
+// static/js/sw-separacao.js
+//
+// Service worker da tela de separação: mantém em cache a última versão da página e os
+// arquivos estáticos, para que o separador possa recarregar a tela sem sinal. As operações
+// em si ficam na fila local da página (separacao-picking.js).
+
+const CACHE_NAME = 'sgd-separacao-v1';
+
+self.addEventListener('install', () => self.skipWaiting());
+
+self.addEventListener('activate', (event) => {
+    event.waitUntil(
+        caches.keys()
+            .then(keys => Promise.all(keys.filter(k => k !== CACHE_NAME).map(k => caches.delete(k))))
+            .then(() => self.clients.claim())
+    );
+});
+
+function networkFirst(request) {
+    return fetch(request)
+        .then(response => {
+            if (response.ok && !response.redirected) {
+                const copia = response.clone();
+                caches.open(CACHE_NAME).then(cache => cache.put(request, copia));
+            }
+            return response;
+        })
+        .catch(() => caches.match(request));
+}
+
+function staleWhileRevalidate(request) {
+    return caches.open(CACHE_NAME).then(cache =>
+        cache.match(request).then(cached => {
+            const rede = fetch(request).then(response => {
+                if (response.ok) cache.put(request, response.clone());
+                return response;
+            }).catch(() => cached);
+            return cached || rede;
+        })
+    );
+}
+
+self.addEventListener('fetch', (event) => {
+    const request = event.request;
+    if (request.method !== 'GET') return;
+
+    const url = new URL(request.url);
+    if (url.origin !== self.location.origin) return;
+
+    if (request.mode === 'navigate' && url.pathname.startsWith('/picking/separar/')) {
+        event.respondWith(networkFirst(request));
+    } else if (url.pathname.startsWith('/static/')) {
+        event.respondWith(staleWhileRevalidate(request));
+    }
+});
@@ -0,0 +1,156 @@
+# static_assets.py
+
+import gzip
+import hashlib
+import json
+import mimetypes
+import os
+
+from flask import current_app, request, send_from_directory
+
+from data import storage
+
+try:
+    import brotli
+except ImportError:  # .br é opcional: sem o pacote, apenas gzip
+    brotli = None
+
+try:
+    from rjsmin import jsmin
+except ImportError:
+    jsmin = None
+
+try:
+    from rcssmin import cssmin
+except ImportError:
+    cssmin = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+EXTENSOES = ('.css', '.js')
+# O service worker precisa de URL fixa (é servido por rota própria, sem cache).
+IGNORADOS = {'js/sw-separacao.js'}
+CACHE_IMUTAVEL = 'public, max-age=31536000, immutable'
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+
+def _minificar(conteudo, extensao):
+    texto = conteudo.decode('utf-8')
+    if extensao == '.js' and jsmin:
+        texto = jsmin(texto)
+    elif extensao == '.css' and cssmin:
+        texto = cssmin(texto)
+    return texto.encode('utf-8')
+
+
+def _gravar_asset(destino, conteudo):
+    storage.atomic_write_bytes(conteudo, destino)
+    os.chmod(destino, 0o644)
+
+
+def _listar_fontes(static_folder):
+    for raiz, dirs, arquivos in os.walk(static_folder):
+        dirs[:] = [d for d in dirs if os.path.join(raiz, d) != os.path.join(static_folder, DIST_DIR)]
+        for nome in arquivos:
+            caminho = os.path.join(raiz, nome)
+            relativo = os.path.relpath(caminho, static_folder).replace(os.sep, '/')
+            if os.path.splitext(nome)[1] in EXTENSOES and relativo not in IGNORADOS:
+                yield relativo, caminho
+
+
+def build_assets(static_folder):
+    """
+    Minifica os CSS/JS de static/ e grava em static/dist/ com o hash do conteúdo no nome,
+    junto das versões .gz (e .br, se o pacote brotli estiver instalado). Retorna o manifest
+    {'css/base.css': 'dist/css/base.<hash>.css', ...}. Arquivos já gerados são reaproveitados,
+    então rodar de novo (ou em vários workers ao mesmo tempo) é barato.
+    """
+    dist_folder = os.path.join(static_folder, DIST_DIR)
+    manifest_path = os.path.join(dist_folder, MANIFEST_NAME)
+    os.makedirs(dist_folder, exist_ok=True)
+
+    with storage.file_lock(manifest_path):
+        manifest = {}
+        for relativo, caminho in _listar_fontes(static_folder):
+            base, extensao = os.path.splitext(relativo)
+            with open(caminho, 'rb') as fh:
+                conteudo = _minificar(fh.read(), extensao)
+            digest = hashlib.sha256(conteudo).hexdigest()[:12]
+            destino_relativo = f"{DIST_DIR}/{base}.{digest}{extensao}"
+            destino = os.path.join(static_folder, *destino_relativo.split('/'))
+
+            if not os.path.exists(destino):
+                os.makedirs(os.path.dirname(destino), exist_ok=True)
+                _gravar_asset(f"{destino}.gz", gzip.compress(conteudo, compresslevel=9, mtime=0))
+                if brotli:
+                    _gravar_asset(f"{destino}.br", brotli.compress(conteudo, quality=11))
+                _gravar_asset(destino, conteudo)
+            manifest[relativo] = destino_relativo
+
+        _remover_obsoletos(dist_folder, static_folder, manifest)
+        storage.atomic_write_text(json.dumps(manifest, indent=2, sort_keys=True), manifest_path)
+    return manifest
+
+
+def _remover_obsoletos(dist_folder, static_folder, manifest):
+    atuais = set(manifest.values())
+    for raiz, _, arquivos in os.walk(dist_folder):
+        for nome in arquivos:
+            caminho = os.path.join(raiz, nome)
+            relativo = os.path.relpath(caminho, static_folder).replace(os.sep, '/')
+            for _, sufixo in ENCODINGS:
+                if relativo.endswith(sufixo):
+                    relativo = relativo[:-len(sufixo)]
+            if os.path.splitext(nome)[1] in EXTENSOES + tuple(s for _, s in ENCODINGS) and relativo not in atuais:
+                os.remove(caminho)
+
+
+def serve_static(filename):
+    """
+    View do endpoint 'static'. Arquivos de dist/ têm o hash no nome: vão com cache imutável
+    e, se o navegador aceitar, na versão já comprimida (br/gzip) gerada no build.
+    """
+    if not filename.startswith(f"{DIST_DIR}/"):
+        return current_app.send_static_file(filename)
+
+    mimetype = mimetypes.guess_type(filename)[0]
+    static_folder = current_app.static_folder
+    response = None
+    for encoding, sufixo in ENCODINGS:
+        if encoding in request.accept_encodings and os.path.exists(os.path.join(static_folder, filename + sufixo)):
+            response = send_from_directory(static_folder, filename + sufixo, mimetype=mimetype)
+            response.headers['Content-Encoding'] = encoding
+            break
+    if response is None:
+        response = send_from_directory(static_folder, filename, mimetype=mimetype)
+
+    response.headers['Cache-Control'] = CACHE_IMUTAVEL
+    response.headers['Vary'] = 'Accept-Encoding'
+    return response
+
+
+def init_app(app):
+    """
+    Gera os assets (fora do modo debug) e faz url_for('static', filename=...) apontar
+    para a versão com hash. Em debug os arquivos originais continuam sendo servidos.
+    """
+    manifest = {}
+    if not app.debug:
+        try:
+            manifest = build_assets(app.static_folder)
+        except OSError as e:
+            app.logger.error(f"Erro ao gerar os assets estáticos: {e}")
+
+    app.extensions['sgd_static_manifest'] = manifest
+    app.view_functions['static'] = serve_static
+
+    @app.url_defaults
+    def hashed_static_url(endpoint, values):
+        if endpoint == 'static' and values.get('filename') in manifest:
+            values['filename'] = manifest[values['filename']]
+
+    @app.cli.command('build-assets')
+    def build_assets_command():
+        """Minifica e pré-comprime os arquivos de static/ (static/dist/)."""
+        manifest_gerado = build_assets(app.static_folder)
+        print(f"{len(manifest_gerado)} arquivo(s) gerado(s) em {os.path.join(app.static_folder, DIST_DIR)}.")
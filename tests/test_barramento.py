@@ -0,0 +1,89 @@
+# tests/test_barramento.py
+#
+# Invalidação entre workers: uma gravação em um processo é vista na leitura seguinte
+# de outro, que só confere o arquivo (stat) quando há anúncio no barramento.
+
+import multiprocessing
+import os
+import sys
+import traceback
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configurar(diretorio):
+    os.environ['RIOFER_SEPARACAO_SGD'] = os.path.join(diretorio, 'separacao.parquet')
+    os.environ['RIOFER_SNAPSHOTS_SGD'] = os.path.join(diretorio, 'snapshots')
+    # Instalação nova: nem o diretório do barramento existe ainda.
+    os.environ['RIOFER_BARRAMENTO_SGD'] = os.path.join(diretorio, 'instance', 'novo', 'barramento.bin')
+    os.environ['RIOFER_JOURNAL_SGD'] = os.path.join(diretorio, 'journal')
+    # Sem conferência de segurança durante o teste: só o anúncio leva ao stat.
+    os.environ['SGD_BARRAMENTO_VERIFICACAO_MS'] = '600000'
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+
+def _versao(linhas):
+    import pandas as pd
+
+    return pd.DataFrame({'AbsEntry': range(linhas), 'Localizacao': ['DEP-A'] * linhas})
+
+
+def _worker(diretorio, comandos, respostas):
+    """Executa ('gravar', n), ('gravar_sem_anuncio', n) e ('ler',) até receber None."""
+    _configurar(diretorio)
+    from data import separacao_repository  # noqa: F401 (registra o dataset)
+    from data import schemas, snapshots, storage
+
+    for comando in iter(comandos.get, None):
+        try:
+            if comando[0] == 'gravar':
+                respostas.put(snapshots.gravar('separacao', _versao(comando[1])))
+            elif comando[0] == 'gravar_sem_anuncio':
+                # Como uma gravação feita fora do SGD: troca o arquivo sem publicar.
+                path = snapshots.caminho('separacao')
+                with storage.file_lock(snapshots.caminho_lock('separacao')):
+                    tabela = storage.with_next_generation(schemas.conformar('separacao', _versao(comando[1])), path)
+                    storage.atomic_write_parquet(tabela, path)
+                respostas.put(storage.table_generation(tabela))
+            else:
+                tabela = snapshots.get_table('separacao')
+                respostas.put((storage.table_generation(tabela), tabela.num_rows, len(snapshots.get('separacao'))))
+        except Exception:
+            respostas.put(traceback.format_exc())
+
+
+def test_gravacao_em_um_worker_e_vista_pelo_outro(tmp_path):
+    contexto = multiprocessing.get_context('spawn')
+    workers = {}
+    for nome in ('escritor', 'leitor'):
+        comandos, respostas = contexto.Queue(), contexto.Queue()
+        processo = contexto.Process(target=_worker, args=(str(tmp_path), comandos, respostas))
+        processo.start()
+        workers[nome] = (processo, comandos, respostas)
+
+    def executar(nome, *comando):
+        _, comandos, respostas = workers[nome]
+        comandos.put(comando)
+        resposta = respostas.get(timeout=120)
+        assert not isinstance(resposta, str), resposta
+        return resposta
+
+    try:
+        assert not (tmp_path / 'instance').exists()
+        geracao = executar('escritor', 'gravar', 1)
+        assert executar('leitor', 'ler') == (geracao, 1, 1)
+
+        # Sem anúncio o leitor continua na versão carregada: ele não confere o arquivo.
+        executar('escritor', 'gravar_sem_anuncio', 2)
+        assert executar('leitor', 'ler') == (geracao, 1, 1)
+
+        # Com anúncio, a leitura seguinte já vê a gravação nova (get_table e get).
+        nova = executar('escritor', 'gravar', 3)
+        assert nova > geracao
+        assert executar('leitor', 'ler') == (nova, 3, 3)
+        assert os.path.exists(tmp_path / 'instance' / 'novo' / 'barramento.bin')
+    finally:
+        for processo, comandos, _ in workers.values():
+            comandos.put(None)
+            processo.join(timeout=30)
@@ -0,0 +1,162 @@
+# tests/test_gravacao_adiada.py
+#
+# Gravação adiada entre workers: as alterações enfileiradas em um worker são lidas pelos
+# outros antes de chegarem ao parquet, e o journal pode ser reaplicado depois de uma queda
+# no meio da descarga sem mudar o resultado.
+
+import multiprocessing
+import os
+import sys
+import traceback
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configurar(diretorio):
+    os.environ['RIOFER_SEPARACAO_SGD'] = os.path.join(diretorio, 'separacao.parquet')
+    os.environ['RIOFER_SNAPSHOTS_SGD'] = os.path.join(diretorio, 'snapshots')
+    os.environ['RIOFER_BARRAMENTO_SGD'] = os.path.join(diretorio, 'barramento.bin')
+    os.environ['RIOFER_JOURNAL_SGD'] = os.path.join(diretorio, 'journal')
+    # A thread de gravação existe, mas não descarrega sozinha durante o teste.
+    os.environ['SGD_GRAVACAO_INTERVALO_MS'] = '600000'
+    os.environ['SGD_GRAVACAO_MAX_ALTERACOES'] = '1000'
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+
+def _estado(snapshots):
+    """Linhas da separação como as leituras as veem: {(AbsEntry, Localizacao): User}."""
+    df = snapshots.get('separacao')
+    return {(int(a), str(l)): u for a, l, u in zip(df['AbsEntry'], df['Localizacao'], df['User'])}
+
+
+def _estado_disco():
+    import pandas as pd
+
+    df = pd.read_parquet(os.environ['RIOFER_SEPARACAO_SGD'])
+    return {(int(a), str(l)): u for a, l, u in zip(df['AbsEntry'], df['Localizacao'], df['User'])}
+
+
+def _enfileirar_alteracoes(gravacao_adiada):
+    gravacao_adiada.definir('separacao', {'AbsEntry': 2, 'Localizacao': 'DEP-A'}, {'User': 'ana'}, inserir=True)
+    gravacao_adiada.em_lote('separacao', [
+        gravacao_adiada.alteracao_definir({'AbsEntry': 1, 'Localizacao': 'DEP-A'}, {'User': 'bia'}),
+        gravacao_adiada.alteracao_substituir({'AbsEntry': 3, 'Localizacao': 'DEP-B'}, [
+            {'AbsEntry': 3, 'Localizacao': 'DEP-B', 'User': 'caio'},
+        ]),
+    ])
+
+
+ESPERADO = {(1, 'DEP-A'): 'bia', (2, 'DEP-A'): 'ana', (3, 'DEP-B'): 'caio'}
+INICIAL = {(1, 'DEP-A'): 'zeca'}
+
+
+def _worker(diretorio, comandos, respostas):
+    """Executa 'iniciar', 'enfileirar', 'ler', 'disco', 'descarregar' e 'cair_descarregando' até None."""
+    _configurar(diretorio)
+    import logging
+    from data import separacao_repository  # noqa: F401 (registra o dataset)
+    from data import gravacao_adiada, snapshots
+
+    for comando in iter(comandos.get, None):
+        try:
+            if comando == 'iniciar':
+                gravacao_adiada.iniciar(logging.getLogger('teste'))
+                respostas.put(True)
+            elif comando == 'enfileirar':
+                _enfileirar_alteracoes(gravacao_adiada)
+                respostas.put(True)
+            elif comando == 'ler':
+                respostas.put(_estado(snapshots))
+            elif comando == 'disco':
+                respostas.put(_estado_disco())
+            elif comando == 'descarregar':
+                respostas.put(gravacao_adiada.descarregar('separacao'))
+            elif comando == 'cair_descarregando':
+                # Cai logo depois de gravar o parquet, antes de limpar o journal.
+                gravar = snapshots.gravar
+                snapshots.gravar = lambda *args: (gravar(*args), os._exit(1))
+                gravacao_adiada.descarregar('separacao')
+        except Exception:
+            respostas.put(traceback.format_exc())
+
+
+class _Workers:
+    def __init__(self, diretorio):
+        self.diretorio = diretorio
+        self.contexto = multiprocessing.get_context('spawn')
+        self.processos = {}
+
+    def iniciar(self, nome):
+        comandos, respostas = self.contexto.Queue(), self.contexto.Queue()
+        processo = self.contexto.Process(target=_worker, args=(self.diretorio, comandos, respostas))
+        processo.start()
+        self.processos[nome] = (processo, comandos, respostas)
+        return processo
+
+    def executar(self, nome, comando):
+        _, comandos, respostas = self.processos[nome]
+        comandos.put(comando)
+        resposta = respostas.get(timeout=120)
+        assert not isinstance(resposta, str), resposta
+        return resposta
+
+    def encerrar(self):
+        for processo, comandos, _ in self.processos.values():
+            if processo.is_alive():
+                comandos.put(None)
+            processo.join(timeout=30)
+
+
+def _gravar_inicial(tmp_path):
+    import pandas as pd
+
+    pd.DataFrame({'AbsEntry': [1], 'Localizacao': ['DEP-A'], 'User': ['zeca']}).to_parquet(
+        tmp_path / 'separacao.parquet', index=False)
+
+
+def test_outro_worker_le_as_pendencias_e_descarrega(tmp_path):
+    _gravar_inicial(tmp_path)
+    workers = _Workers(str(tmp_path))
+    try:
+        workers.iniciar('a')
+        workers.iniciar('b')
+        assert workers.executar('a', 'iniciar')
+        assert workers.executar('b', 'ler') == INICIAL
+
+        assert workers.executar('a', 'enfileirar')
+        # Ainda só no journal: o parquet não mudou, mas os dois workers já leem as alterações.
+        assert workers.executar('b', 'disco') == INICIAL
+        assert workers.executar('a', 'ler') == ESPERADO
+        assert workers.executar('b', 'ler') == ESPERADO
+
+        assert workers.executar('b', 'descarregar') == 2
+        assert workers.executar('b', 'disco') == ESPERADO
+        assert workers.executar('a', 'ler') == ESPERADO
+        assert workers.executar('b', 'descarregar') == 0
+    finally:
+        workers.encerrar()
+
+
+def test_journal_reaplicado_depois_de_queda_na_descarga(tmp_path):
+    _gravar_inicial(tmp_path)
+    workers = _Workers(str(tmp_path))
+    try:
+        workers.iniciar('a')
+        assert workers.executar('a', 'iniciar')
+        assert workers.executar('a', 'enfileirar')
+
+        _, comandos, _ = workers.processos['a']
+        comandos.put('cair_descarregando')
+        workers.processos['a'][0].join(timeout=120)
+        assert workers.processos['a'][0].exitcode == 1
+
+        # O parquet já tem as alterações e o journal ainda também: a leitura as reaplica.
+        workers.iniciar('b')
+        assert workers.executar('b', 'disco') == ESPERADO
+        assert workers.executar('b', 'ler') == ESPERADO
+        assert workers.executar('b', 'descarregar') == 2
+        assert workers.executar('b', 'disco') == ESPERADO
+        assert workers.executar('b', 'descarregar') == 0
+    finally:
+        workers.encerrar()
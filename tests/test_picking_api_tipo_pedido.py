@@ -0,0 +1,100 @@
+# tests/test_picking_api_tipo_pedido.py
+#
+# A API JSON da separação aplica a mesma regra de tipo de pedido das telas de picking: um
+# usuário só de "Cliente Retira" não lê nem altera a separação de um pedido de entrega, nem
+# pelo lote de operações do cliente offline (/sync).
+
+import multiprocessing
+import os
+import sys
+import traceback
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+ENTREGA = 1
+RETIRA = 2
+SID = 'sessao-teste'
+
+
+def _configurar(diretorio):
+    os.environ['RIOFER_PICKING_SGD'] = os.path.join(diretorio, 'picking.parquet')
+    os.environ['RIOFER_PICKING_SESSOES_SGD'] = os.path.join(diretorio, 'picking_sessoes.sqlite3')
+    os.environ['RIOFER_SNAPSHOTS_SGD'] = os.path.join(diretorio, 'snapshots')
+    os.environ['RIOFER_BARRAMENTO_SGD'] = os.path.join(diretorio, 'barramento.bin')
+    os.environ['RIOFER_JOURNAL_SGD'] = os.path.join(diretorio, 'journal')
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+
+def _cliente():
+    from flask import Flask
+    from routes.pedidos import pedidos_bp
+
+    app = Flask(__name__)
+    app.secret_key = 'teste'
+    app.register_blueprint(pedidos_bp)
+    cliente = app.test_client()
+    with cliente.session_transaction() as sessao:
+        sessao['user'] = {'uid': 'u1', 'email': 'retira@teste', 'roles': {'retira': True}}
+        sessao['picking_sid'] = SID
+    return cliente
+
+
+def _requisicoes(diretorio, resultados):
+    _configurar(diretorio)
+    import pandas as pd
+    from data import picking_sessao_repository
+
+    try:
+        pd.DataFrame({
+            'AbsEntry': [ENTREGA, RETIRA], 'Localizacao': ['DEP-A', 'DEP-A'],
+            'U_TU_QuemEntrega': ['01', '02'], 'CardName': ['Cliente', 'Cliente'],
+        }).to_parquet(os.environ['RIOFER_PICKING_SGD'], index=False)
+        # Separação do pedido de entrega já em andamento na sessão (ex.: antes de o usuário perder o setor).
+        picking_sessao_repository.iniciar_picking(SID, f'{ENTREGA}_DEP-A', ENTREGA, 'DEP-A', None, [],
+                                                  [{'ItemCode': 'A', 'Quantity': 5, 'Weight1': 1.0}])
+
+        cliente = _cliente()
+        respostas = {}
+        for abs_entry in (ENTREGA, RETIRA):
+            base = f'/picking/api/{abs_entry}/DEP-A'
+            respostas[abs_entry] = [
+                cliente.get(f'{base}/pacotes').status_code,
+                cliente.post(f'{base}/pacotes', json={}).status_code,
+                cliente.put(f'{base}/pacotes/1', json={}).status_code,
+                cliente.delete(f'{base}/pacotes/1').status_code,
+                cliente.post(f'{base}/validar', json={}).status_code,
+            ]
+
+        sync = cliente.post(f'/picking/api/{ENTREGA}/DEP-A/sync', json={'operacoes': [
+            {'op_id': 'op-1', 'tipo': 'adicionar', 'dados': {'uid': 'p1', 'quantidades': {}, 'peso': 1}},
+            {'op_id': 'op-2', 'tipo': 'finalizar', 'dados': {}},
+        ]})
+        corpo = sync.get_json()
+        respostas['sync'] = (
+            sync.status_code,
+            [(r['op_id'], r['status']) for r in corpo['resultados']],
+            corpo['pacotes'],
+            picking_sessao_repository.get_operacao('op-1'),
+            picking_sessao_repository.picking_existe(SID, f'{ENTREGA}_DEP-A'),
+        )
+        resultados.put(respostas)
+    except Exception:
+        resultados.put(traceback.format_exc())
+
+
+def test_api_da_separacao_respeita_o_tipo_do_pedido(tmp_path):
+    contexto = multiprocessing.get_context('spawn')
+    resultados = contexto.Queue()
+    processo = contexto.Process(target=_requisicoes, args=(str(tmp_path), resultados))
+    processo.start()
+    resultado = resultados.get(timeout=120)
+    processo.join(timeout=30)
+
+    assert not isinstance(resultado, str), resultado
+    # Pedido de entrega: recusado mesmo com a separação em andamento na sessão.
+    assert resultado[ENTREGA] == [403] * 5
+    # Pedido de retira: passa pela verificação e cai em "nenhuma separação em andamento".
+    assert resultado[RETIRA] == [404] * 5
+    # Lote offline: todas as operações recusadas, nenhuma registrada (nem aplicada).
+    assert resultado['sync'] == (200, [('op-1', 'rejeitada'), ('op-2', 'rejeitada')], [], None, True)
@@ -0,0 +1,78 @@
+# tests/test_request_context.py
+#
+# Os get_*_data entregam o snapshot compartilhado do processo, sem cópia por acesso: quem
+# lê não paga a cópia, e quem altera (rotas_service) não pode contaminar o snapshot. A
+# busca de um veículo usa a mesma leitura da frota, com as gravações já feitas.
+
+import multiprocessing
+import os
+import sys
+import traceback
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configurar(diretorio):
+    for variavel, arquivo in (('RIOFER_PICKING_SGD', 'picking.parquet'), ('RIOFER_FROTA_SGD', 'frota.parquet'),
+                              ('RIOFER_ROTAS_SGD', 'rotas.parquet'), ('RIOFER_PARADAS_SGD', 'paradas.parquet')):
+        os.environ[variavel] = os.path.join(diretorio, arquivo)
+    os.environ['RIOFER_SNAPSHOTS_SGD'] = os.path.join(diretorio, 'snapshots')
+    os.environ['RIOFER_BARRAMENTO_SGD'] = os.path.join(diretorio, 'barramento.bin')
+    os.environ['RIOFER_JOURNAL_SGD'] = os.path.join(diretorio, 'journal')
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+
+def _leituras(diretorio, resultados):
+    _configurar(diretorio)
+    import pandas as pd
+    from flask import Flask
+
+    try:
+        from data import frota_repository, pedidos_repository, snapshots
+        from services import rotas_service
+
+        pd.DataFrame({
+            'AbsEntry': [1, 1], 'Localizacao': ['DEP-A', 'DEP-B'], 'U_TU_QuemEntrega': ['01', '01'],
+            'CardName': ['Cliente', 'Cliente'], 'SWeight1': [2.0, 3.0], 'RelQtty': [1.0, 2.0],
+        }).to_parquet(os.environ['RIOFER_PICKING_SGD'], index=False)
+        pd.DataFrame({
+            'ID_Rota': [10], 'ID_Caminhao': ['c1'], 'Data_Rota': [pd.Timestamp('2024-03-10')], 'Status': ['Planejada'],
+        }).to_parquet(os.environ['RIOFER_ROTAS_SGD'], index=False)
+        pd.DataFrame({
+            'ID_Rota': [10], 'AbsEntry': [1], 'CardName': ['Cliente'], 'Ordem_Visita': [1],
+        }).to_parquet(os.environ['RIOFER_PARADAS_SGD'], index=False)
+        pd.DataFrame({
+            'ID_Caminhao': ['c1', 'c2'], 'Placa': ['AAA0001', 'BBB0002'], 'Status': ['Disponível', 'Disponível'],
+        }).to_parquet(os.environ['RIOFER_FROTA_SGD'], index=False)
+
+        app = Flask(__name__)
+        with app.test_request_context():
+            mesma_leitura = frota_repository.get_frota_data() is frota_repository.get_frota_data()
+            rotas = rotas_service.get_rotas_com_detalhes()
+            colunas_picking = list(pedidos_repository.get_picking_data().columns)
+            placa_antes = frota_repository.get_veiculo('c2')['Placa']
+            frota_repository.update_veiculo('c2', {'Placa': 'CCC0003'})
+            placa_depois = frota_repository.get_veiculo('c2')['Placa']
+            ausente = frota_repository.get_veiculo('c9')
+
+        resultados.put((
+            mesma_leitura,
+            [(r['ID_Rota'], r['Peso_Total_KG']) for r in rotas],
+            'PesoItem' in colunas_picking or 'PesoItem' in snapshots.get('picking').columns,
+            placa_antes, placa_depois, ausente,
+        ))
+    except Exception:
+        resultados.put(traceback.format_exc())
+
+
+def test_dataframes_compartilhados_e_busca_de_veiculo(tmp_path):
+    contexto = multiprocessing.get_context('spawn')
+    resultados = contexto.Queue()
+    processo = contexto.Process(target=_leituras, args=(str(tmp_path), resultados))
+    processo.start()
+    resultado = resultados.get(timeout=120)
+    processo.join(timeout=30)
+
+    assert not isinstance(resultado, str), resultado
+    assert resultado == (True, [(10, 8.0)], False, 'BBB0002', 'CCC0003', None)
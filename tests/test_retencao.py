@@ -0,0 +1,73 @@
+# tests/test_retencao.py
+#
+# Arquivamento com alterações ainda no journal: elas entram no arquivo quente antes de os
+# registros concluídos serem movidos, e nada fica pendente para um registro arquivado.
+
+import multiprocessing
+import os
+import sys
+import traceback
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configurar(diretorio):
+    for variavel, arquivo in (('RIOFER_PICKING_SGD', 'picking.parquet'), ('RIOFER_SEPARACAO_SGD', 'separacao.parquet'),
+                              ('RIOFER_PACKING_SGD', 'packing.parquet'), ('RIOFER_PACOTES_SGD', 'pacotes.parquet')):
+        os.environ[variavel] = os.path.join(diretorio, arquivo)
+    os.environ['RIOFER_SNAPSHOTS_SGD'] = os.path.join(diretorio, 'snapshots')
+    os.environ['RIOFER_BARRAMENTO_SGD'] = os.path.join(diretorio, 'barramento.bin')
+    os.environ['RIOFER_JOURNAL_SGD'] = os.path.join(diretorio, 'journal')
+    os.environ['RIOFER_ARQUIVO_SGD'] = os.path.join(diretorio, 'arquivo')
+    # A thread de gravação existe, mas não descarrega sozinha durante o teste.
+    os.environ['SGD_GRAVACAO_INTERVALO_MS'] = '600000'
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+
+def _arquivar_com_pendencias(diretorio, resultados):
+    _configurar(diretorio)
+    import logging
+    import pandas as pd
+    from data import gravacao_adiada, retencao, separacao_repository, snapshots
+
+    try:
+        pd.DataFrame({'AbsEntry': [1], 'CardName': ['Cliente']}).to_parquet(os.environ['RIOFER_PICKING_SGD'], index=False)
+        fim = pd.Timestamp('2024-03-10 10:00')
+        pd.DataFrame({
+            'AbsEntry': [1, 2], 'Localizacao': ['DEP-A', 'DEP-A'], 'User': ['ana', 'bia'],
+            'EndTime': [fim, fim], 'DiscrepancyReport': ['', ''],
+        }).to_parquet(os.environ['RIOFER_SEPARACAO_SGD'], index=False)
+
+        gravacao_adiada.iniciar(logging.getLogger('teste'))
+        separacao_repository.definir_separacao(2, 'DEP-A', {'DiscrepancyReport': 'revisado'})
+        pendentes = len(gravacao_adiada.capturar('separacao')[1])
+
+        relatorio = {item['dataset']: item for item in retencao.arquivar()}
+        historico = retencao.consultar_historico('separacao', abs_entry=2)
+        resultados.put((
+            pendentes,
+            relatorio['separacao']['arquivados'],
+            gravacao_adiada.capturar('separacao'),
+            historico[['Arquivado', 'DiscrepancyReport']].values.tolist(),
+            sorted(snapshots.get('separacao')['AbsEntry'].tolist()),
+        ))
+    except Exception:
+        resultados.put(traceback.format_exc())
+
+
+def test_arquivamento_aplica_o_journal_antes(tmp_path):
+    contexto = multiprocessing.get_context('spawn')
+    resultados = contexto.Queue()
+    processo = contexto.Process(target=_arquivar_com_pendencias, args=(str(tmp_path), resultados))
+    processo.start()
+    resultado = resultados.get(timeout=120)
+    processo.join(timeout=30)
+    assert isinstance(resultado, tuple), resultado
+
+    pendentes, arquivados, pendencias_depois, historico, quentes = resultado
+    assert pendentes == 1
+    assert arquivados == 1
+    assert pendencias_depois is None
+    assert historico == [[True, 'revisado']]
+    assert quentes == [1]
@@ -0,0 +1,72 @@
+# tests/test_snapshots_arquivo_incompleto.py
+#
+# Exportação externa (picking) ainda sendo escrita: get_table não pode falhar. Sem
+# versão carregada, responde como a leitura direta (vazio, no schema declarado); com
+# uma carregada, continua nela.
+
+import multiprocessing
+import os
+import sys
+import traceback
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _configurar(diretorio):
+    os.environ['RIOFER_PICKING_SGD'] = os.path.join(diretorio, 'picking.parquet')
+    os.environ['RIOFER_SNAPSHOTS_SGD'] = os.path.join(diretorio, 'snapshots')
+    os.environ['RIOFER_BARRAMENTO_SGD'] = os.path.join(diretorio, 'barramento.bin')
+    os.environ['RIOFER_JOURNAL_SGD'] = os.path.join(diretorio, 'journal')
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+
+def _gravar_picking(path, linhas, truncar=False):
+    import pandas as pd
+
+    pd.DataFrame({
+        'AbsEntry': range(linhas),
+        'CardName': [f'Cliente {i}' for i in range(linhas)],
+        'U_TU_QuemEntrega': ['01'] * linhas,
+    }).to_parquet(path, index=False)
+    if truncar:
+        with open(path, 'r+b') as fh:
+            fh.truncate(os.path.getsize(path) // 2)
+
+
+def _ler(diretorio, carregar_antes, resultados):
+    _configurar(diretorio)
+    from data import pedidos_repository  # noqa: F401 (registra o dataset)
+    from data import snapshots
+    from services import arrow_utils
+
+    path = os.environ['RIOFER_PICKING_SGD']
+    try:
+        if carregar_antes:
+            _gravar_picking(path, 30)
+            snapshots.get_table('picking')
+        _gravar_picking(path, 40, truncar=True)
+        tabela = snapshots.get_table('picking')
+        lista = arrow_utils.tabela('picking', ['AbsEntry', 'CardName'])
+        resultados.put((tabela.num_rows, 'U_TU_QuemEntrega' in tabela.column_names, lista.num_rows))
+    except Exception:
+        resultados.put(traceback.format_exc())
+
+
+def _executar(tmp_path, carregar_antes):
+    contexto = multiprocessing.get_context('spawn')
+    resultados = contexto.Queue()
+    processo = contexto.Process(target=_ler, args=(str(tmp_path), carregar_antes, resultados))
+    processo.start()
+    resultado = resultados.get(timeout=120)
+    processo.join(timeout=30)
+    assert isinstance(resultado, tuple), resultado
+    return resultado
+
+
+def test_arquivo_incompleto_sem_versao_carregada(tmp_path):
+    assert _executar(tmp_path, carregar_antes=False) == (0, True, 0)
+
+
+def test_arquivo_incompleto_mantem_a_versao_carregada(tmp_path):
+    assert _executar(tmp_path, carregar_antes=True) == (30, True, 30)
@@ -0,0 +1,179 @@
+# tests/test_snapshots_concorrencia.py
+#
+# Leituras (get_table) em workers diferentes enquanto outro worker grava o mesmo dataset
+# em sequência: cada gravação troca o parquet e remove o snapshot Arrow anterior.
+# Nenhuma leitura falha, e cada uma vê uma versão completa, nunca anterior à já lida.
+
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import traceback
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DURACAO_SEGUNDOS = float(os.getenv('SGD_TESTE_CONCORRENCIA_SEGUNDOS', '6'))
+LEITORES = 2
+
+
+def _configurar(diretorio):
+    os.environ['RIOFER_SEPARACAO_SGD'] = os.path.join(diretorio, 'separacao.parquet')
+    os.environ['RIOFER_SNAPSHOTS_SGD'] = os.path.join(diretorio, 'snapshots')
+    os.environ['RIOFER_BARRAMENTO_SGD'] = os.path.join(diretorio, 'barramento.bin')
+    os.environ['RIOFER_JOURNAL_SGD'] = os.path.join(diretorio, 'journal')
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+
+
+def _versao(linhas):
+    import pandas as pd
+
+    return pd.DataFrame({
+        'AbsEntry': range(linhas),
+        'Localizacao': ['DEP-A'] * linhas,
+        'User': [f'v{linhas}'] * linhas,
+    })
+
+
+def _escritor(diretorio, fim, resultados):
+    _configurar(diretorio)
+    from data import separacao_repository  # noqa: F401 (registra o dataset)
+    from data import snapshots
+
+    gravacoes = 0
+    try:
+        while time.monotonic() < fim:
+            snapshots.gravar('separacao', _versao(1 + gravacoes % 50))
+            gravacoes += 1
+    except Exception:
+        resultados.put(('escritor', traceback.format_exc()))
+        return
+    resultados.put(('escritor', gravacoes))
+
+
+def _leitor(diretorio, fim, resultados):
+    _configurar(diretorio)
+    from data import separacao_repository  # noqa: F401
+    from data import snapshots
+
+    leituras, erros = 0, []
+    while time.monotonic() < fim:
+        try:
+            if snapshots.get_table('separacao', ['AbsEntry', 'User']) is None:
+                erros.append('get_table retornou None com o arquivo existente')
+            leituras += 1
+        except Exception:
+            erros.append(traceback.format_exc())
+    resultados.put(('leitor', leituras, erros[:5], len(erros)))
+
+
+def test_get_table_durante_gravacoes_de_outro_processo(tmp_path):
+    # Primeira versão antes dos leitores: get_table nunca deve retornar None aqui.
+    _versao(1).to_parquet(tmp_path / 'separacao.parquet', index=False)
+
+    contexto = multiprocessing.get_context('spawn')
+    fim = time.monotonic() + DURACAO_SEGUNDOS
+    resultados = contexto.Queue()
+    processos = [contexto.Process(target=_escritor, args=(str(tmp_path), fim, resultados))]
+    processos += [contexto.Process(target=_leitor, args=(str(tmp_path), fim, resultados)) for _ in range(LEITORES)]
+    for processo in processos:
+        processo.start()
+    recebidos = [resultados.get(timeout=DURACAO_SEGUNDOS + 120) for _ in processos]
+    for processo in processos:
+        processo.join(timeout=30)
+
+    escritor = [r for r in recebidos if r[0] == 'escritor']
+    leitores = [r for r in recebidos if r[0] == 'leitor']
+    assert isinstance(escritor[0][1], int), escritor[0][1]
+    assert escritor[0][1] > 1
+    for _, leituras, exemplos, total_erros in leitores:
+        assert total_erros == 0, '\n'.join(exemplos)
+        assert leituras > 0
+
+
+def _proxima_versao(df):
+    return _versao(len(df) % 50 + 1)
+
+
+def _conferir_versoes(snapshots, fim):
+    """Lê por get_table e por get até `fim`; retorna (leituras, erros)."""
+    from data import storage
+
+    leituras, erros, ultima_geracao = 0, [], 0
+    while time.monotonic() < fim:
+        try:
+            tabela = snapshots.get_table('separacao')
+            geracao = storage.table_generation(tabela)
+            # Uma versão completa: todas as linhas gravadas juntas, nenhuma de outra gravação.
+            usuarios = set(tabela['User'].to_pylist())
+            if usuarios != {f'v{tabela.num_rows}'}:
+                erros.append(f'get_table: {tabela.num_rows} linhas de {sorted(usuarios)}')
+            if geracao < ultima_geracao:
+                erros.append(f'get_table: geração {geracao} depois da {ultima_geracao}')
+            ultima_geracao = max(ultima_geracao, geracao)
+
+            df = snapshots.get('separacao')
+            if set(df['User']) != {f'v{len(df)}'}:
+                erros.append(f'get: {len(df)} linhas de {sorted(set(df["User"]))}')
+            leituras += 1
+        except Exception:
+            erros.append(traceback.format_exc())
+    return leituras, erros
+
+
+def _escritor_com_leitor(diretorio, fim, resultados):
+    """Grava por snapshots.atualizar e, em uma thread do mesmo processo, lê o dataset."""
+    _configurar(diretorio)
+    from data import separacao_repository  # noqa: F401
+    from data import snapshots
+
+    locais = {}
+    leitor = threading.Thread(target=lambda: locais.update(resultado=_conferir_versoes(snapshots, fim)))
+    leitor.start()
+    gravacoes = 0
+    try:
+        while time.monotonic() < fim:
+            snapshots.atualizar('separacao', _proxima_versao)
+            gravacoes += 1
+    except Exception:
+        resultados.put(('escritor', traceback.format_exc()))
+        return
+    finally:
+        leitor.join()
+    resultados.put(('escritor', gravacoes))
+    leituras, erros = locais['resultado']
+    resultados.put(('leitor', leituras, erros[:5], len(erros)))
+
+
+def _leitor_consistente(diretorio, fim, resultados):
+    _configurar(diretorio)
+    from data import separacao_repository  # noqa: F401
+    from data import snapshots
+
+    leituras, erros = _conferir_versoes(snapshots, fim)
+    resultados.put(('leitor', leituras, erros[:5], len(erros)))
+
+
+def test_leitores_veem_versoes_completas_e_crescentes(tmp_path):
+    _versao(1).to_parquet(tmp_path / 'separacao.parquet', index=False)
+
+    contexto = multiprocessing.get_context('spawn')
+    fim = time.monotonic() + DURACAO_SEGUNDOS
+    resultados = contexto.Queue()
+    processos = [contexto.Process(target=_escritor_com_leitor, args=(str(tmp_path), fim, resultados))]
+    processos += [contexto.Process(target=_leitor_consistente, args=(str(tmp_path), fim, resultados)) for _ in range(LEITORES)]
+    for processo in processos:
+        processo.start()
+    # O escritor envia também o resultado do leitor do próprio processo.
+    recebidos = [resultados.get(timeout=DURACAO_SEGUNDOS + 120) for _ in range(len(processos) + 1)]
+    for processo in processos:
+        processo.join(timeout=30)
+
+    escritor = [r for r in recebidos if r[0] == 'escritor']
+    leitores = [r for r in recebidos if r[0] == 'leitor']
+    assert isinstance(escritor[0][1], int), escritor[0][1]
+    assert escritor[0][1] > 1
+    assert len(leitores) == LEITORES + 1
+    for _, leituras, exemplos, total_erros in leitores:
+        assert total_erros == 0, '\n'.join(exemplos)
+        assert leituras > 0
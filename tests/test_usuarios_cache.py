@@ -0,0 +1,151 @@
+# tests/test_usuarios_cache.py
+#
+# Diretório de usuários em cache por worker: uma gravação feita em outro worker
+# (anunciada no barramento) é vista na leitura seguinte, sem esperar o TTL; alterações
+# feitas fora do SGD esperam o TTL.
+
+import json
+import multiprocessing
+import os
+import sys
+import traceback
+
+import pytest
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from data import barramento  # noqa: E402
+from models import user  # noqa: E402
+
+
+@pytest.fixture
+def firebase(tmp_path, monkeypatch):
+    """Firebase em memória ({'users': {uid: dados}}) e um barramento só do teste."""
+    monkeypatch.setattr(barramento, 'BARRAMENTO_PATH', str(tmp_path / 'barramento.bin'))
+    monkeypatch.setattr(barramento, '_estado', {'mapa': None, 'falhou': False})
+    monkeypatch.setattr(barramento, 'VERIFICACAO_MS', 1000)
+
+    banco = {'users': {'a': {'email': 'a@x', 'roles': {'separador': True}}}, 'buscas': 0}
+
+    def db_get(path, token):
+        assert path == 'users'
+        banco['buscas'] += 1
+        return {uid: dict(dados) for uid, dados in banco['users'].items()}
+
+    def db_update(path, data, token):
+        uid = path.split('/', 1)[1]
+        banco['users'][uid] = {**banco['users'].get(uid, {}), **data}
+
+    monkeypatch.setattr(user.firebase_client, 'db_get', db_get)
+    monkeypatch.setattr(user.firebase_client, 'db_update', db_update)
+    user.invalidate_users_cache()
+    yield banco
+    user.invalidate_users_cache()
+
+
+def test_gravacao_em_outro_worker_invalida_o_diretorio(firebase):
+    assert set(user.get_users_by_role('separador', 'token')) == {'a'}
+    assert user.get_users_by_role('conferente', 'token') == {}
+
+    # Outro worker altera o usuário no Firebase e anuncia a gravação.
+    firebase['users']['a']['roles'] = {'conferente': True}
+    barramento.publicar(user.BARRAMENTO_USUARIOS)
+
+    assert set(user.get_users_by_role('conferente', 'token')) == {'a'}
+    assert user.get_users_by_role('separador', 'token') == {}
+    assert firebase['buscas'] == 2
+
+
+def test_gravacao_no_proprio_worker_nao_busca_de_novo(firebase):
+    user.get_all_users('token')
+    assert user.update_user_data('a', {'roles': ['motorista']}, 'token')
+
+    assert set(user.get_users_by_role('motorista', 'token')) == {'a'}
+    assert firebase['buscas'] == 1
+
+
+def test_indice_por_setor(firebase):
+    firebase['users']['b'] = {'email': 'b@x', 'roles': {'separador': True, 'conferente': True}}
+    firebase['users']['c'] = {'email': 'c@x'}
+
+    assert set(user.get_users_by_role(['separador'], 'token')) == {'a', 'b'}
+    assert set(user.get_users_by_role('conferente', 'token')) == {'b'}
+    assert set(user.get_users_by_role('motorista', 'token', incluir_sem_setor=True)) == {'c'}
+    assert firebase['buscas'] == 1
+
+
+def test_ttl_expirado_busca_de_novo(firebase, monkeypatch):
+    monkeypatch.setattr(user, 'USERS_CACHE_TTL', 0)
+    user.get_all_users('token')
+    # Alteração feita fora do SGD (sem anúncio): só o TTL a traz.
+    firebase['users']['a']['roles'] = {'motorista': True}
+    assert set(user.get_users_by_role('motorista', 'token')) == {'a'}
+    assert firebase['buscas'] == 2
+
+
+# --- Entre workers (processos) ---
+
+def _worker(diretorio, comandos, respostas):
+    """Worker com o Firebase simulado em um arquivo JSON compartilhado pelos processos."""
+    os.environ['RIOFER_BARRAMENTO_SGD'] = os.path.join(diretorio, 'barramento.bin')
+    if RAIZ not in sys.path:
+        sys.path.insert(0, RAIZ)
+    from models import user
+
+    banco = os.path.join(diretorio, 'firebase.json')
+
+    def db_get(path, token):
+        with open(banco) as fh:
+            return json.load(fh)
+
+    def db_update(path, data, token):
+        with open(banco) as fh:
+            users = json.load(fh)
+        uid = path.split('/', 1)[1]
+        users[uid] = {**users.get(uid, {}), **data}
+        with open(banco, 'w') as fh:
+            json.dump(users, fh)
+
+    user.firebase_client.db_get = db_get
+    user.firebase_client.db_update = db_update
+    for comando in iter(comandos.get, None):
+        try:
+            if comando[0] == 'setor':
+                respostas.put(sorted(user.get_users_by_role(comando[1], 'token')))
+            else:
+                respostas.put(user.update_user_data(comando[1], {'roles': comando[2]}, 'token'))
+        except Exception:
+            respostas.put(traceback.format_exc())
+
+
+def test_gravacao_em_um_worker_atualiza_o_diretorio_do_outro(tmp_path):
+    with open(tmp_path / 'firebase.json', 'w') as fh:
+        json.dump({'a': {'email': 'a@x', 'roles': {'separador': True}}}, fh)
+
+    contexto = multiprocessing.get_context('spawn')
+    workers = {}
+    for nome in ('admin', 'outro'):
+        comandos, respostas = contexto.Queue(), contexto.Queue()
+        processo = contexto.Process(target=_worker, args=(str(tmp_path), comandos, respostas))
+        processo.start()
+        workers[nome] = (processo, comandos, respostas)
+
+    def executar(nome, *comando):
+        _, comandos, respostas = workers[nome]
+        comandos.put(comando)
+        resposta = respostas.get(timeout=120)
+        assert not (isinstance(resposta, str) and resposta.startswith('Traceback')), resposta
+        return resposta
+
+    try:
+        # Os dois workers carregam o diretório (TTL padrão de 5 minutos).
+        assert executar('outro', 'setor', 'separador') == ['a']
+        assert executar('admin', 'setor', 'separador') == ['a']
+
+        assert executar('admin', 'alterar', 'a', ['conferente']) is True
+        assert executar('outro', 'setor', 'conferente') == ['a']
+        assert executar('outro', 'setor', 'separador') == []
+    finally:
+        for processo, comandos, _ in workers.values():
+            comandos.put(None)
+            processo.join(timeout=30)
@@ -0,0 +1,145 @@
+# token_refresher.py
+
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from datetime import datetime, timedelta, timezone
+
+
+def _utcnow():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+class TokenRefresher:
+    """
+    Renova os idTokens do Firebase fora do caminho das requisições.
+
+    - Cada worker mantém as sessões ativas vistas recentemente; uma thread em background
+      renova os tokens que entram na janela de antecedência.
+    - A renovação é single-flight por usuário: requisições paralelas do mesmo navegador
+      compartilham a mesma chamada.
+    - O before_request apenas aplica à sessão o resultado já pronto. Só espera (com limite)
+      quando o token já expirou, o que acontece apenas após longos períodos de inatividade.
+    """
+
+    def __init__(self, client, antecedencia=timedelta(minutes=10), inatividade_max=timedelta(minutes=30),
+                 intervalo=30, espera_max_expirado=5):
+        self.client = client
+        self.antecedencia = antecedencia
+        self.inatividade_max = inatividade_max
+        self.intervalo = intervalo
+        self.espera_max_expirado = espera_max_expirado
+
+        self._lock = threading.Lock()
+        self._sessoes = {}
+        self._resultados = {}
+        self._em_andamento = {}
+        self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='token-refresh')
+        self._thread = None
+        self._pid = None
+
+    def _ensure_started(self):
+        # A thread não sobrevive ao fork do gunicorn: inicia (ou reinicia) no processo atual.
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._thread is not None and self._pid == os.getpid():
+                return
+            if self._pid != os.getpid():
+                self._executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='token-refresh')
+                self._em_andamento = {}
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._loop, name='token-refresher', daemon=True)
+            self._thread.start()
+
+    def _loop(self):
+        while True:
+            time.sleep(self.intervalo)
+            agora = _utcnow()
+            with self._lock:
+                for uid in [u for u, s in self._sessoes.items() if agora - s['last_seen'] > self.inatividade_max]:
+                    self._sessoes.pop(uid, None)
+                    self._resultados.pop(uid, None)
+                pendentes = [(uid, s['refreshToken']) for uid, s in self._sessoes.items()
+                             if s['expires_at'] - agora < self.antecedencia]
+            for uid, refresh_token in pendentes:
+                self.schedule(uid, refresh_token)
+
+    def schedule(self, uid, refresh_token):
+        """Agenda a renovação do usuário, reaproveitando a que já estiver em andamento."""
+        with self._lock:
+            future = self._em_andamento.get(uid)
+            if future is None or future.done():
+                future = self._executor.submit(self._refresh, uid, refresh_token)
+                self._em_andamento[uid] = future
+            return future
+
+    def _refresh(self, uid, refresh_token):
+        try:
+            data = self.client.refresh(refresh_token)
+        except Exception as e:
+            print(f"Erro ao renovar o token do usuário {uid}: {e}")
+            with self._lock:
+                self._resultados[uid] = {'erro': True, 'refreshToken': refresh_token}
+            return None
+
+        resultado = {
+            'idToken': data['idToken'],
+            'refreshToken': data['refreshToken'],
+            'expires_at': _utcnow() + timedelta(seconds=int(data.get('expiresIn', 3600)))
+        }
+        with self._lock:
+            self._resultados[uid] = resultado
+            if uid in self._sessoes:
+                self._sessoes[uid]['refreshToken'] = resultado['refreshToken']
+                self._sessoes[uid]['expires_at'] = resultado['expires_at']
+        return resultado
+
+    def sync_session(self, user):
+        """
+        Sincroniza o dicionário session['user'] com a renovação mais recente.
+        Retorna 'ok', 'updated' (sessão alterada) ou 'expired' (renovação falhou e o token expirou).
+        """
+        self._ensure_started()
+
+        uid = user.get('uid')
+        expires_at = datetime.fromisoformat(user['expires_at']).replace(tzinfo=None)
+        agora = _utcnow()
+
+        with self._lock:
+            resultado = self._resultados.get(uid)
+            sessao = self._sessoes.setdefault(uid, {
+                'refreshToken': user['refreshToken'], 'expires_at': expires_at
+            })
+            sessao['last_seen'] = agora
+            if expires_at > sessao['expires_at']:
+                sessao['refreshToken'] = user['refreshToken']
+                sessao['expires_at'] = expires_at
+
+        if resultado and not resultado.get('erro') and resultado['expires_at'] > expires_at:
+            self._apply(user, resultado)
+            return 'updated'
+
+        if expires_at - agora >= self.antecedencia:
+            return 'ok'
+
+        future = self.schedule(uid, user['refreshToken'])
+        if expires_at > agora:
+            return 'ok'
+
+        # Token já expirado (sessão ficou inativa): junta-se à renovação em andamento.
+        try:
+            resultado = future.result(timeout=self.espera_max_expirado)
+        except FutureTimeoutError:
+            resultado = None
+        if resultado:
+            self._apply(user, resultado)
+            return 'updated'
+        return 'expired'
+
+    @staticmethod
+    def _apply(user, resultado):
+        user['idToken'] = resultado['idToken']
+        user['refreshToken'] = resultado['refreshToken']
+        user['expires_at'] = resultado['expires_at'].isoformat()
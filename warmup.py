@@ -0,0 +1,43 @@
+# warmup.py
+
+import gc
+import time
+
+from data import (frota_repository, geoloc_repository, packing_repository, pedidos_repository,
+                  regioes_repository, rotas_repository, separacao_repository, sequencia_repository,
+                  snapshots)
+from services import mapa_service
+
+
+def compile_templates(app):
+    """Compila todos os templates (e grava o bytecode no cache em disco, se configurado)."""
+    total = 0
+    for nome in app.jinja_env.list_templates(extensions=['html']):
+        app.jinja_env.get_template(nome)
+        total += 1
+    return total
+
+
+def warm_up(app, freeze=False):
+    """
+    Deixa o processo pronto para responder rápido já na primeira requisição: lê os
+    datasets (snapshots), monta os índices derivados e compila os templates.
+
+    Com freeze=True (app pré-carregada no master do gunicorn), move os objetos criados
+    para a geração permanente do GC: os workers herdam essas páginas por copy-on-write
+    e o coletor não as toca, então elas continuam compartilhadas entre os processos.
+    """
+    inicio = time.perf_counter()
+    carregados = snapshots.preload()
+    mapa_service.get_regioes_index()
+    templates = compile_templates(app)
+
+    if freeze:
+        gc.collect()
+        gc.freeze()
+
+    linhas = ', '.join(f"{nome}={total}" for nome, total in carregados.items())
+    app.logger.info(
+        f"Warm-up concluído em {time.perf_counter() - inicio:.2f}s "
+        f"({linhas}; {templates} templates compilados)."
+    )